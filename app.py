@@ -1,93 +1,189 @@
-import os, json
-from flask import Flask, request, jsonify
-from src.config import DATA_DIR
-from src.data_prep import download_movielens_if_needed, load_movielens, filter_min_counts, build_user_item_matrix, join_titles, search_titles
-from src.recommender import load_or_train, train_and_pack, recommend_for_user, similar_items
-from src.llm_interface import parse_with_openai
+import os, json, threading, time
+from flask import Flask, Response, g, request, jsonify
+from src.config import BATCHING_ENABLED, BATCH_WINDOW_MS, BATCH_MAX_SIZE, RELOAD_INTERVAL_S, MAX_REQUEST_BYTES
+from src.recommender import MODEL_DIR, attach_topn, recommend_for_user, recommend_for_users, similar_items, similar_items_many, ann_similar_items, fold_in_ratings, recommend_for_session
+from src.llm_interface import parse_with_openai, cache_stats, STATS as LLM_STATS
+from src.metrics import METRICS, ProfileSampler, serving_gauges
+from src.batching import Coalescer
+from src.hot_reload import ArtifactReloader
+from src import routes
+from src.sharding import attach_shards
+from src.scoring_pool import Overloaded
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES  # larger bodies get 413
 
-def _build_artifacts():
-    root = download_movielens_if_needed(DATA_DIR)
-    ratings, movies = load_movielens(root)
-    ratings = filter_min_counts(ratings)
-    R, u_idx, i_idx = build_user_item_matrix(ratings)
-    id_to_title = join_titles(movies)
-    return train_and_pack(R, u_idx, i_idx, id_to_title)
+ART = None
+_SWAP_LOCK = threading.Lock()
 
-ART = load_or_train(_build_artifacts)
+def _swap(art):
+    # one reference assignment; requests in flight keep the version they started with
+    global ART
+    with _SWAP_LOCK:
+        ART = art
+
+def _fold_in(user_id, ratings):
+    # fold-ins build a new Artifacts from the live one and swap it in like a reload; the lock
+    # serializes them with each other and with reloads, so none overwrites a version swapped in
+    # while it ran (a later reload still replaces folded-in ratings, as a retrain does)
+    global ART
+    with _SWAP_LOCK:
+        ART, summary = fold_in_ratings(ART, user_id, ratings)
+    return summary
+
+def _prepare(art):
+    # precomputed top-N lists, and item-shard workers when SHARD_MODE is set
+    return attach_shards(attach_topn(art))
+
+# artifacts are only ever loaded here (scripts/train.py publishes them); a new CURRENT version
+# is loaded, warmed up and swapped in by a background thread
+RELOADER = ArtifactReloader(MODEL_DIR, prepare=_prepare, on_swap=_swap)
+RELOADER.check()
+RELOADER.start(RELOAD_INTERVAL_S)
+
+def _batched(fn, what):
+    # coalesced (id, k) requests -> one batched call at the largest k, sliced per caller
+    def run(items):
+        res = fn(ART, [i for i, _ in items], k=max(k for _, k in items))
+        return [res[i][:k] if i in res else ValueError(f"Unknown {what} {i}") for i, k in items]
+    return run
+
+REC_BATCHER = Coalescer(_batched(recommend_for_users, "user_id"), BATCH_WINDOW_MS, BATCH_MAX_SIZE) if BATCHING_ENABLED else None
+SIM_BATCHER = Coalescer(_batched(similar_items_many, "movie_id"), BATCH_WINDOW_MS, BATCH_MAX_SIZE) if BATCHING_ENABLED else None
+
+PROFILER = ProfileSampler()
+
+@app.before_request
+def _start_request():
+    g.t0 = time.perf_counter()
+    g.prof = PROFILER.start()
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.after_request
+def _count_request(resp):
+    METRICS.observe("recsys_http_request_seconds", time.perf_counter() - g.t0, route=_route())
+    METRICS.inc("recsys_http_requests_total", route=_route(), status=str(resp.status_code))
+    return resp
+
+@app.teardown_request
+def _stop_profile(exc=None):
+    # teardown runs even when the view raised, so a sampled profiler is always switched off
+    prof = g.pop("prof", None)
+    if prof is not None:
+        PROFILER.stop(prof, f"{request.method} {_route()}")
+
+@app.before_request
+def _require_model():
+    if ART is None and request.path not in routes.NO_MODEL_PATHS:
+        return jsonify(routes.NO_MODEL), 503
+
+@app.errorhandler(Overloaded)
+def _overloaded(e):
+    # e.g. too many distinct LLM calls in flight (src/llm_interface.py); same answer as asgi_app.py
+    return jsonify({"error": f"Overloaded: {e}"}), 503, {"Retry-After": "1"}
 
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
+@app.get("/admin/model")
+def admin_model():
+    return jsonify(RELOADER.status())
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format; stage/request histograms are per worker process
+    gauges = serving_gauges(ART, RELOADER.status(), LLM_STATS)
+    gauges.append(("recsys_profile_sample_every", {}, PROFILER.every))
+    return Response(METRICS.render(gauges), mimetype="text/plain; version=0.0.4")
+
+@app.get("/stats/batching")
+def batching_stats():
+    if not BATCHING_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, "recommend": REC_BATCHER.stats(), "similar": SIM_BATCHER.stats()}
+
+@app.get("/stats/scoring")
+def scoring_stats():
+    # the bounded scoring pool is asgi_app.py only
+    return {"enabled": False}
+
+@app.get("/stats/llm")
+def llm_stats():
+    return cache_stats()
+
+# routes: src/routes.py parses the request and shapes the response, shared with asgi_app.py
+
 @app.get("/search")
 def search():
-    q = request.args.get("q", "")
-    root = download_movielens_if_needed(DATA_DIR)
-    _, movies = load_movielens(root)
-    res = search_titles(movies, q, top=15)
-    return jsonify(res.to_dict(orient="records"))
+    return jsonify(routes.search(ART, request.args))
 
 @app.get("/recommend/user/<int:user_id>")
 def rec_user(user_id: int):
-    k = int(request.args.get("k", 10))
     try:
-        recs = recommend_for_user(ART, user_id, k=k)
-        return jsonify([{"movieId": mid, "title": title} for mid, title in recs])
+        k, genres, timings = routes.user_args(request.args)
+        if timings is not None or genres or not REC_BATCHER:
+            recs = recommend_for_user(ART, user_id, k=k, timings=timings, genres=genres)
+        else:
+            recs = REC_BATCHER.submit((user_id, k))
+        return jsonify(routes.user_response(recs, timings))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.post("/recommend/users")
+def rec_users():
+    try:
+        user_ids, k = routes.users_args(request.get_json(force=True, silent=True) or {})
+        recs = recommend_for_users(ART, user_ids, k=k)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(routes.users_response(user_ids, recs))
+
+@app.post("/recommend/session")
+def rec_session():
+    # anonymous visitors with no user row
+    try:
+        ratings, k, genres = routes.session_args(request.get_json(force=True, silent=True) or {})
+        recs = recommend_for_session(ART, ratings, k=k, genres=genres)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(routes.session_response(ratings, k, genres, recs))
+
+@app.post("/ratings")
+def add_ratings():
+    # folded in, no retrain
+    try:
+        user_id, ratings = routes.ratings_args(request.get_json(force=True, silent=True) or {})
+        return jsonify(_fold_in(user_id, ratings))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.get("/similar/<int:movie_id>")
 def similar(movie_id: int):
-    k = int(request.args.get("k", 10))
     try:
-        sims = similar_items(ART, movie_id, k=k)
-        return jsonify([{"movieId": mid, "title": title} for mid, title in sims])
+        k, method, genres = routes.similar_args(request.args)
+        if method == "ann":
+            sims = ann_similar_items(ART, movie_id, k=k, genres=genres)
+        elif SIM_BATCHER and not genres:
+            sims = SIM_BATCHER.submit((movie_id, k))
+        else:
+            sims = similar_items(ART, movie_id, k=k, genres=genres)
+        return jsonify(routes.titled(sims))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.post("/llm")
 def llm():
     data = request.get_json(force=True, silent=True) or {}
-    query = data.get("query", "")
-    k = int(data.get("k", 10))
-    parsed = parse_with_openai(query)
-    intent = parsed.get("intent", "recommend")
-    seed = parsed.get("seed_movie")
-    genres = parsed.get("genres", [])
-    k = int(parsed.get("k", k))
-
-    # Resolve seed movie if provided
-    seed_movie_id = None
-    if seed:
-        root = download_movielens_if_needed(DATA_DIR)
-        _, movies = load_movielens(root)
-        match = movies[movies['title'].str.contains(seed, case=False, na=False)]
-        if not match.empty:
-            seed_movie_id = int(match.iloc[0]['movieId'])
-
-    if intent in ("similar",) and seed_movie_id:
-        sims = similar_items(ART, seed_movie_id, k=k)
-        return jsonify({"parsed": parsed, "results": [{"movieId": mid, "title": title} for mid, title in sims]})
-    else:
-        # default: user‑agnostic popular-ish recommendations filtered by genre via cosine anchors
-        # pick an arbitrary existing user with many ratings or fallback to user 1
-        try_users = sorted(ART.u_index.keys())
-        user_id = try_users[0] if try_users else 1
-        recs = recommend_for_user(ART, user_id, k=50)
-        results = [{"movieId": mid, "title": title} for mid,title in recs]
-
-        if genres:
-            gl = [g.lower() for g in genres]
-            root = download_movielens_if_needed(DATA_DIR)
-            _, movies = load_movielens(root)
-            gmap = dict(zip(movies.movieId, movies.title.str.lower()))
-            # crude genre filtering: title keywords as proxy
-            filt = [r for r in results if any(g in gmap.get(r["movieId"], "") for g in gl)]
-            results = filt or results  # fallback if empty
-
-        return jsonify({"parsed": parsed, "results": results[:k]})
+    try:
+        query, k = routes.llm_args(data)
+        return jsonify(routes.llm(ART, parse_with_openai(query), k, data))
+    except Overloaded:
+        raise  # 503 from _overloaded
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8000)), debug=True)
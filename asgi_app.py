@@ -0,0 +1,212 @@
+"""ASGI entry point with the same routes as app.py: ``uvicorn asgi_app:app --workers 1``.
+
+Scoring runs on a bounded thread pool (src/scoring_pool.py) over the one Artifacts instance this
+process holds, LLM parses are awaited, and a full pool answers 503 instead of queueing.
+"""
+import json, re, threading, time
+from urllib.parse import parse_qs
+
+from src.config import RELOAD_INTERVAL_S, MAX_REQUEST_BYTES
+from src.recommender import (MODEL_DIR, attach_topn, recommend_for_user, recommend_for_users, similar_items,
+                             ann_similar_items, fold_in_ratings, recommend_for_session)
+from src.llm_interface import parse_with_openai_async, cache_stats, STATS as LLM_STATS
+from src.hot_reload import ArtifactReloader
+from src.sharding import attach_shards
+from src.metrics import METRICS, serving_gauges
+from src.scoring_pool import ScoringPool, Overloaded
+from src import routes
+
+ART = None
+_SWAP_LOCK = threading.Lock()
+
+def _swap(art):
+    # one reference assignment; requests in flight keep the version they started with
+    global ART
+    with _SWAP_LOCK:
+        ART = art
+
+def _fold_in(user_id, ratings):
+    # fold-ins build a new Artifacts from the live one and swap it in like a reload; the lock
+    # serializes them with each other and with reloads, so none overwrites a version swapped in
+    # while it ran (a later reload still replaces folded-in ratings, as a retrain does)
+    global ART
+    with _SWAP_LOCK:
+        ART, summary = fold_in_ratings(ART, user_id, ratings)
+    return summary
+
+def _prepare(art):
+    # precomputed top-N lists, and item-shard workers when SHARD_MODE is set
+    return attach_shards(attach_topn(art))
+
+RELOADER = ArtifactReloader(MODEL_DIR, prepare=_prepare, on_swap=_swap)
+RELOADER.check()
+RELOADER.start(RELOAD_INTERVAL_S)
+POOL = ScoringPool()
+
+class Request:
+    def __init__(self, scope, body: bytes, params):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        # first value of a repeated parameter, as Flask's request.args.get
+        self.args = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.params = params
+        self.body = body
+
+    def json(self) -> dict:
+        # like Flask's get_json(force=True, silent=True) or {}
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+class Text(str):
+    """A handler result sent as text/plain instead of JSON."""
+
+ROUTES = []
+
+def route(method: str, rule: str):
+    rx = re.compile("^" + re.sub(r"<int:(\w+)>", r"(?P<\1>\\d+)", rule) + "$")
+    def deco(fn):
+        ROUTES.append((method, rx, rule, fn))
+        return fn
+    return deco
+
+# routes: src/routes.py parses the request and shapes the response, shared with app.py
+
+@route("GET", "/healthz")
+async def healthz(req, art):
+    return {"status": "ok"}
+
+@route("GET", "/admin/model")
+async def admin_model(req, art):
+    return RELOADER.status()
+
+@route("GET", "/metrics")
+async def metrics(req, art):
+    gauges = serving_gauges(art, RELOADER.status(), LLM_STATS)
+    gauges += [("recsys_scoring_inflight", {}, POOL.inflight), ("recsys_scoring_limit", {}, POOL.limit)]
+    return Text(METRICS.render(gauges))
+
+@route("GET", "/stats/batching")
+async def batching_stats(req, art):
+    # request coalescing is app.py only; the scoring pool bounds concurrency here
+    return {"enabled": False}
+
+@route("GET", "/stats/scoring")
+async def scoring_stats(req, art):
+    return {"enabled": True, **POOL.stats()}
+
+@route("GET", "/stats/llm")
+async def llm_stats(req, art):
+    return cache_stats()
+
+@route("GET", "/search")
+async def search(req, art):
+    return await POOL.run(routes.search, art, req.args)
+
+@route("GET", "/recommend/user/<int:user_id>")
+async def rec_user(req, art):
+    k, genres, timings = routes.user_args(req.args)
+    recs = await POOL.run(recommend_for_user, art, int(req.params["user_id"]), k=k, timings=timings, genres=genres)
+    return routes.user_response(recs, timings)
+
+@route("POST", "/recommend/users")
+async def rec_users(req, art):
+    user_ids, k = routes.users_args(req.json())
+    return routes.users_response(user_ids, await POOL.run(recommend_for_users, art, user_ids, k=k))
+
+@route("POST", "/recommend/session")
+async def rec_session(req, art):
+    ratings, k, genres = routes.session_args(req.json())
+    recs = await POOL.run(recommend_for_session, art, ratings, k=k, genres=genres)
+    return routes.session_response(ratings, k, genres, recs)
+
+@route("POST", "/ratings")
+async def add_ratings(req, art):
+    return await POOL.run(_fold_in, *routes.ratings_args(req.json()))
+
+@route("GET", "/similar/<int:movie_id>")
+async def similar(req, art):
+    k, method, genres = routes.similar_args(req.args)
+    movie_id = int(req.params["movie_id"])
+    if method == "ann":
+        return routes.titled(await POOL.run(ann_similar_items, art, movie_id, k=k, genres=genres))
+    return routes.titled(await POOL.run(similar_items, art, movie_id, k=k, genres=genres))
+
+@route("POST", "/llm")
+async def llm(req, art):
+    data = req.json()
+    query, k = routes.llm_args(data)
+    parsed = await parse_with_openai_async(query)
+    return await POOL.run(routes.llm, art, parsed, k, data)
+
+async def _dispatch(req_scope, body):
+    # -> (status, payload, extra headers, route rule for metrics)
+    path, method = req_scope["path"], req_scope["method"]
+    allowed = False
+    for m, rx, rule, fn in ROUTES:
+        match = rx.match(path)
+        if match is None:
+            continue
+        if m != method:
+            allowed = True
+            continue
+        art = ART
+        if art is None and path not in routes.NO_MODEL_PATHS:
+            return 503, routes.NO_MODEL, [], rule
+        try:
+            return 200, await fn(Request(req_scope, body, match.groupdict()), art), [], rule
+        except Overloaded as e:
+            return 503, {"error": f"Overloaded: {e}"}, [(b"retry-after", b"1")], rule
+        except Exception as e:
+            return 400, {"error": str(e)}, [], rule
+    return (405, {"error": "Method not allowed"}, [], "unmatched") if allowed else (404, {"error": "Not found"}, [], "unmatched")
+
+def _rule(path):
+    return next((rule for _, rx, rule, _ in ROUTES if rx.match(path)), "unmatched")
+
+async def _read_body(scope, receive):
+    # request body, or None once it is over MAX_REQUEST_BYTES (by Content-Length or as it
+    # streams in); chunks are joined once at the end
+    declared = dict(scope.get("headers") or []).get(b"content-length", b"")
+    if declared.isdigit() and int(declared) > MAX_REQUEST_BYTES:
+        return None
+    chunks, size = [], 0
+    while True:
+        msg = await receive()
+        chunk = msg.get("body", b"")
+        size += len(chunk)
+        if size > MAX_REQUEST_BYTES:
+            return None
+        chunks.append(chunk)
+        if not msg.get("more_body"):
+            return b"".join(chunks)
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                POOL.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    t0 = time.perf_counter()
+    body = await _read_body(scope, receive)
+    if body is None:
+        status, payload, headers, rule = 413, {"error": f"Request body over {MAX_REQUEST_BYTES} bytes"}, [], _rule(scope["path"])
+    else:
+        status, payload, headers, rule = await _dispatch(scope, body)
+    if isinstance(payload, Text):
+        data, ctype = payload.encode(), b"text/plain; version=0.0.4; charset=utf-8"
+    else:
+        data, ctype = json.dumps(payload).encode(), b"application/json"
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", ctype), (b"content-length", str(len(data)).encode())] + headers})
+    await send({"type": "http.response.body", "body": data})
+    METRICS.observe("recsys_http_request_seconds", time.perf_counter() - t0, route=rule)
+    METRICS.inc("recsys_http_requests_total", route=rule, status=str(status))
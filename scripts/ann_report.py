@@ -0,0 +1,30 @@
+import argparse
+import numpy as np
+from src.config import RANDOM_SEED
+from src.recommender import load_artifacts, build_ann
+from src.ann import recall_report
+
+def main():
+    ap = argparse.ArgumentParser(description="Recall vs exact search for the IVF indexes over SVD factors")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--rebuild", action="store_true", help="build the indexes even if the artifacts have none")
+    args = ap.parse_args()
+
+    art = load_artifacts()
+    if args.rebuild or art.ann_similar is None:
+        build_ann(art)
+    rng = np.random.default_rng(RANDOM_SEED)
+    n_items, n_users = art.svd.VT.shape[1], art.svd.U.shape[0]
+    item_q = art.svd.VT.T[rng.choice(n_items, size=min(args.queries, n_items), replace=False)]
+    user_q = art.svd.U[rng.choice(n_users, size=min(args.queries, n_users), replace=False)]
+
+    for name, index, queries in (("item->item (cosine)", art.ann_similar, item_q),
+                                 ("user->item (inner product)", art.ann_retrieval, user_q)):
+        print(f"{name}: nlist={index.nlist}, {len(queries)} queries, k={args.k}")
+        for row in recall_report(index, queries, k=args.k):
+            print(f"  nprobe={row['nprobe']:>3}  recall@{args.k}={row['recall']:.3f}  "
+                  f"{row['ms_per_query']:.3f} ms/query (exact {row['exact_ms_per_query']:.3f})")
+
+if __name__ == "__main__":
+    main()
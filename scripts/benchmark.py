@@ -0,0 +1,42 @@
+import argparse, json, os, sys
+from src.config import ARTIFACT_DIR, RANDOM_SEED, SVD_COMPONENTS, KNN_TOPK
+from src.benchmark import run_benchmarks, compare, format_results
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency, throughput and memory of the training and serving hot paths on synthetic data")
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--items", type=int, default=1000)
+    ap.add_argument("--density", type=float, default=0.02)
+    ap.add_argument("--zipf", type=float, default=1.0, help="item popularity exponent (0 = uniform)")
+    ap.add_argument("--seed", type=int, default=RANDOM_SEED)
+    ap.add_argument("--svd-components", type=int, default=SVD_COMPONENTS)
+    ap.add_argument("--knn-topk", type=int, default=KNN_TOPK)
+    ap.add_argument("--requests", type=int, default=200, help="calls per scoring / endpoint case")
+    ap.add_argument("--fit-repeat", type=int, default=1, help="runs per fit / save / load case")
+    ap.add_argument("--no-endpoints", action="store_true", help="skip the Flask test-client cases")
+    ap.add_argument("--out", default=os.path.join(ARTIFACT_DIR, "bench", "latest.json"))
+    ap.add_argument("--baseline", help="earlier results JSON to compare against; exits 1 on a regression")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / growth vs the baseline")
+    ap.add_argument("--update-baseline", action="store_true", help="write these results to --baseline instead")
+    args = ap.parse_args()
+
+    results = run_benchmarks(args.users, args.items, args.density, args.zipf, args.seed,
+                             requests=args.requests, fit_repeat=args.fit_repeat, endpoints=not args.no_endpoints,
+                             svd_components=args.svd_components, knn_topk=args.knn_topk)
+    comparison = None
+    if args.baseline and not args.update_baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), tolerance=args.tolerance)
+        results["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "rows": comparison}
+
+    for path in [args.out] + ([args.baseline] if args.baseline and args.update_baseline else []):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=1)
+    print(format_results(results, comparison))
+    print(f"Saved {args.out}")
+    if comparison and any(row["regression"] for row in comparison):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+#!/bin/sh
+# Container entry point: the API only loads published models, so train one first when none
+# exists yet (a fresh container or an empty artifacts volume), then run the given command.
+set -e
+if ! python -c "from src.recommender import has_artifacts; raise SystemExit(0 if has_artifacts() else 1)"; then
+    echo "No published model under ${ARTIFACT_DIR:-artifacts}/recsys; running scripts/train.py"
+    python scripts/train.py
+fi
+exec "$@"
@@ -1,11 +1,17 @@
-import numpy as np
+import argparse, time
 from src.config import DATA_DIR, RANDOM_SEED
 from src.data_prep import download_movielens_if_needed, load_movielens, filter_min_counts, build_user_item_matrix
-from src.recommender import train_and_pack, recommend_for_user
-from src.evaluate import rmse, precision_at_k, user_stratified_split
+from src.recommender import train_and_pack
+from src.evaluate import user_stratified_split, evaluate_model
 
 def main():
-    root = download_movielens_if_needed()
+    ap = argparse.ArgumentParser(description="Train on a per-user holdout split and report RMSE + ranking metrics")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--workers", type=int, default=1, help="processes to shard user blocks over")
+    ap.add_argument("--block-size", type=int, default=256)
+    args = ap.parse_args()
+
+    root = download_movielens_if_needed(DATA_DIR)
     ratings, movies = load_movielens(root)
     ratings = filter_min_counts(ratings)
 
@@ -15,37 +21,13 @@ def main():
     id_to_title = dict(zip(movies.movieId, movies.title))
 
     art = train_and_pack(R, u_index, i_index, id_to_title)
-    preds = art.svd.predict_all()
-
-    # RMSE on entries that exist in test set
-    inv_u = {v:k for k,v in u_index.items()}
-    inv_i = {v:k for k,v in i_index.items()}
-    y_true, y_pred = [], []
-    for _, row in test_df.iterrows():
-        uid, mid, r = int(row.userId), int(row.movieId), float(row.rating)
-        if uid in u_index and mid in i_index:
-            y_true.append(r)
-            y_pred.append(preds[u_index[uid], i_index[mid]])
-    rmse_val = rmse(np.array(y_pred), np.array(y_true)) if y_true else float("nan")
-
-    # Precision@10 by recommending and checking if held-out item is in top‑k
-    # Build ground truth set per user (held-out items)
-    heldout_by_user = {}
-    for _, row in test_df.iterrows():
-        heldout_by_user.setdefault(int(row.userId), set()).add(int(row.movieId))
-
-    p_at_10 = []
-    for uid in heldout_by_user.keys():
-        if uid not in u_index:
-            continue
-        recs = recommend_for_user(art, uid, k=10)
-        rec_movie_ids = [m for m,_ in recs]
-        p = precision_at_k(rec_movie_ids, heldout_by_user[uid], k=10)
-        p_at_10.append(p)
-    prec10 = float(np.mean(p_at_10)) if p_at_10 else float("nan")
 
-    print(f"RMSE: {rmse_val:.4f}")
-    print(f"Precision@10: {prec10:.4f}")
+    t0 = time.perf_counter()
+    metrics = evaluate_model(art, test_df, k=args.k, block_size=args.block_size, workers=args.workers)
+    print(f"RMSE: {metrics.pop('rmse'):.4f}")
+    for name, value in metrics.items():
+        print(f"{name[:1].upper() + name[1:]}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+    print(f"Evaluated in {time.perf_counter() - t0:.1f}s")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,46 @@
+import argparse, os, time
+import numpy as np
+from multiprocessing import Pool
+from src.config import TOPN_DIR, TOPN_N
+from src.recommender import load_artifacts, recommend_block, resolve_model_path, MODEL_DIR
+from src.topn_store import TopNStore
+
+_art = None
+_store = None
+
+def _init(model_dir, store_path, n, model_version):
+    # each worker memory-maps the artifacts and the output store; results never go through pickling
+    global _art, _store
+    _art = load_artifacts(model_dir)
+    _store = TopNStore(store_path, None, None, n, model_version).open_rows()
+
+def _work(bounds):
+    start, stop = bounds
+    uidx = np.arange(start, stop, dtype=np.int64)
+    _store.write(uidx, recommend_block(_art, uidx, k=_store.n), _art.model_version)
+    _store.items.flush(); _store.tags.flush()
+    return stop - start
+
+def main():
+    ap = argparse.ArgumentParser(description="Precompute top-N hybrid recommendations for every user")
+    ap.add_argument("--n", type=int, default=TOPN_N)
+    ap.add_argument("--out", default=TOPN_DIR)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--block-size", type=int, default=256)
+    args = ap.parse_args()
+
+    model_dir = resolve_model_path(MODEL_DIR)  # pin the version so every worker maps the same one
+    art = load_artifacts(model_dir)
+    n_users = art.R.shape[0]
+    store = TopNStore.create(args.out, n_users, args.n, art.model_version)
+    blocks = [(s, min(s + args.block_size, n_users)) for s in range(0, n_users, args.block_size)]
+
+    t0 = time.perf_counter()
+    with Pool(args.workers, initializer=_init, initargs=(model_dir, store.path, args.n, art.model_version)) as pool:
+        done = sum(pool.imap_unordered(_work, blocks))
+    store.publish(args.out)
+    print(f"Top-{args.n} for {done} users written to {args.out} in {time.perf_counter() - t0:.1f}s "
+          f"(model {art.model_version})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import argparse
+import numpy as np
+from src.config import RANDOM_SEED
+from src.recommender import load_artifacts
+from src.models.svd_model import quantization_report
+
+def main():
+    ap = argparse.ArgumentParser(description="Accuracy and size of float16 / int8 SVD item factors vs float32")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--users", type=int, default=500)
+    args = ap.parse_args()
+
+    art = load_artifacts()
+    rng = np.random.default_rng(RANDOM_SEED)
+    n_users = art.svd.U.shape[0]
+    users = rng.choice(n_users, size=min(args.users, n_users), replace=False)
+    print(f"{len(users)} users, k={args.k}, {art.svd.VT.shape[1]} items x {art.svd.VT.shape[0]} factors")
+    for row in quantization_report(art.svd, art.R, users, k=args.k):
+        print(f"  {row['quant']:>8}  recall@{args.k}={row['recall']:.3f}  rmse={row['rmse']:.4f} "
+              f"({row['rmse_delta']:+.5f})  item factors {row['item_factor_bytes'] / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
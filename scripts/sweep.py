@@ -0,0 +1,40 @@
+import argparse, os, time
+from src.config import DATA_DIR, ARTIFACT_DIR, RANDOM_SEED, ALPHA, SVD_COMPONENTS, KNN_TOPK
+from src.data_prep import download_movielens_if_needed, load_movielens, filter_min_counts, build_user_item_matrix, join_titles
+from src.evaluate import user_stratified_split
+from src.sweep import run_sweep
+
+def _floats(s):
+    return [float(x) for x in s.split(",") if x]
+
+def _ints(s):
+    return [int(x) for x in s.split(",") if x]
+
+def main():
+    ap = argparse.ArgumentParser(description="Grid sweep over ALPHA, SVD_COMPONENTS and KNN_TOPK on a per-user holdout split")
+    ap.add_argument("--alpha", type=_floats, default=[ALPHA], help="comma-separated, e.g. 0.2,0.4,0.6,0.8")
+    ap.add_argument("--svd-components", type=_ints, default=[SVD_COMPONENTS], help="comma-separated, e.g. 50,100,200")
+    ap.add_argument("--knn-topk", type=_ints, default=[KNN_TOPK], help="comma-separated, e.g. 20,50,100")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--metric", default=None, help="leaderboard sort key (default ndcg@k; rmse sorts ascending)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--block-size", type=int, default=256)
+    ap.add_argument("--out", default=os.path.join(ARTIFACT_DIR, "sweep", "leaderboard.csv"))
+    args = ap.parse_args()
+
+    root = download_movielens_if_needed(DATA_DIR)
+    ratings, movies = load_movielens(root)
+    ratings = filter_min_counts(ratings)
+    train_df, test_df = user_stratified_split(ratings, random_state=RANDOM_SEED)
+    R, u_index, i_index = build_user_item_matrix(train_df)
+
+    t0 = time.perf_counter()
+    board = run_sweep(R, u_index, i_index, join_titles(movies), test_df, args.alpha, args.svd_components,
+                      args.knn_topk, k=args.k, block_size=args.block_size, workers=args.workers, metric=args.metric)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    board.to_csv(args.out, index=False)
+    print(board.head(10).to_string(index=False))
+    print(f"{len(board)} configurations in {time.perf_counter() - t0:.1f}s; leaderboard written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,32 @@
 import os, joblib
 import pandas as pd
-from src.config import DATA_DIR, ARTIFACT_DIR, RANDOM_SEED, TEST_SIZE
-from src.data_prep import download_movielens_if_needed, load_movielens, filter_min_counts, build_user_item_matrix, join_titles
-from src.recommender import train_and_pack, save_artifacts
+from src.config import DATA_DIR, ARTIFACT_DIR, RANDOM_SEED, TEST_SIZE, MF_BACKEND
+from src.data_prep import download_movielens_if_needed, load_movies, load_ratings_matrix, join_titles
+from src.recommender import train_and_pack, publish_artifacts, has_artifacts, load_artifacts
+from src.profiling import TrainReport
 
 def main():
-    root = download_movielens_if_needed(DATA_DIR)
-    ratings, movies = load_movielens(root)
-    ratings = filter_min_counts(ratings)
+    report = TrainReport()
+    with report.stage("load"):
+        root = download_movielens_if_needed(DATA_DIR)
+        movies = load_movies(root)
+        id_to_title = join_titles(movies)
 
-    R, u_index, i_index = build_user_item_matrix(ratings)
-    id_to_title = join_titles(movies)
+    # chunked two-pass CSV ingest on the first run, the binary ratings cache afterwards
+    with report.stage("matrix"):
+        R, u_index, i_index = load_ratings_matrix(root)
+    report.stages[-1]["n_ratings"] = int(R.nnz)
 
-    art = train_and_pack(R, u_index, i_index, id_to_title)
-    save_artifacts(art)
-    print(f"Artifacts saved to {ARTIFACT_DIR}/")
+    # ALS retrains start from the published model's item factors (memory-mapped, read once)
+    warm = load_artifacts() if MF_BACKEND == "als" and has_artifacts() else None
+    art = train_and_pack(R, u_index, i_index, id_to_title, movies=movies, report=report, warm_start=warm)
+    with report.stage("save"):
+        path = publish_artifacts(art)
+    print(f"Artifacts published to {path}/ (running servers swap to it on their next check)")
+
+    # wall-clock + peak RSS per stage, also kept next to the artifacts
+    print(report.format())
+    report.save(os.path.join(ARTIFACT_DIR, "train_report.json"))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import copy, time
+import numpy as np
+from typing import Dict, Any, Optional, Sequence
+
+def kmeans(X: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 42,
+           max_train: int = 256, block: int = 65536) -> np.ndarray:
+    # plain Lloyd iterations on a sample (max_train points per centroid), assignment in row blocks
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    sample = X[rng.choice(n, size=min(n, max_train * n_clusters), replace=False)].astype(np.float32)
+    C = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest_centroid(sample, C, block)
+        counts = np.bincount(assign, minlength=n_clusters)
+        sums = np.zeros_like(C)
+        np.add.at(sums, assign, sample)
+        empty = counts == 0
+        C[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            # reseed empty clusters from random points
+            C[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+    return C
+
+def _nearest_centroid(X: np.ndarray, C: np.ndarray, block: int = 65536) -> np.ndarray:
+    # argmin ||x - c||^2 == argmax (2 x.c - ||c||^2)
+    c2 = (C * C).sum(axis=1)
+    out = np.empty(X.shape[0], dtype=np.int64)
+    for s in range(0, X.shape[0], block):
+        out[s:s+block] = np.argmax(2 * (X[s:s+block] @ C.T) - c2, axis=1)
+    return out
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer + per-centroid lists of row ids.
+
+    metric="ip" ranks by inner product (user factor -> item retrieval); metric="cosine"
+    clusters the L2-normalized vectors and divides scores by the stored row norms. The
+    vectors themselves are not owned by the index (attach() them, e.g. svd.VT.T), so the
+    index adds only centroids, list offsets/ids and norms on top of the factors.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, metric: str = "ip", n_iter: int = 10, seed: int = 42):
+        if metric not in ("ip", "cosine"):
+            raise ValueError(f"Unknown metric {metric}")
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.metric = metric
+        self.n_iter = n_iter
+        self.seed = seed
+        self.vectors: Optional[np.ndarray] = None
+        self.norms: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_indptr: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None
+
+    def fit(self, X: np.ndarray):
+        self.norms = None
+        self.attach(X)
+        n = X.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        self.nlist = nlist = min(nlist, n)
+        Xc = X / self.norms[:, None] if self.metric == "cosine" else X
+        C = kmeans(Xc, nlist, n_iter=self.n_iter, seed=self.seed)
+        if self.metric == "cosine":
+            C /= np.linalg.norm(C, axis=1, keepdims=True) + 1e-12
+        assign = _nearest_centroid(Xc, C)
+        order = np.argsort(assign, kind="stable")
+        self.centroids = C.astype(np.float32)
+        self.list_ids = order.astype(np.int32)
+        self.list_indptr = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=self.list_indptr[1:])
+        return self
+
+    def attach(self, X: np.ndarray):
+        self.vectors = X
+        if self.metric == "cosine" and self.norms is None:
+            self.norms = (np.linalg.norm(X, axis=1) + 1e-12).astype(np.float32)
+        return self
+
+    def appended(self, X: np.ndarray) -> "IVFIndex":
+        # a copy of the index over X, whose rows past the indexed ones are new items (fold-ins):
+        # each goes into the list of its nearest centroid, centroids stay as fitted. self is
+        # left as it was, for searches still running against it
+        n = len(self.list_ids)
+        new = np.asarray(X[n:], dtype=np.float32)
+        out = copy.copy(self)
+        out.vectors = X
+        if self.metric == "cosine":
+            norms = (np.linalg.norm(new, axis=1) + 1e-12).astype(np.float32)
+            out.norms = np.concatenate([self.norms, norms])
+            new = new / norms[:, None]
+        assign = _nearest_centroid(new, self.centroids)
+        lists = np.concatenate([np.repeat(np.arange(self.nlist), np.diff(self.list_indptr)), assign])
+        order = np.argsort(lists, kind="stable")
+        out.list_ids = np.concatenate([self.list_ids, np.arange(n, X.shape[0], dtype=self.list_ids.dtype)])[order]
+        out.list_indptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=self.nlist), out=out.list_indptr[1:])
+        return out
+
+    def candidates(self, q: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        # row ids in the nprobe lists whose centroids score highest against q
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cs = self.centroids @ q
+        lists = np.argpartition(-cs, kth=nprobe - 1)[:nprobe]
+        return np.concatenate([self.list_ids[self.list_indptr[l]:self.list_indptr[l+1]] for l in lists])
+
+    def search(self, q: np.ndarray, k: int = 10, nprobe: Optional[int] = None, exclude=None,
+               mask: Optional[np.ndarray] = None):
+        # approximate top-k (ids, scores) for one query vector; mask (bool per row) drops probed rows
+        # before the top-k is taken
+        q = np.asarray(q, dtype=np.float32)
+        if self.metric == "cosine":
+            q = q / (np.linalg.norm(q) + 1e-12)
+        cand = self.candidates(q, nprobe)
+        scores = self.vectors[cand] @ q
+        if self.metric == "cosine":
+            scores = scores / self.norms[cand]
+        if exclude is not None and len(exclude):
+            keep = ~np.isin(cand, exclude)
+            cand, scores = cand[keep], scores[keep]
+        if mask is not None:
+            keep = mask[cand]
+            cand, scores = cand[keep], scores[keep]
+        if not len(cand):
+            return cand.astype(np.int64), scores
+        kk = min(k, len(cand))
+        top = np.argpartition(-scores, kth=kk - 1)[:kk]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return cand[top].astype(np.int64), scores[top]
+
+    def exact_search(self, q: np.ndarray, k: int = 10, exclude=None):
+        q = np.asarray(q, dtype=np.float32)
+        scores = self.vectors @ q
+        if self.metric == "cosine":
+            scores = scores / self.norms / (np.linalg.norm(q) + 1e-12)
+        if exclude is not None and len(exclude):
+            scores[np.asarray(exclude)] = -np.inf
+        kk = min(k, len(scores))
+        top = np.argpartition(-scores, kth=kk - 1)[:kk]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top.astype(np.int64), scores[top]
+
+    # --- persistence (see artifact_store); vectors are re-attached by the caller ---
+    def to_arrays(self, arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, Any]:
+        arrays[f"{prefix}_centroids"] = self.centroids
+        arrays[f"{prefix}_list_indptr"] = self.list_indptr
+        arrays[f"{prefix}_list_ids"] = self.list_ids
+        if self.norms is not None:
+            arrays[f"{prefix}_norms"] = self.norms
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "metric": self.metric,
+                "n_iter": self.n_iter, "seed": self.seed}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str, meta: Dict[str, Any], vectors: np.ndarray) -> "IVFIndex":
+        idx = cls(**meta)
+        idx.centroids = arrays[f"{prefix}_centroids"]
+        idx.list_indptr = arrays[f"{prefix}_list_indptr"]
+        idx.list_ids = arrays[f"{prefix}_list_ids"]
+        idx.norms = arrays.get(f"{prefix}_norms")
+        return idx.attach(vectors)
+
+def recall_report(index: IVFIndex, queries: np.ndarray, k: int = 10,
+                  nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> list:
+    # recall@k of the IVF search vs exact brute force, with mean per-query latency
+    exact, t0 = [], time.perf_counter()
+    for q in queries:
+        exact.append(set(index.exact_search(q, k)[0].tolist()))
+    exact_ms = (time.perf_counter() - t0) * 1000 / max(len(queries), 1)
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        hits, t0 = 0, time.perf_counter()
+        for q, truth in zip(queries, exact):
+            hits += len(truth & set(index.search(q, k, nprobe=nprobe)[0].tolist()))
+        ms = (time.perf_counter() - t0) * 1000 / max(len(queries), 1)
+        rows.append({"nprobe": nprobe, "recall": hits / max(sum(len(t) for t in exact), 1),
+                     "ms_per_query": ms, "exact_ms_per_query": exact_ms})
+    return rows
@@ -0,0 +1,63 @@
+from __future__ import annotations
+import os, json, shutil
+import numpy as np
+from typing import Dict, Any, Tuple
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    # one raw .npy per array plus a small manifest; written to a temp dir and renamed into place
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    entries = {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        np.save(os.path.join(tmp, f"{name}.npy"), arr, allow_pickle=False)
+        entries[name] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+    manifest = {"format": FORMAT_VERSION, "arrays": entries, "meta": meta}
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+def read_arrays(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    # arrays are opened read-only memory-mapped so workers share pages via the OS page cache
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')} in {path}")
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+              for name in manifest["arrays"]}
+    return arrays, manifest["meta"]
+
+def is_artifact_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+def pack_csr(arrays: Dict[str, np.ndarray], prefix: str, M) -> list:
+    M = M.tocsr()
+    arrays[f"{prefix}_data"] = M.data
+    arrays[f"{prefix}_indices"] = M.indices
+    arrays[f"{prefix}_indptr"] = M.indptr
+    return list(M.shape)
+
+def unpack_csr(arrays: Dict[str, np.ndarray], prefix: str, shape):
+    from scipy.sparse import csr_matrix
+    return csr_matrix((arrays[f"{prefix}_data"], arrays[f"{prefix}_indices"], arrays[f"{prefix}_indptr"]),
+                      shape=tuple(shape), copy=False)
+
+def pack_strings(arrays: Dict[str, np.ndarray], prefix: str, strings) -> None:
+    # variable-length strings as one utf-8 byte buffer plus int64 offsets
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays[f"{prefix}_offsets"] = offsets
+    arrays[f"{prefix}_bytes"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def unpack_strings(arrays: Dict[str, np.ndarray], prefix: str) -> list:
+    offsets = arrays[f"{prefix}_offsets"]
+    buf = bytes(arrays[f"{prefix}_bytes"])
+    return [buf[offsets[i]:offsets[i+1]].decode("utf-8") for i in range(len(offsets) - 1)]
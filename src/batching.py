@@ -0,0 +1,84 @@
+from __future__ import annotations
+import threading, time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+class _Slot:
+    __slots__ = ("item", "result", "done", "lead", "event")
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.done = False
+        self.lead = False
+        self.event = threading.Event()
+
+class Coalescer:
+    """Gathers concurrent calls arriving within a short window and runs them as one batch.
+
+    The first caller to arrive becomes the leader: it waits up to `window_ms` (or until
+    `max_batch` callers are queued), runs `batch_fn` on the gathered items and hands each
+    caller its own result. `batch_fn` takes a list of items and returns a same-length list
+    whose entries are results or exceptions (re-raised in the matching caller).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], window_ms: float = 2.0, max_batch: int = 64):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._cv = threading.Condition()
+        self._pending: List[_Slot] = []
+        self._leader = False
+        self._hist: Counter = Counter()
+
+    def submit(self, item):
+        slot = _Slot(item)
+        with self._cv:
+            self._pending.append(slot)
+            if not self._leader:
+                self._leader = True
+                slot.lead = True
+            elif len(self._pending) >= self.max_batch:
+                self._cv.notify_all()
+        while not slot.done:
+            if slot.lead:
+                slot.lead = False
+                self._run_batch()
+            else:
+                slot.event.wait()
+        if isinstance(slot.result, BaseException):
+            raise slot.result
+        return slot.result
+
+    def _run_batch(self):
+        deadline = time.monotonic() + self.window
+        with self._cv:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cv.wait(remaining)
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if self._pending:
+                # overflow: promote the next queued caller to lead the following batch
+                nxt = self._pending[0]
+                nxt.lead = True
+                nxt.event.set()
+            else:
+                self._leader = False
+            self._hist[len(batch)] += 1
+        try:
+            results = self.batch_fn([s.item for s in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for s, r in zip(batch, results):
+            s.result = r
+            s.done = True
+            s.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cv:
+            hist = dict(sorted(self._hist.items()))
+        return {"batches": sum(hist.values()),
+                "requests": sum(size * n for size, n in hist.items()),
+                "batch_size_histogram": {str(size): n for size, n in hist.items()}}
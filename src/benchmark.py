@@ -0,0 +1,158 @@
+from __future__ import annotations
+import os, platform, tempfile, time, tracemalloc
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .config import RANDOM_SEED, SVD_COMPONENTS, KNN_TOPK
+from .data_prep import build_user_item_matrix
+from .models.svd_model import SVDRecommender
+from .models.knn_model import ItemCosineKNN
+from .profiling import peak_rss_mb
+
+SCALE_KEYS = ("users", "items", "density", "zipf", "seed", "svd_components", "knn_topk")  # results are only comparable at equal scale
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "peak_alloc_mb")
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller", "Animation"]
+
+def synthetic_ratings(users: int, items: int, density: float, zipf: float = 1.0,
+                      seed: int = RANDOM_SEED) -> pd.DataFrame:
+    # MovieLens-shaped ratings: item popularity ~ rank^-zipf, users uniform, half-star ratings;
+    # duplicate (user, item) draws are dropped, so heavy skew lands a little under `density`
+    rng = np.random.default_rng(seed)
+    n = int(users * items * density)
+    weights = 1.0 / np.arange(1, items + 1) ** zipf
+    item = rng.permutation(items)[rng.choice(items, size=n, p=weights / weights.sum())]
+    user = rng.integers(0, users, size=n)
+    _, keep = np.unique(user.astype(np.int64) * items + item, return_index=True)
+    return pd.DataFrame({"userId": (user[keep] + 1).astype(np.int32), "movieId": (item[keep] + 1).astype(np.int32),
+                         "rating": (rng.integers(1, 11, size=len(keep)) / 2).astype(np.float32)})
+
+def synthetic_movies(items: int, seed: int = RANDOM_SEED) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    genres = ["|".join(sorted(rng.choice(GENRES, size=rng.integers(1, 4), replace=False))) for _ in range(items)]
+    return pd.DataFrame({"movieId": np.arange(1, items + 1), "title": [f"Synthetic Movie {i} (2000)" for i in range(1, items + 1)],
+                         "genres": genres})
+
+def latency_stats(samples: Sequence[float]) -> Dict[str, float]:
+    # per-call seconds -> ms percentiles and calls/s over the whole run
+    s = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(s, [50, 95, 99]) * 1000
+    return {"n": len(s), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(s.mean() * 1000), "throughput_per_s": float(len(s) / s.sum()) if s.sum() else float("inf")}
+
+def measure(fn: Callable[[Any], Any], args: Sequence[Any]) -> Dict[str, Any]:
+    """Runs ``fn(args[0])`` once under tracemalloc, then times ``fn(a)`` for every ``a`` in ``args``.
+
+    The traced call doubles as a warm-up; ``peak_alloc_mb`` is the peak Python/numpy heap growth
+    of that one call, ``peak_rss_mb`` the process high-water mark after the timed calls.
+    """
+    tracemalloc.start()
+    try:
+        fn(args[0])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    samples = []
+    for a in args:
+        t0 = time.perf_counter()
+        fn(a)
+        samples.append(time.perf_counter() - t0)
+    return {**latency_stats(samples), "peak_alloc_mb": peak / 2**20, "peak_rss_mb": peak_rss_mb()}
+
+def run_benchmarks(users: int = 2000, items: int = 1000, density: float = 0.02, zipf: float = 1.0,
+                   seed: int = RANDOM_SEED, requests: int = 200, fit_repeat: int = 1, k: int = 10,
+                   endpoints: bool = True, svd_components: int = SVD_COMPONENTS,
+                   knn_topk: int = KNN_TOPK) -> Dict[str, Any]:
+    """Times the training and serving hot paths on a synthetic rating matrix.
+
+    Fits (matrix build, SVD, KNN, artifact save/load) run ``fit_repeat`` times, scoring calls and
+    Flask endpoints (through the test client) ``requests`` times on random users and movies.
+    """
+    from .recommender import (train_and_pack, save_artifacts, load_artifacts, attach_topn,
+                              recommend_for_user, recommend_for_session, similar_items)
+    from .data_prep import join_titles
+    config = {"users": users, "items": items, "density": density, "zipf": zipf, "seed": seed,
+              "requests": requests, "fit_repeat": fit_repeat, "k": k, "svd_components": svd_components,
+              "knn_topk": knn_topk}
+    cases: Dict[str, Dict[str, Any]] = {}
+    ratings = synthetic_ratings(users, items, density, zipf, seed)
+    movies = synthetic_movies(items, seed)
+    fits = [None] * fit_repeat
+
+    cases["build_user_item_matrix"] = measure(lambda _: build_user_item_matrix(ratings), fits)
+    R, u_index, i_index = build_user_item_matrix(ratings)
+    rank = min(svd_components, R.shape[1] - 1)  # TruncatedSVD needs rank < n_items
+    cases["svd_fit"] = measure(lambda _: SVDRecommender(n_components=rank, random_state=seed).fit(R), fits)
+    cases["knn_fit"] = measure(lambda _: ItemCosineKNN(topk=knn_topk).fit(R), fits)
+    art = train_and_pack(R, u_index, i_index, join_titles(movies), movies=movies,
+                         svd_components=rank, knn_topk=knn_topk)
+
+    rng = np.random.default_rng(seed)
+    user_ids = rng.choice(art.users_sorted, size=requests).tolist()
+    movie_ids = rng.choice(art.items_sorted, size=requests).tolist()
+    sessions = [{int(m): 5.0 for m in rng.choice(art.items_sorted, size=5, replace=False)} for _ in range(requests)]
+    cases["recommend_for_user"] = measure(lambda u: recommend_for_user(art, u, k=k), user_ids)
+    cases["similar_items"] = measure(lambda m: similar_items(art, m, k=k), movie_ids)
+    cases["recommend_for_session"] = measure(lambda s: recommend_for_session(art, s, k=k), sessions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recsys")
+        cases["save_artifacts"] = measure(lambda _: save_artifacts(art, path), fits)
+        cases["load_artifacts"] = measure(lambda _: load_artifacts(path), fits)
+
+    if endpoints:
+        import app as server
+        served = server.ART
+        server._swap(attach_topn(art))
+        try:
+            client = server.app.test_client()
+            def get(url):
+                r = client.get(url)
+                assert r.status_code == 200, (url, r.status_code)
+            cases["GET /recommend/user"] = measure(lambda u: get(f"/recommend/user/{u}?k={k}"), user_ids)
+            cases["GET /similar"] = measure(lambda m: get(f"/similar/{m}?k={k}"), movie_ids)
+        finally:
+            server._swap(served)
+
+    return {"config": config, "shape": {"users": R.shape[0], "items": R.shape[1], "nnz": int(R.nnz)},
+            "env": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                    "cpus": os.cpu_count()},
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "cases": cases}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+            metrics: Sequence[str] = COMPARED) -> List[Dict[str, Any]]:
+    """Case/metric pairs that got worse than ``baseline`` by more than ``tolerance`` (0.25 = 25%).
+
+    Raises ValueError when the two runs were made at a different scale.
+    """
+    a = {key: current["config"].get(key) for key in SCALE_KEYS}
+    b = {key: baseline["config"].get(key) for key in SCALE_KEYS}
+    if a != b:
+        raise ValueError(f"Benchmark scale differs from the baseline: {a} vs {b}")
+    rows = []
+    for case, now in current["cases"].items():
+        then = baseline["cases"].get(case)
+        if then is None:
+            continue
+        for metric in metrics:
+            old, new = then.get(metric), now.get(metric)
+            if old is None or new is None:
+                continue
+            ratio = new / old if old else float("inf") if new else 1.0
+            rows.append({"case": case, "metric": metric, "baseline": old, "current": new, "ratio": ratio,
+                         "regression": ratio > 1 + tolerance})
+    return rows
+
+def format_results(results: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    lines = [f"{'case':<24}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}{'alloc MB':>10}"]
+    for name, c in results["cases"].items():
+        lines.append(f"{name:<24}{c['n']:>5}{c['p50_ms']:>10.2f}{c['p95_ms']:>10.2f}{c['p99_ms']:>10.2f}"
+                     f"{c['throughput_per_s']:>10.1f}{c['peak_alloc_mb']:>10.1f}")
+    shape = results["shape"]
+    lines.append(f"{shape['users']} users x {shape['items']} items, {shape['nnz']} ratings; "
+                 f"peak RSS {max(c['peak_rss_mb'] for c in results['cases'].values()):.0f} MB")
+    for row in comparison or []:
+        if row["regression"]:
+            lines.append(f"REGRESSION {row['case']} {row['metric']}: {row['baseline']:.2f} -> {row['current']:.2f} "
+                         f"(x{row['ratio']:.2f})")
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+import re, unicodedata
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Iterable
+
+from .artifact_store import pack_strings, unpack_strings
+
+NGRAM = 3
+NO_GENRES = "(no genres listed)"
+
+def normalize_title(s: str) -> str:
+    # lowercase, strip accents, collapse whitespace
+    s = unicodedata.normalize("NFKD", str(s))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", s.lower()).strip()
+
+def _grams(s: str) -> set:
+    return {s[i:i+NGRAM] for i in range(len(s) - NGRAM + 1)}
+
+class Catalog:
+    """In-memory title/genre index built once at training time and persisted with the artifacts.
+
+    Rows keep the order of movies.csv. Holds normalized titles, a character n-gram inverted
+    index (CSR postings, one row per gram) for substring and fuzzy lookup, and a genre bitmask
+    per movie parsed from the pipe-separated `genres` column.
+    """
+
+    def __init__(self, movie_ids: np.ndarray, titles: List[str], genre_names: List[str], genre_bits: np.ndarray,
+                 grams: List[str], post_indptr: np.ndarray, post_indices: np.ndarray,
+                 gram_counts: Optional[np.ndarray] = None):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.titles = titles
+        self.norm_titles = [normalize_title(t) for t in titles]
+        self.genre_names = genre_names
+        self.genre_bits = np.asarray(genre_bits, dtype=np.int64)
+        self.grams = grams
+        self.gram_row = {g: i for i, g in enumerate(grams)}
+        self.post_indptr = post_indptr
+        self.post_indices = post_indices
+        self._order = np.argsort(self.movie_ids, kind="stable")
+        if gram_counts is None:
+            gram_counts = np.array([len(_grams(t)) for t in self.norm_titles], dtype=np.int32)
+        self.gram_counts = gram_counts
+
+    @classmethod
+    def from_movies(cls, movies: pd.DataFrame) -> "Catalog":
+        genres_col = movies["genres"] if "genres" in movies else pd.Series([""] * len(movies))
+        return cls.build(movies["movieId"].to_numpy(), movies["title"].astype(str).tolist(), genres_col.fillna("").tolist())
+
+    @classmethod
+    def from_titles(cls, id_to_title: Dict[int, str]) -> "Catalog":
+        ids = sorted(id_to_title)
+        return cls.build(np.array(ids, dtype=np.int64), [str(id_to_title[m]) for m in ids], [""] * len(ids))
+
+    @classmethod
+    def build(cls, movie_ids, titles: List[str], genres: List[str]) -> "Catalog":
+        parsed = [[g for g in str(gs).split("|") if g and g != NO_GENRES] for gs in genres]
+        genre_names = sorted({g for gs in parsed for g in gs})
+        if len(genre_names) > 63:
+            raise ValueError(f"Too many genres for a 64-bit mask: {len(genre_names)}")
+        gpos = {g: i for i, g in enumerate(genre_names)}
+        genre_bits = np.array([sum(1 << gpos[g] for g in set(gs)) for gs in parsed], dtype=np.int64)
+
+        postings: Dict[str, List[int]] = {}
+        for row, t in enumerate(titles):
+            for g in _grams(normalize_title(t)):
+                postings.setdefault(g, []).append(row)
+        grams = sorted(postings)
+        lens = np.array([len(postings[g]) for g in grams], dtype=np.int64)
+        indptr = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(lens, out=indptr[1:])
+        indices = np.fromiter((r for g in grams for r in postings[g]), dtype=np.int32, count=int(indptr[-1]))
+        return cls(movie_ids, list(titles), genre_names, genre_bits, grams, indptr, indices)
+
+    # --- lookups ---
+    def _postings(self, gram: str) -> Optional[np.ndarray]:
+        row = self.gram_row.get(gram)
+        if row is None:
+            return None
+        return self.post_indices[self.post_indptr[row]:self.post_indptr[row+1]]
+
+    def search_rows(self, q: str, top: int = 10, fuzzy: bool = True, min_similarity: float = 0.3) -> np.ndarray:
+        # substring matches in catalog order; if none, best trigram-overlap matches
+        ql = normalize_title(q)
+        if not ql:
+            return np.arange(min(top, len(self.titles)))
+        qgrams = _grams(ql)
+        if not qgrams:
+            # shorter than one n-gram: plain scan
+            return np.array([i for i, t in enumerate(self.norm_titles) if ql in t][:top], dtype=np.int64)
+        lists = [self._postings(g) for g in qgrams]
+        if all(p is not None for p in lists):
+            lists.sort(key=len)
+            cand = lists[0]
+            for p in lists[1:]:
+                cand = np.intersect1d(cand, p, assume_unique=True)
+                if not len(cand):
+                    break
+            hits = [int(i) for i in cand if ql in self.norm_titles[i]]
+            if hits:
+                return np.array(hits[:top], dtype=np.int64)
+        if not fuzzy:
+            return np.array([], dtype=np.int64)
+        present = [p for p in lists if p is not None]
+        if not present:
+            return np.array([], dtype=np.int64)
+        rows, overlap = np.unique(np.concatenate(present), return_counts=True)
+        sim = overlap / (len(qgrams) + self.gram_counts[rows] - overlap)
+        keep = sim >= min_similarity
+        rows, sim = rows[keep], sim[keep]
+        order = np.argsort(-sim, kind="stable")[:top]
+        return rows[order]
+
+    def search(self, q: str, top: int = 10) -> pd.DataFrame:
+        rows = self.search_rows(q, top=top)
+        return pd.DataFrame({"movieId": self.movie_ids[rows],
+                             "title": [self.titles[i] for i in rows],
+                             "genres": [self.genres_of_row(i) for i in rows]})
+
+    def find_movie_id(self, q: str) -> Optional[int]:
+        rows = self.search_rows(q, top=1)
+        return int(self.movie_ids[rows[0]]) if len(rows) else None
+
+    def row_of(self, movie_id: int) -> Optional[int]:
+        pos = np.searchsorted(self.movie_ids, movie_id, sorter=self._order)
+        if pos < len(self._order) and self.movie_ids[self._order[pos]] == movie_id:
+            return int(self._order[pos])
+        return None
+
+    def rows_of(self, movie_ids) -> np.ndarray:
+        # vectorized row_of; -1 for ids not in the catalog
+        ids = np.asarray(movie_ids, dtype=np.int64)
+        if not len(self._order):
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.movie_ids, ids, sorter=self._order), len(self._order) - 1)
+        rows = self._order[pos]
+        return np.where(self.movie_ids[rows] == ids, rows, -1)
+
+    def item_genre_matrix(self, movie_ids):
+        # (len(movie_ids) x len(genre_names)) boolean CSR from the genre bitmasks, in the given order
+        from scipy.sparse import csr_matrix
+        rows = self.rows_of(movie_ids)
+        bits = np.where(rows >= 0, self.genre_bits[np.maximum(rows, 0)], 0)
+        dense = (bits[:, None] >> np.arange(len(self.genre_names))) & 1
+        return csr_matrix(dense.astype(bool))
+
+    def title_of(self, movie_id: int) -> Optional[str]:
+        row = self.row_of(movie_id)
+        return None if row is None else self.titles[row]
+
+    def genre_mask(self, genres: Iterable[str]) -> int:
+        # case-insensitive genre names -> bitmask; unknown names are ignored
+        lookup = {g.lower(): i for i, g in enumerate(self.genre_names)}
+        mask = 0
+        for g in genres:
+            i = lookup.get(str(g).lower())
+            if i is not None:
+                mask |= 1 << i
+        return mask
+
+    def genres_of_row(self, row: int) -> str:
+        bits = int(self.genre_bits[row])
+        names = [g for i, g in enumerate(self.genre_names) if bits >> i & 1]
+        return "|".join(names) if names else NO_GENRES
+
+    # --- persistence (see artifact_store) ---
+    def to_arrays(self, arrays: Dict[str, np.ndarray], prefix: str = "catalog") -> None:
+        arrays[f"{prefix}_movie_ids"] = self.movie_ids
+        arrays[f"{prefix}_genre_bits"] = self.genre_bits
+        arrays[f"{prefix}_post_indptr"] = self.post_indptr
+        arrays[f"{prefix}_post_indices"] = self.post_indices
+        arrays[f"{prefix}_gram_counts"] = self.gram_counts
+        pack_strings(arrays, f"{prefix}_titles", self.titles)
+        pack_strings(arrays, f"{prefix}_genre_names", self.genre_names)
+        pack_strings(arrays, f"{prefix}_grams", self.grams)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "catalog") -> "Catalog":
+        return cls(arrays[f"{prefix}_movie_ids"], unpack_strings(arrays, f"{prefix}_titles"),
+                   unpack_strings(arrays, f"{prefix}_genre_names"), arrays[f"{prefix}_genre_bits"],
+                   unpack_strings(arrays, f"{prefix}_grams"), arrays[f"{prefix}_post_indptr"],
+                   arrays[f"{prefix}_post_indices"], arrays[f"{prefix}_gram_counts"])
@@ -9,6 +9,12 @@ ALPHA = float(os.getenv("ALPHA", "0.6"))  # weight for SVD vs KNN hybrid
 # LLM
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # e.g. http://127.0.0.1:8089/v1 for src/llm_standin.py
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "2.0"))  # budget per parse; rule-based fallback after it
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "4096"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")  # JSON-lines file to persist parsed intents; empty = memory only
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "32"))  # distinct LLM calls running (one thread each); more are answered 503
 
 # Evaluation
 RANDOM_SEED = int(os.getenv("RANDOM_SEED", "42"))
@@ -19,3 +25,66 @@ MIN_USER_RATINGS = int(os.getenv("MIN_USER_RATINGS", "5"))
 MIN_ITEM_RATINGS = int(os.getenv("MIN_ITEM_RATINGS", "5"))
 KNN_TOPK = int(os.getenv("KNN_TOPK", "50"))
 SVD_COMPONENTS = int(os.getenv("SVD_COMPONENTS", "100"))
+# "float16" / "int8": quantized item factors for full-catalog SVD scans (shortlists re-scored in float32)
+SVD_QUANT = os.getenv("SVD_QUANT", "")
+
+# Matrix factorization backend: "svd" (TruncatedSVD) or "als" (src/models/als_model.py). ALS retrains
+# warm-start from the published model's item factors and then run ALS_WARM_ITERATIONS sweeps
+MF_BACKEND = os.getenv("MF_BACKEND", "svd")
+ALS_REG = float(os.getenv("ALS_REG", "0.1"))  # ridge weight, scaled by each row's rating count
+ALS_ITERATIONS = int(os.getenv("ALS_ITERATIONS", "15"))
+ALS_WARM_ITERATIONS = int(os.getenv("ALS_WARM_ITERATIONS", "3"))
+ALS_THREADS = int(os.getenv("ALS_THREADS", str(os.cpu_count() or 1)))
+
+# Streaming ingestion (src/data_prep.load_ratings_matrix): CSV chunk rows, binary cache location
+INGEST_CHUNKSIZE = int(os.getenv("INGEST_CHUNKSIZE", "1000000"))
+RATINGS_CACHE_DIR = os.getenv("RATINGS_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+
+# Two-stage recommend: candidates per generator, then hybrid re-ranking over their union
+CANDIDATES_SVD = int(os.getenv("CANDIDATES_SVD", "200"))
+CANDIDATES_KNN = int(os.getenv("CANDIDATES_KNN", "200"))
+CANDIDATES_POP = int(os.getenv("CANDIDATES_POP", "50"))
+
+# Anonymous sessions (POST /recommend/session): results kept per worker
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+# Precomputed top-N store (scripts/precompute_topn.py); served when present
+TOPN_DIR = os.getenv("TOPN_DIR", os.path.join(ARTIFACT_DIR, "topn"))
+TOPN_N = int(os.getenv("TOPN_N", "100"))
+
+# Approximate nearest neighbors over SVD factors (see src/ann.py)
+ANN_ENABLED = os.getenv("ANN_ENABLED", "0") == "1"
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0 -> sqrt(n_items)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+
+# Versioned artifacts: versions kept on publish, server poll interval for a new CURRENT (0 = off)
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+RELOAD_INTERVAL_S = float(os.getenv("RELOAD_INTERVAL_S", "10"))
+
+# Item-sharded scoring (src/sharding.py): ITEM_SHARDS > 0 publishes each model also split into that
+# many item ranges. SHARD_MODE "process" serves them from local worker processes on Unix sockets,
+# "remote" from already running workers at SHARD_ADDRESSES (host:port or socket paths, comma
+# separated, authenticated with SHARD_AUTHKEY); empty scores in-process as before
+ITEM_SHARDS = int(os.getenv("ITEM_SHARDS", "0"))
+SHARD_MODE = os.getenv("SHARD_MODE", "")
+SHARD_ADDRESSES = [a.strip() for a in os.getenv("SHARD_ADDRESSES", "").split(",") if a.strip()]
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "")
+
+# Serving: opt-in request coalescing (see src/batching.py)
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "0") == "1"
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+
+# ASGI serving (asgi_app.py): scoring threads sharing one Artifacts, and calls allowed to wait
+# for one beyond those; more concurrent scoring calls are answered 503
+SCORING_THREADS = int(os.getenv("SCORING_THREADS", str(min(8, os.cpu_count() or 1))))
+SCORING_QUEUE = int(os.getenv("SCORING_QUEUE", "64"))
+# largest accepted request body (both entry points); bigger ones are answered 413
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(1 << 20)))
+
+# Observability: GET /metrics (src/metrics.py); sampled cProfile dumps of 1 in PROFILE_SAMPLE_EVERY
+# requests (0 = off). PROFILE_CONTROL_PATH, when it exists, overrides the rate at runtime:
+# a JSON file like {"sample_every": 100}, re-read by every worker when it changes
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(ARTIFACT_DIR, "profiles"))
+PROFILE_CONTROL_PATH = os.getenv("PROFILE_CONTROL_PATH", os.path.join(ARTIFACT_DIR, "profiling.json"))
@@ -1,11 +1,13 @@
 from __future__ import annotations
-import os, zipfile, io, requests
+import os, zipfile, io, hashlib, requests
 import pandas as pd
 import numpy as np
 from scipy.sparse import csr_matrix
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterator
 
-from .config import DATA_DIR, MIN_USER_RATINGS, MIN_ITEM_RATINGS
+from .config import DATA_DIR, MIN_USER_RATINGS, MIN_ITEM_RATINGS, INGEST_CHUNKSIZE, RATINGS_CACHE_DIR
+from .catalog import Catalog
+from .id_map import IdMap
 
 MOVIELENS_URL = "https://files.grouplens.org/datasets/movielens/ml-latest-small.zip"
 
@@ -25,8 +27,10 @@ def download_movielens_if_needed(data_dir: str = DATA_DIR) -> str:
 
 def load_movielens(data_root: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
     ratings = pd.read_csv(os.path.join(data_root, "ratings.csv"))
-    movies = pd.read_csv(os.path.join(data_root, "movies.csv"))
-    return ratings, movies
+    return ratings, load_movies(data_root)
+
+def load_movies(data_root: str) -> pd.DataFrame:
+    return pd.read_csv(os.path.join(data_root, "movies.csv"))
 
 def filter_min_counts(ratings: pd.DataFrame) -> pd.DataFrame:
     # filter users/items with too few ratings to reduce sparsity and runtime (~30% improvement typical)
@@ -36,16 +40,93 @@ def filter_min_counts(ratings: pd.DataFrame) -> pd.DataFrame:
     r = r[r["movieId"].isin(i_counts[i_counts >= MIN_ITEM_RATINGS].index)]
     return r
 
-def build_user_item_matrix(ratings: pd.DataFrame) -> Tuple[csr_matrix, Dict[int,int], Dict[int,int]]:
-    users = np.sort(ratings["userId"].unique())
-    items = np.sort(ratings["movieId"].unique())
-    u_index = {u:i for i,u in enumerate(users)}
-    i_index = {m:i for i,m in enumerate(items)}
+def build_user_item_matrix(ratings: pd.DataFrame) -> Tuple[csr_matrix, IdMap, IdMap]:
+    return matrix_from_arrays(ratings["userId"].to_numpy(), ratings["movieId"].to_numpy(),
+                              ratings["rating"].to_numpy(dtype=np.float32))
+
+def matrix_from_arrays(user_ids: np.ndarray, movie_ids: np.ndarray, ratings: np.ndarray):
+    # dense indices from np.unique's inverse (sorted raw ids), no per-row dict lookups
+    users, row = np.unique(user_ids, return_inverse=True)
+    items, col = np.unique(movie_ids, return_inverse=True)
+    mat = csr_matrix((ratings.astype(np.float32, copy=False), (row, col)),
+                     shape=(len(users), len(items)), dtype=np.float32)
+    return mat, _index_map(users), _index_map(items)
+
+def _index_map(ids: np.ndarray) -> IdMap:
+    # ids are np.unique output, already sorted: the by-raw-id order is the identity
+    return IdMap(ids, np.arange(len(ids), dtype=np.int32))
+
+# ---- streaming ingestion for large ratings.csv files -------------------------------------------
+
+RATINGS_DTYPES = {"userId": np.int32, "movieId": np.int32, "rating": np.float32}
+
+def iter_ratings_chunks(path: str, chunksize: int = INGEST_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    # compact dtypes, timestamp column never parsed
+    yield from pd.read_csv(path, usecols=list(RATINGS_DTYPES), dtype=RATINGS_DTYPES, chunksize=chunksize)
+
+def _add_counts(counts: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    chunk = np.bincount(ids)
+    if len(chunk) > len(counts):
+        counts = np.concatenate([counts, np.zeros(len(chunk) - len(counts), dtype=counts.dtype)])
+    counts[:len(chunk)] += chunk
+    return counts
+
+def stream_filtered_ratings(path: str, min_user: int = MIN_USER_RATINGS, min_item: int = MIN_ITEM_RATINGS,
+                            chunksize: int = INGEST_CHUNKSIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Same rows as ``filter_min_counts(load_movielens(...)[0])`` without holding the raw table.
+
+    Pass 1 counts ratings per user and item; pass 2 keeps the rows passing both thresholds.
+    Returns (user_ids int32, movie_ids int32, ratings float32).
+    """
+    u_counts = np.zeros(0, dtype=np.int64)
+    i_counts = np.zeros(0, dtype=np.int64)
+    for chunk in iter_ratings_chunks(path, chunksize):
+        u_counts = _add_counts(u_counts, chunk["userId"].to_numpy())
+        i_counts = _add_counts(i_counts, chunk["movieId"].to_numpy())
+    keep_user = u_counts >= min_user
+    keep_item = i_counts >= min_item
+
+    users, items, values = [], [], []
+    for chunk in iter_ratings_chunks(path, chunksize):
+        u = chunk["userId"].to_numpy()
+        m = chunk["movieId"].to_numpy()
+        keep = keep_user[u] & keep_item[m]
+        users.append(u[keep])
+        items.append(m[keep])
+        values.append(chunk["rating"].to_numpy()[keep])
+    if not users:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.float32)
+    return np.concatenate(users), np.concatenate(items), np.concatenate(values)
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_ratings_matrix(data_root: str, cache_dir: str = RATINGS_CACHE_DIR, min_user: int = MIN_USER_RATINGS,
+                        min_item: int = MIN_ITEM_RATINGS, chunksize: int = INGEST_CHUNKSIZE):
+    """Filtered user x item matrix + id maps for ``data_root/ratings.csv``, via a binary cache.
+
+    The cache is an uncompressed ``.npz`` of the CSR arrays and sorted raw ids, keyed by the
+    SHA-1 of ratings.csv and the min-count thresholds, so later runs skip CSV parsing entirely.
+    """
+    src = os.path.join(data_root, "ratings.csv")
+    key = f"{file_digest(src)[:16]}-u{min_user}-i{min_item}"
+    cache = os.path.join(cache_dir, f"ratings-{key}.npz")
+    if os.path.exists(cache):
+        with np.load(cache, allow_pickle=False) as z:
+            mat = csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+            return mat, _index_map(z["user_ids"]), _index_map(z["item_ids"])
 
-    row = ratings["userId"].map(u_index).to_numpy()
-    col = ratings["movieId"].map(i_index).to_numpy()
-    data = ratings["rating"].astype(float).to_numpy()
-    mat = csr_matrix((data, (row, col)), shape=(len(users), len(items)))
+    u, m, r = stream_filtered_ratings(src, min_user, min_item, chunksize)
+    mat, u_index, i_index = matrix_from_arrays(u, m, r)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = cache + ".tmp.npz"
+    np.savez(tmp, data=mat.data, indices=mat.indices, indptr=mat.indptr, shape=np.array(mat.shape),
+             user_ids=u_index.ids, item_ids=i_index.ids)
+    os.replace(tmp, cache)
     return mat, u_index, i_index
 
 def join_titles(movies: pd.DataFrame) -> Dict[int,str]:
@@ -56,7 +137,7 @@ def compute_sparsity(mat: csr_matrix) -> float:
     total = mat.shape[0] * mat.shape[1]
     return 1.0 - nnz / total if total else 0.0
 
-def search_titles(movies: pd.DataFrame, q: str, top: int = 10) -> pd.DataFrame:
-    ql = q.lower()
-    m = movies[movies["title"].str.lower().str.contains(ql, na=False)]
-    return m.head(top).copy()
+def search_titles(movies, q: str, top: int = 10) -> pd.DataFrame:
+    # movies: a prebuilt Catalog (no I/O, n-gram index) or a raw movies DataFrame
+    catalog = movies if isinstance(movies, Catalog) else Catalog.from_movies(movies)
+    return catalog.search(q, top=top)
@@ -1,30 +1,124 @@
 from __future__ import annotations
+import os, tempfile
 import numpy as np
-from typing import Dict, Tuple
+import pandas as pd
+from multiprocessing import Pool
+from typing import Dict, Optional, Tuple
 from scipy.sparse import csr_matrix
-from sklearn.model_selection import train_test_split
+
+from .config import ALPHA
+from .id_map import IdMap
 
 def rmse(pred, truth):
     return np.sqrt(np.mean((pred - truth) ** 2))
 
 def precision_at_k(recommended: np.ndarray, heldout_true: set, k: int = 10) -> float:
-    if k == 0: 
+    if k == 0:
         return 0.0
     hits = sum(1 for item in recommended[:k] if item in heldout_true)
     return hits / k
 
 def user_stratified_split(ratings_df, test_size=0.2, random_state=42):
-    # per-user holdout of one rating if possible; rest to train
+    # per-user holdout of one random rating for users with at least two; rest to train.
+    # one lexsort by (user, random key) instead of a groupby loop
     rng = np.random.default_rng(random_state)
-    test_rows = []
-    train_mask = np.ones(len(ratings_df), dtype=bool)
-    for uid, grp in ratings_df.groupby("userId"):
-        idxs = grp.index.to_list()
-        if len(idxs) < 2:
-            continue
-        test_i = rng.choice(idxs, 1)[0]
-        test_rows.append(test_i)
-        train_mask[test_i] = False
-    test_df = ratings_df.loc[test_rows]
-    train_df = ratings_df.loc[train_mask]
-    return train_df, test_df
+    users = ratings_df["userId"].to_numpy()
+    order = np.lexsort((rng.random(len(users)), users))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = users[order[1:]] != users[order[:-1]]
+    starts = np.flatnonzero(first)
+    sizes = np.diff(np.append(starts, len(order)))
+    test_pos = order[starts[sizes >= 2]]
+    train_mask = np.ones(len(users), dtype=bool)
+    train_mask[test_pos] = False
+    return ratings_df.iloc[train_mask], ratings_df.iloc[np.sort(test_pos)]
+
+def map_ids(mapping, raw) -> np.ndarray:
+    # raw ids -> dense indices; -1 for ids not in the mapping (an IdMap, or a plain dict)
+    return IdMap.coerce(mapping).index(raw)
+
+def _test_indices(art, test_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    u = map_ids(art.u_index, test_df["userId"].to_numpy())
+    i = map_ids(art.i_index, test_df["movieId"].to_numpy())
+    ok = (u >= 0) & (i >= 0)
+    return u[ok], i[ok], test_df["rating"].to_numpy(dtype=np.float32)[ok]
+
+def rmse_on(art, test_df: pd.DataFrame) -> float:
+    # pointwise SVD predictions for the test pairs both seen in training, via fancy indexing
+    u, i, r = _test_indices(art, test_df)
+    return float(rmse(art.svd.predict(u, i), r)) if len(r) else float("nan")
+
+def heldout_matrix(art, test_df: pd.DataFrame) -> csr_matrix:
+    # (n_users x n_items) boolean ground truth of held-out items, in training index space
+    u, i, _ = _test_indices(art, test_df)
+    truth = csr_matrix((np.ones(len(u), dtype=bool), (u, i)), shape=art.R.shape)
+    truth.sum_duplicates()
+    return truth
+
+def _block_metrics(art, uidx: np.ndarray, truth: csr_matrix, k: int, alpha: float = ALPHA):
+    # per-block metric sums over users with held-out items, plus recommended item counts
+    from .recommender import recommend_block
+    recs = np.full((len(uidx), k), -1, dtype=np.int64)
+    for r, top in enumerate(recommend_block(art, uidx, k=k, alpha=alpha)):
+        recs[r, :len(top)] = top[:k]
+    hits = np.take_along_axis(truth[uidx].toarray(), np.maximum(recs, 0), axis=1) & (recs >= 0)
+    n_true = np.diff(truth[uidx].indptr)
+    discount = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits * discount).sum(axis=1)
+    idcg = np.cumsum(discount)[np.minimum(n_true, k) - 1]
+    cum_hits = np.cumsum(hits, axis=1)
+    ap = (hits * cum_hits / np.arange(1, k + 1)).sum(axis=1) / np.minimum(n_true, k)
+    n_hits = hits.sum(axis=1)
+    sums = {"precision": float((n_hits / k).sum()), "recall": float((n_hits / n_true).sum()),
+            "ndcg": float((dcg / idcg).sum()), "map": float(ap.sum()), "users": len(uidx)}
+    return sums, np.bincount(recs[recs >= 0], minlength=truth.shape[1])
+
+_art = None
+_truth = None
+
+def _init(model_dir, truth):
+    # each worker memory-maps the saved artifacts; only metric sums come back through pickling
+    global _art, _truth
+    from .recommender import load_artifacts
+    _art = load_artifacts(model_dir)
+    _truth = truth
+
+def _work(args):
+    uidx, k, alpha = args
+    return _block_metrics(_art, uidx, _truth, k, alpha)
+
+def ranking_metrics(art, truth: csr_matrix, k: int = 10, block_size: int = 256, workers: int = 1,
+                    model_dir: Optional[str] = None, alpha: float = ALPHA) -> Dict[str, float]:
+    """Precision@k, Recall@k, NDCG@k, MAP@k and catalog coverage over all users with held-out items.
+
+    Users are scored in blocks with the serving pipeline (``recommend_block``). With ``workers > 1``
+    the blocks are sharded over a process pool that memory-maps ``model_dir`` (the artifacts are
+    saved to a temporary directory first when it is not given).
+    """
+    users = np.flatnonzero(np.diff(truth.indptr) > 0)
+    blocks = [(users[s:s + block_size], k, alpha) for s in range(0, len(users), block_size)]
+    if workers > 1 and len(blocks) > 1:
+        with tempfile.TemporaryDirectory() as tmp:
+            if model_dir is None:
+                from .recommender import save_artifacts
+                model_dir = os.path.join(tmp, "recsys")
+                save_artifacts(art, model_dir)
+            with Pool(workers, initializer=_init, initargs=(model_dir, truth)) as pool:
+                parts = pool.map(_work, blocks)
+    else:
+        parts = [_block_metrics(art, uidx, truth, k, alpha) for uidx, _, _ in blocks]
+
+    n = sum(p["users"] for p, _ in parts)
+    out = {f"{name}@{k}": (sum(p[name] for p, _ in parts) / n if n else float("nan"))
+           for name in ("precision", "recall", "ndcg", "map")}
+    recommended = sum((c for _, c in parts), np.zeros(truth.shape[1], dtype=np.int64))
+    out["coverage"] = float((recommended > 0).mean()) if truth.shape[1] else float("nan")
+    out["users"] = n
+    return out
+
+def evaluate_model(art, test_df: pd.DataFrame, k: int = 10, block_size: int = 256, workers: int = 1,
+                   model_dir: Optional[str] = None, alpha: float = ALPHA) -> Dict[str, float]:
+    out = {"rmse": rmse_on(art, test_df)}
+    out.update(ranking_metrics(art, heldout_matrix(art, test_df), k=k, block_size=block_size,
+                               workers=workers, model_dir=model_dir, alpha=alpha))
+    return out
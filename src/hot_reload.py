@@ -0,0 +1,92 @@
+from __future__ import annotations
+import os, threading, time
+from typing import Any, Callable, Dict, Optional
+
+from .artifact_store import MANIFEST, is_artifact_dir
+from .metrics import observe_stage
+from .recommender import (Artifacts, MODEL_DIR, MODEL_PATH, load_artifacts, resolve_model_path,
+                          recommend_for_users, similar_items_many)
+
+def warm_up(art: Artifacts, n: int = 3) -> None:
+    # a few real scoring calls fault in the memory-mapped factors and neighbor graph and build
+    # the lazy caches (popularity order) before the first request sees this version
+    if len(art.users_sorted):
+        recommend_for_users(art, art.users_sorted[:n], k=10)
+    if len(art.items_sorted):
+        similar_items_many(art, art.items_sorted[:n], k=10)
+
+class ArtifactReloader:
+    """Keeps the served Artifacts in step with MODEL_DIR's CURRENT pointer.
+
+    `check()` loads a newly published version off the request path, runs `prepare` and a
+    warm-up on it, then hands it to `on_swap` (a single reference assignment in the server).
+    `start()` runs `check()` on a daemon thread every `interval` seconds. Requests already in
+    flight finish on the version they started with.
+    """
+
+    def __init__(self, root: str = MODEL_DIR, prepare: Optional[Callable[[Artifacts], Artifacts]] = None,
+                 on_swap: Optional[Callable[[Artifacts], None]] = None, warmup: int = 3):
+        self.root = root
+        self.prepare = prepare
+        self.on_swap = on_swap
+        self.warmup = warmup
+        self.art: Optional[Artifacts] = None
+        self._token = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {"version": None, "path": None, "loaded_at": None,
+                                        "load_seconds": None, "warmup_seconds": None,
+                                        "last_check": None, "last_error": None, "reloads": 0}
+
+    def _current_token(self):
+        # identifies what is on disk: the resolved version dir (or legacy file) and its mtime
+        path = resolve_model_path(self.root)
+        if is_artifact_dir(path):
+            return path, os.stat(os.path.join(path, MANIFEST)).st_mtime_ns
+        if os.path.exists(MODEL_PATH):
+            return MODEL_PATH, os.stat(MODEL_PATH).st_mtime_ns
+        return None
+
+    def check(self) -> bool:
+        # True when a new version was loaded and swapped in
+        with self._lock:
+            self._status["last_check"] = time.time()
+            try:
+                token = self._current_token()
+                if token is None or token == self._token:
+                    return False
+                t0 = time.perf_counter()
+                art = load_artifacts(self.root)
+                if self.prepare is not None:
+                    art = self.prepare(art)
+                t1 = time.perf_counter()
+                warm_up(art, self.warmup)
+                t2 = time.perf_counter()
+                observe_stage("load_artifacts", t1 - t0)
+                observe_stage("warm_up", t2 - t1)
+            except Exception as e:
+                # keep serving the previous version; retried on the next check
+                self._status["last_error"] = f"{type(e).__name__}: {e}"
+                return False
+            self.art = art
+            self._token = token
+            if self.on_swap is not None:
+                self.on_swap(art)
+            self._status.update(version=art.model_version, path=token[0], loaded_at=time.time(),
+                                load_seconds=t1 - t0, warmup_seconds=t2 - t1, last_error=None,
+                                reloads=self._status["reloads"] + 1)
+            return True
+
+    def start(self, interval: float) -> "ArtifactReloader":
+        if interval <= 0 or self._thread is not None:
+            return self
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.check()
+        self._thread = threading.Thread(target=loop, name="artifact-reloader", daemon=True)
+        self._thread.start()
+        return self
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self._status, watching=self._thread is not None)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .artifact_store import pack_strings
+
+def _compact(ids) -> np.ndarray:
+    # int32 when every id fits (MovieLens ids do), else int64; no copy when already compact
+    ids = np.asarray(ids)
+    if ids.dtype != np.int32 and (not len(ids) or (ids.min() >= np.iinfo(np.int32).min and ids.max() <= np.iinfo(np.int32).max)):
+        return ids.astype(np.int32)
+    return ids if ids.dtype in (np.int32, np.int64) else ids.astype(np.int64)
+
+class IdMap(Mapping):
+    """Raw id -> dense index over compact arrays instead of a dict.
+
+    `ids[i]` is the raw id of dense index i; `sorted_ids` / `order` are the same pairs ordered by
+    raw id for `searchsorted` lookups. Scalar access (`in`, `[]`, `get`, iteration in index order)
+    behaves like the dict it replaces; `index` and `raw` translate whole arrays at once.
+    """
+
+    def __init__(self, ids, order: Optional[np.ndarray] = None):
+        self.ids = _compact(ids)
+        if order is None:
+            order = np.argsort(self.ids, kind="stable").astype(np.int32)
+        # (sorted ids, their dense indices) as one tuple; maps are never changed after construction
+        self._lookup = (self.ids[order], np.asarray(order))
+
+    @classmethod
+    def from_dict(cls, mapping: Dict[int, int]) -> "IdMap":
+        ids = np.empty(len(mapping), dtype=np.int64)
+        ids[np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))] = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+        return cls(ids)
+
+    @classmethod
+    def coerce(cls, mapping) -> "IdMap":
+        return mapping if isinstance(mapping, IdMap) else cls.from_dict(mapping)
+
+    @property
+    def sorted_ids(self) -> np.ndarray:
+        return self._lookup[0]
+
+    # --- vectorized ---
+    def index(self, raw, missing: int = -1) -> np.ndarray:
+        # raw ids -> dense indices; `missing` for ids not in the map
+        sorted_ids, order = self._lookup
+        raw = np.asarray(raw, dtype=np.int64)
+        if not len(sorted_ids):
+            return np.full(raw.shape, missing, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_ids, raw), len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == raw, order[pos], missing).astype(np.int64, copy=False)
+
+    def raw(self, idx) -> np.ndarray:
+        # dense indices -> raw ids
+        return self.ids[np.asarray(idx, dtype=np.int64)].astype(np.int64, copy=False)
+
+    def appended(self, raw_ids: Iterable[int]) -> "IdMap":
+        # copy-on-write append: a new map with `raw_ids` (not in this one yet) at the next dense
+        # indices; this map is unchanged, so lookups running against it are unaffected
+        new = np.asarray(list(raw_ids), dtype=np.int64)
+        start = len(self.ids)
+        idx = np.arange(start, start + len(new))
+        sorted_ids, order = self._lookup
+        s = np.argsort(new, kind="stable")
+        pos = np.searchsorted(sorted_ids, new[s])
+        out = IdMap.__new__(IdMap)
+        out.ids = _compact(np.concatenate([self.ids, new]))
+        out._lookup = (np.insert(sorted_ids, pos, new[s]).astype(out.ids.dtype),
+                       np.insert(order, pos, idx[s]).astype(np.int32 if len(out.ids) < 2**31 else np.int64))
+        return out
+
+    # --- dict-like scalar access ---
+    def _find(self, key) -> int:
+        try:
+            key = int(key)
+        except (TypeError, ValueError):
+            return -1
+        sorted_ids, order = self._lookup
+        pos = int(np.searchsorted(sorted_ids, key))
+        return int(order[pos]) if pos < len(sorted_ids) and sorted_ids[pos] == key else -1
+
+    def __getitem__(self, key) -> int:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return i if i >= 0 else default
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- artifact directory format ---
+    def to_arrays(self, arrays: Dict[str, np.ndarray], prefix: str) -> None:
+        arrays[f"{prefix}_ids"] = self.ids
+        arrays[f"{prefix}_order"] = self._lookup[1]
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "IdMap":
+        # `<prefix>_order` is absent in artifacts written before it was stored
+        return cls(arrays[f"{prefix}_ids"], arrays.get(f"{prefix}_order"))
+
+class StringTable:
+    """Strings as one utf-8 byte buffer plus int64 offsets (the `pack_strings` layout)."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        arrays: Dict[str, np.ndarray] = {}
+        pack_strings(arrays, "s", [str(s) for s in strings])
+        return cls.from_arrays(arrays, "s")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return bytes(self.data[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def take(self, rows) -> List[str]:
+        return [self[int(r)] for r in rows]
+
+    def appended(self, strings: Iterable[str]) -> "StringTable":
+        extra = StringTable.from_strings(strings)
+        return StringTable(np.concatenate([self.offsets, extra.offsets[1:] + self.offsets[-1]]),
+                           np.concatenate([self.data, extra.data]))
+
+    def to_arrays(self, arrays: Dict[str, np.ndarray], prefix: str) -> None:
+        arrays[f"{prefix}_offsets"] = self.offsets
+        arrays[f"{prefix}_bytes"] = self.data
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "StringTable":
+        return cls(arrays[f"{prefix}_offsets"], arrays[f"{prefix}_bytes"])
+
+class TitleMap(Mapping):
+    """Raw movie id -> title: an IdMap over the movie ids and a StringTable in the same order."""
+
+    def __init__(self, ids: IdMap, table: StringTable):
+        self.ids = ids
+        self.table = table
+
+    @classmethod
+    def from_dict(cls, id_to_title: Dict[int, str]) -> "TitleMap":
+        ids = sorted(int(m) for m in id_to_title)
+        return cls(IdMap(np.array(ids, dtype=np.int64)), StringTable.from_strings(id_to_title[m] for m in ids))
+
+    @classmethod
+    def coerce(cls, mapping) -> "TitleMap":
+        return mapping if isinstance(mapping, TitleMap) else cls.from_dict(mapping)
+
+    def take(self, raw_ids) -> List[str]:
+        # titles for a batch of raw movie ids; a placeholder for ids without one
+        raw_ids = np.asarray(raw_ids, dtype=np.int64)
+        rows = self.ids.index(raw_ids)
+        return [self.table[int(r)] if r >= 0 else f"movieId {m}" for r, m in zip(rows.tolist(), raw_ids.tolist())]
+
+    def __getitem__(self, key) -> str:
+        return self.table[self.ids[key]]
+
+    def __contains__(self, key) -> bool:
+        return key in self.ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def appended(self, titles: Dict[int, str]) -> "TitleMap":
+        # copy-on-write: a new map that also holds the ids of `titles` it lacks; this one is unchanged
+        new = [int(m) for m in titles if m not in self.ids]
+        return TitleMap(self.ids.appended(new), self.table.appended(titles[m] for m in new))
+
+    def to_arrays(self, arrays: Dict[str, np.ndarray], prefix: str = "title") -> None:
+        self.ids.to_arrays(arrays, prefix)
+        self.table.to_arrays(arrays, prefix + "s")
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "title") -> "TitleMap":
+        return cls(IdMap.from_arrays(arrays, prefix), StringTable.from_arrays(arrays, prefix + "s"))
@@ -1,7 +1,18 @@
 from __future__ import annotations
-import os, re, json
+import os, re, json, asyncio, threading, time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import Dict, Any, Optional, List
-from .config import OPENAI_API_KEY, OPENAI_MODEL
+from .config import (OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL, LLM_TIMEOUT_S, LLM_CACHE_SIZE, LLM_CACHE_TTL_S,
+                     LLM_CACHE_PATH, LLM_MAX_INFLIGHT)
+from .metrics import METRICS, stage_timer
+from .scoring_pool import Overloaded
+
+SYSTEM_PROMPT = (
+    "You translate movie queries into JSON with fields: "
+    "{intent: 'recommend'|'similar'|'filter', seed_movie: string|null, genres: string[], k: number}. "
+    "Be terse; respond with ONLY JSON."
+)
 
 def _fallback_parse(query: str) -> Dict[str, Any]:
     # naive heuristics: look for 'like <Title>' and genres keywords
@@ -19,32 +30,182 @@ def _fallback_parse(query: str) -> Dict[str, Any]:
     intent = "similar" if "like " in lower or "similar" in lower else "recommend"
     return {"intent": intent, "seed_movie": seed, "genres": picked, "k": k}
 
-def parse_with_openai(query: str) -> Dict[str, Any]:
-    if not OPENAI_API_KEY:
+def normalize_query(query: str) -> str:
+    # cache key: case, surrounding punctuation and runs of whitespace don't change the intent
+    return re.sub(r"\s+", " ", query.strip().strip(".!?").lower())
+
+class ParseCache:
+    """LRU of parsed intents with a TTL, optionally persisted as append-only JSON lines.
+
+    The file is replayed (expired entries dropped) and rewritten compactly on startup, and again
+    once a worker has seen it reach twice the LRU size. Workers sharing one file each count their
+    own appends, so it stays within about twice the LRU size per worker.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL_S, path: str = LLM_CACHE_PATH):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.path = path or None
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._lines = 0  # lines in the file as of the last compaction, plus this process's appends
+        if self.path and os.path.exists(self.path):
+            self._data = self._compact()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            ts, value = hit
+            if time.time() - ts > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return dict(value)
+
+    def put(self, key: str, value: Dict[str, Any], ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._data[key] = (ts, dict(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps({"q": key, "ts": ts, "v": value}) + "\n")
+                self._lines += 1
+                if self._lines >= 2 * self.maxsize:
+                    self._compact()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _compact(self) -> "OrderedDict[str, tuple]":
+        # replay the file, other workers' lines included (expired entries dropped, the latest
+        # maxsize kept), and rewrite it one line per entry; returns the replayed entries
+        entries: "OrderedDict[str, tuple]" = OrderedDict()
+        now = time.time()
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line from a crash
+                if now - rec["ts"] <= self.ttl:
+                    entries[rec["q"]] = (rec["ts"], rec["v"])
+                    entries.move_to_end(rec["q"])
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        tmp = f"{self.path}.{os.getpid()}.tmp"  # workers compacting at once do not share a temp file
+        with open(tmp, "w") as f:
+            for q, (ts, v) in entries.items():
+                f.write(json.dumps({"q": q, "ts": ts, "v": v}) + "\n")
+        os.replace(tmp, self.path)
+        self._lines = len(entries)
+        return entries
+
+_client = None
+_client_lock = threading.Lock()
+# one thread per admitted call, so no admitted call waits in the executor queue while its budget runs
+_executor = ThreadPoolExecutor(max_workers=max(1, LLM_MAX_INFLIGHT), thread_name_prefix="llm")
+CACHE = ParseCache()
+STATS: Counter = Counter()
+_inflight: Dict[str, Any] = {}  # normalized query -> future of its LLM call, shared by concurrent misses
+_inflight_lock = threading.Lock()
+
+def get_client():
+    # one OpenAI client (and its HTTP connection pool) for the process lifetime
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Lazy import to avoid hard dep if key not set
+                from openai import OpenAI
+                _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None,
+                                 timeout=LLM_TIMEOUT_S, max_retries=0)
+    return _client
+
+def _call_llm(query: str) -> Dict[str, Any]:
+    resp = get_client().chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[{"role":"system","content":SYSTEM_PROMPT},{"role":"user","content":f"Query: {query}"}],
+        response_format={"type":"json_object"},
+        temperature=0
+    )
+    data = json.loads(resp.choices[0].message.content)
+    # light validation
+    data.setdefault("intent", "recommend")
+    data.setdefault("genres", [])
+    data.setdefault("seed_movie", None)
+    data.setdefault("k", 10)
+    return data
+
+def parse_with_openai(query: str, budget: float = LLM_TIMEOUT_S) -> Dict[str, Any]:
+    # cached intent, else the LLM within `budget` seconds, else the rule-based parser; a reply
+    # that lands after the budget still fills the cache for the next identical query
+    with stage_timer("llm_parse"):
+        if not OPENAI_API_KEY:
+            return _fallback_parse(query)
+        hit, future = _lookup_or_submit(query)
+        if hit is not None:
+            return hit
+        try:
+            return dict(future.result(timeout=budget))
+        except FutureTimeout:
+            STATS["timeout"] += 1
+        except Exception:
+            STATS["error"] += 1
         return _fallback_parse(query)
-    try:
-        # Lazy import to avoid hard dep if key not set
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        system = (
-            "You translate movie queries into JSON with fields: "
-            "{intent: 'recommend'|'similar'|'filter', seed_movie: string|null, genres: string[], k: number}. "
-            "Be terse; respond with ONLY JSON."
-        )
-        user = f"Query: {query}"
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[{"role":"system","content":system},{"role":"user","content":user}],
-            response_format={"type":"json_object"},
-            temperature=0
-        )
-        txt = resp.choices[0].message.content
-        data = json.loads(txt)
-        # light validation
-        data.setdefault("intent", "recommend")
-        data.setdefault("genres", [])
-        data.setdefault("seed_movie", None)
-        data.setdefault("k", 10)
-        return data
-    except Exception:
+
+async def parse_with_openai_async(query: str, budget: float = LLM_TIMEOUT_S) -> Dict[str, Any]:
+    # parse_with_openai for an event loop: the LLM call runs on the same executor and is awaited,
+    # so the loop keeps serving while it is in flight
+    with stage_timer("llm_parse"):
+        if not OPENAI_API_KEY:
+            return _fallback_parse(query)
+        hit, future = _lookup_or_submit(query)
+        if hit is not None:
+            return hit
+        try:
+            # shield: a timeout abandons the wait, not the call, whose reply still fills the cache
+            return dict(await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), budget))
+        except asyncio.TimeoutError:
+            STATS["timeout"] += 1
+        except Exception:
+            STATS["error"] += 1
         return _fallback_parse(query)
+
+def _lookup_or_submit(query: str):
+    # (cached parse, None) on a hit, else (None, future of the LLM call). Concurrent misses on one
+    # normalized query share a single call; a new call beyond LLM_MAX_INFLIGHT raises Overloaded
+    # (a 503) instead of queueing on the executor, whose abandoned calls keep running past their budget
+    key = normalize_query(query)
+    hit = CACHE.get(key)
+    if hit is not None:
+        STATS["hit"] += 1
+        return hit, None
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            STATS["coalesced"] += 1
+            return None, future
+        if len(_inflight) >= LLM_MAX_INFLIGHT:
+            STATS["rejected"] += 1
+            METRICS.inc("recsys_llm_rejected_total")
+            raise Overloaded(f"{len(_inflight)} LLM calls in flight")
+        STATS["miss"] += 1
+        future = _inflight[key] = _executor.submit(_call_llm, query)
+    future.add_done_callback(lambda f: _finish(key, f))
+    return None, future
+
+def _finish(key: str, future) -> None:
+    # cache first, so a query arriving after the in-flight entry is gone finds the reply
+    if future.exception() is None:
+        CACHE.put(key, future.result())
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+def cache_stats() -> Dict[str, Any]:
+    return {"enabled": bool(OPENAI_API_KEY), "size": len(CACHE), "inflight": len(_inflight),
+            "limit": LLM_MAX_INFLIGHT, **STATS}
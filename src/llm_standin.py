@@ -0,0 +1,76 @@
+from __future__ import annotations
+import argparse, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .llm_interface import _fallback_parse
+
+class _Handler(BaseHTTPRequestHandler):
+    # answers POST .../chat/completions in the OpenAI response shape; the "model" is the
+    # rule-based parser, so replies are deterministic for a given query
+    server: "StandinServer"
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        user = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        self.server.requests += 1
+        time.sleep(self.server.delay())
+        content = json.dumps(_fallback_parse(user.removeprefix("Query: ")))
+        payload = json.dumps({
+            "id": f"chatcmpl-standin-{self.server.requests}", "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model", "standin"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+class StandinServer(ThreadingHTTPServer):
+    """Local stand-in for the chat-completions endpoint with configurable latency.
+
+    Point the app at it with OPENAI_BASE_URL=http://<host>:<port>/v1 and any OPENAI_API_KEY.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8089, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, seed: Optional[int] = 0):
+        super().__init__((host, port), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._rng = random.Random(seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def start(self) -> "StandinServer":
+        threading.Thread(target=self.serve_forever, name="llm-standin", daemon=True).start()
+        return self
+
+def main():
+    ap = argparse.ArgumentParser(description="Local deterministic stand-in for the OpenAI chat-completions API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    server = StandinServer(args.host, args.port, args.latency_ms, args.jitter_ms)
+    print(f"Serving chat completions at {server.base_url} ({args.latency_ms:.0f} ms ± {args.jitter_ms:.0f})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
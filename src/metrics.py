@@ -0,0 +1,218 @@
+from __future__ import annotations
+import bisect, cProfile, json, os, threading, time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import PROFILE_SAMPLE_EVERY, PROFILE_DIR, PROFILE_CONTROL_PATH
+from .profiling import peak_rss_mb
+
+# seconds; hot-path stages are sub-millisecond to a few hundred ms, loads and LLM calls longer
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+class Metrics:
+    """Process-wide latency histograms and counters, rendered in the Prometheus text format.
+
+    Recording is a perf_counter pair, a bisect and a few additions under one lock, so it is
+    cheap enough to leave on around every hot-path stage.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._hists: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._help: Dict[str, str] = {}
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = Histogram(len(self.buckets))
+            h.counts[slot] += 1
+            h.sum += seconds
+            h.count += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def inc(self, name: str, n: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+            self._counters.clear()
+
+    def render(self, gauges: Iterable[Tuple[str, Dict[str, Any], float]] = ()) -> str:
+        # gauges: (name, labels, value) computed by the caller at scrape time
+        with self._lock:
+            hists = {k: (list(h.counts), h.sum, h.count) for k, h in self._hists.items()}
+            counters = dict(self._counters)
+        lines: List[str] = []
+        seen = set()
+        def head(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), (counts, total, count) in sorted(hists.items()):
+            head(name, "histogram")
+            cum = 0
+            for le, c in zip(list(self.buckets) + ["+Inf"], counts):
+                cum += c
+                lines.append(f"{name}_bucket{_fmt(labels + (('le', str(le)),))} {cum}")
+            lines.append(f"{name}_sum{_fmt(labels)} {total}")
+            lines.append(f"{name}_count{_fmt(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            head(name, "counter")
+            lines.append(f"{name}{_fmt(labels)} {value:g}")
+        for name, labels, value in gauges:
+            head(name, "gauge")
+            lines.append(f"{name}{_fmt(tuple(sorted(labels.items())))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+METRICS = Metrics()
+METRICS.describe("recsys_stage_seconds", "Time spent per recommender stage")
+METRICS.describe("recsys_http_request_seconds", "Request latency per route")
+METRICS.describe("recsys_http_requests_total", "Requests per route and status")
+
+def stage_timer(stage: str):
+    return METRICS.timer("recsys_stage_seconds", stage=stage)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    METRICS.observe("recsys_stage_seconds", seconds, stage=stage)
+
+def rss_bytes() -> int:
+    # current resident set size (Linux /proc); the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return int(peak_rss_mb() * 2**20)
+
+@lru_cache(maxsize=8)
+def dir_size_bytes(path: str) -> int:
+    # published artifact versions never change in place, so one walk per path
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def serving_gauges(art, status: Dict[str, Any], llm_stats: Optional[Dict[str, int]] = None) -> List[Tuple[str, Dict[str, Any], float]]:
+    # scrape-time gauges shared by the Flask and ASGI /metrics routes; `status` is ArtifactReloader.status()
+    gauges = [("recsys_process_resident_memory_bytes", {}, rss_bytes()),
+              ("recsys_process_peak_resident_memory_bytes", {}, peak_rss_mb() * 2**20)]
+    gauges += [("recsys_llm_parse_events", {"event": name}, n) for name, n in sorted((llm_stats or {}).items())]
+    if art is not None:
+        gauges += [("recsys_model_info", {"version": art.model_version or ""}, 1),
+                   ("recsys_model_users", {}, art.R.shape[0]), ("recsys_model_items", {}, art.R.shape[1])]
+        if status.get("loaded_at"):
+            gauges.append(("recsys_model_loaded_timestamp_seconds", {}, status["loaded_at"]))
+        if status.get("path") and os.path.isdir(status["path"]):
+            gauges.append(("recsys_model_artifact_bytes", {}, dir_size_bytes(status["path"])))
+    return gauges
+
+class ProfileSampler:
+    """Profiles 1 in `every` requests with cProfile and dumps each to `out_dir` as .pstats.
+
+    `every` comes from PROFILE_SAMPLE_EVERY and can be changed without a restart through the
+    JSON control file ({"sample_every": N}, 0 turns it off), checked at most once a second.
+    Only one request per process is profiled at a time.
+    """
+
+    def __init__(self, every: int = PROFILE_SAMPLE_EVERY, out_dir: str = PROFILE_DIR,
+                 control_path: Optional[str] = PROFILE_CONTROL_PATH, check_interval: float = 1.0):
+        self.every = every
+        self.out_dir = out_dir
+        self.control_path = control_path
+        self.check_interval = check_interval
+        self._n = 0
+        self._checked = 0.0
+        self._mtime = None
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if not self.control_path or now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.control_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._mtime = mtime
+            try:
+                with open(self.control_path) as f:
+                    self.every = int(json.load(f).get("sample_every", 0))
+            except (OSError, ValueError, AttributeError):
+                pass  # half-written or malformed; keep the current rate
+
+    def start(self) -> Optional[cProfile.Profile]:
+        # a running profiler when this request is sampled, else None
+        with self._lock:
+            self._refresh()
+            if self.every <= 0:
+                return None
+            self._n += 1
+            if self._n % self.every:
+                return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:  # another profiler is active in this interpreter
+            self._busy.release()
+            return None
+        return prof
+
+    def stop(self, prof: cProfile.Profile, name: str) -> str:
+        prof.disable()
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            safe = "".join(c if c.isalnum() else "_" for c in name).strip("_") or "request"
+            path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{safe}.pstats")
+            prof.dump_stats(path)
+        finally:
+            self._busy.release()
+        METRICS.inc("recsys_profiles_total")
+        return path
+
+    def status(self) -> Dict[str, Any]:
+        return {"sample_every": self.every, "out_dir": self.out_dir, "control_path": self.control_path}
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import csr_matrix
+from typing import Callable, Dict, List, Optional
+
+from .svd_model import SVDRecommender, center_rows, quantize_rows
+
+def _solve_rows(X: csr_matrix, F: np.ndarray, reg: float, pool: ThreadPoolExecutor,
+                block_nnz: int) -> np.ndarray:
+    """Ridge solution per row of X against fixed factors F (one row per column of X).
+
+    Row r gets (F_r^T F_r + reg * n_r * I)^-1 F_r^T x_r over its observed entries only. Rows are
+    cut into blocks of about `block_nnz` ratings that run on `pool`. Inside a block, rows with at
+    most k ratings are padded to a common width and solved together: one batched matmul builds
+    their Gram matrices and one batched np.linalg.solve solves them, `block_nnz // k` rows at a
+    time so the (rows, k, k) stacks stay near block_nnz * k floats. Heavier rows use one GEMM each.
+    """
+    n, k = X.shape[0], F.shape[1]
+    out = np.zeros((n, k), dtype=np.float32)
+    eye = np.eye(k, dtype=np.float32)
+    counts = np.diff(X.indptr)
+    Fz = np.vstack([F, np.zeros((1, k), dtype=F.dtype)])  # row -1 is the zero padding
+    batch = max(1, block_nnz // k)
+
+    def work(lo: int, hi: int) -> None:
+        c = counts[lo:hi]
+        light = np.flatnonzero((c > 0) & (c <= k)) + lo
+        for s in range(0, len(light), batch):
+            rows = light[s:s + batch]
+            n_r = counts[rows]
+            span = np.arange(int(n_r.max()))
+            pad = span >= n_r[:, None]
+            pos = np.where(pad, 0, X.indptr[rows][:, None] + span)
+            Fi = Fz[np.where(pad, -1, X.indices[pos])]  # (rows, width, k)
+            A = np.matmul(Fi.transpose(0, 2, 1), Fi)
+            A += (reg * n_r).astype(np.float32)[:, None, None] * eye
+            b = np.einsum("rwk,rw->rk", Fi, np.where(pad, 0, X.data[pos]).astype(np.float32))
+            out[rows] = np.linalg.solve(A, b[..., None])[..., 0]
+        for r in np.flatnonzero(c > k) + lo:
+            a, z = X.indptr[r], X.indptr[r + 1]
+            Fi = F[X.indices[a:z]]
+            out[r] = np.linalg.solve(Fi.T @ Fi + np.float32(reg * (z - a)) * eye, Fi.T @ X.data[a:z])
+
+    # block boundaries on the cumulative rating count, so blocks carry similar work
+    bounds = np.unique(np.concatenate([[0], np.searchsorted(X.indptr, np.arange(block_nnz, X.nnz, block_nnz)), [n]]))
+    list(pool.map(lambda lh: work(*lh), zip(bounds[:-1].tolist(), bounds[1:].tolist())))
+    return out
+
+def _train_rmse(X: csr_matrix, U: np.ndarray, V: np.ndarray, chunk: int = 1 << 20) -> float:
+    # RMSE of U V^T on the observed (centered) entries, in chunks of ratings
+    if not X.nnz:
+        return 0.0
+    rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    sse = 0.0
+    for s in range(0, X.nnz, chunk):
+        pred = np.einsum("ij,ij->i", U[rows[s:s + chunk]], V[X.indices[s:s + chunk]])
+        sse += float(np.square(X.data[s:s + chunk] - pred, dtype=np.float64).sum())
+    return float(np.sqrt(sse / X.nnz))
+
+def warm_start_factors(prev_VT: np.ndarray, prev_items, items, n_components: int) -> Optional[np.ndarray]:
+    # previous item factors (k x n_prev_items) re-indexed to a new item IdMap by raw movie id;
+    # movies new since then start at zero. None when the rank changed
+    if prev_VT.shape[0] != n_components:
+        return None
+    prev = prev_items.index(items.ids)
+    init = np.zeros((n_components, len(items)), dtype=np.float32)
+    init[:, prev >= 0] = prev_VT[:, prev[prev >= 0]]
+    return init
+
+class ALSRecommender(SVDRecommender):
+    """Regularized alternating least squares on the user-mean-centered observed ratings.
+
+    A drop-in for SVDRecommender: the same U / VT / user_means layout and scoring methods, so
+    train_and_pack, the hybrid re-ranker, quantization, sharding and fold-ins work unchanged.
+    Unlike TruncatedSVD, missing entries are left out of the loss rather than read as zeros.
+    Each sweep solves every user row, then every item column, as blocked ridge regressions on
+    a thread pool (NumPy's LAPACK and BLAS calls release the GIL). `fit(R, init_VT=...)`
+    warm-starts from earlier item factors (see warm_start_factors), so a retrain on slightly
+    changed data needs a few sweeps instead of a cold fit.
+    """
+    backend = "als"
+
+    def __init__(self, n_components: int = 100, random_state: int = 42, reg: float = 0.1,
+                 threads: int = 1, block_nnz: int = 1 << 16):
+        super().__init__(n_components=n_components, random_state=random_state)
+        self.reg = reg
+        self.threads = threads
+        self.block_nnz = block_nnz
+        self.history: List[Dict[str, float]] = []  # per sweep: seconds, train RMSE
+
+    def params(self) -> dict:
+        return dict(super().params(), reg=self.reg)
+
+    def fit(self, R: csr_matrix, init_VT: Optional[np.ndarray] = None, iterations: int = 15,
+            tol: float = 1e-4, callback: Optional[Callable[[int, "ALSRecommender"], None]] = None):
+        # stops early once a sweep improves the training RMSE by less than `tol` (relative)
+        self.user_means, X = center_rows(R)
+        XT = X.T.tocsr()
+        k = min(self.n_components, min(X.shape))
+        if init_VT is not None and init_VT.shape == (k, X.shape[1]):
+            V = np.ascontiguousarray(init_VT.T, dtype=np.float32)
+        else:
+            rng = np.random.default_rng(self.random_state)
+            V = (rng.standard_normal((X.shape[1], k)) / np.sqrt(k)).astype(np.float32)
+        self.history = []
+        prev = None
+        with ThreadPoolExecutor(max(1, self.threads), thread_name_prefix="als") as pool:
+            for it in range(iterations):
+                t0 = time.perf_counter()
+                U = _solve_rows(X, V, self.reg, pool, self.block_nnz)
+                V = _solve_rows(XT, U, self.reg, pool, self.block_nnz)
+                err = _train_rmse(X, U, V)
+                self.history.append({"iteration": it + 1, "seconds": time.perf_counter() - t0, "train_rmse": err})
+                self.U, self.VT = U, np.ascontiguousarray(V.T)
+                if callback is not None:
+                    callback(it + 1, self)
+                if prev is not None and prev - err < tol * prev:
+                    break
+                prev = err
+        return self
+
+    def truncated(self, n_components: int) -> "ALSRecommender":
+        # ALS components carry no ordering by importance, so only the full rank is a valid view
+        if n_components < self.VT.shape[0]:
+            raise ValueError("ALS factors cannot be truncated; refit at the smaller rank")
+        return super().truncated(n_components)
+
+    def project(self, items, ratings, center: float) -> np.ndarray:
+        # the same ridge solve a training sweep does for one user row, against the item factors
+        items = np.asarray(items, dtype=np.int64)
+        x = np.asarray(ratings, dtype=np.float32) - np.float32(center)
+        Vi = self.VT[:, items]
+        A = Vi @ Vi.T + np.float32(self.reg * max(len(items), 1)) * np.eye(Vi.shape[0], dtype=np.float32)
+        return np.linalg.solve(A, Vi @ x).astype(np.float32)
+
+    def fold_in_items(self, raters, ratings) -> None:
+        # one ridge solve per new item column against the fixed user factors
+        if not len(raters):
+            return
+        k = self.VT.shape[0]
+        cols = np.zeros((k, len(raters)), dtype=np.float32)
+        for c, (users, vals) in enumerate(zip(raters, ratings)):
+            users = np.asarray(users, dtype=np.int64)
+            seen = users < self.U.shape[0]
+            users, vals = users[seen], np.asarray(vals, dtype=np.float32)[seen]
+            if not len(users):
+                continue
+            Ui = self.U[users]
+            A = Ui.T @ Ui + np.float32(self.reg * len(users)) * np.eye(k, dtype=np.float32)
+            cols[:, c] = np.linalg.solve(A, Ui.T @ (vals - self.user_means[users]))
+        self.VT = np.hstack([self.VT, cols])
+        if self.quant:
+            q, scale = quantize_rows(cols.T, self.quant)
+            self.item_q = np.vstack([self.item_q, q])
+            self.item_scale = np.concatenate([self.item_scale, scale]) if scale is not None else None
+
+def time_to_quality(R: csr_matrix, test, n_components: int, iterations: int = 15, reg: float = 0.1,
+                    threads: int = 1, init_VT: Optional[np.ndarray] = None, random_state: int = 42,
+                    include_svd: bool = True) -> List[Dict[str, float]]:
+    """Held-out RMSE against cumulative fit time: one row for TruncatedSVD, one per ALS sweep.
+
+    `test` is (user indices, item indices, ratings) in R's index space. With `init_VT` the ALS
+    rows are a warm start; the SVD row is always a cold fit, as in training today.
+    """
+    u, i, r = test
+    rows = []
+    if include_svd:
+        t0 = time.perf_counter()
+        svd = SVDRecommender(n_components=n_components, random_state=random_state).fit(R)
+        rows.append({"backend": "svd", "iteration": 1, "seconds": time.perf_counter() - t0,
+                     "rmse": float(np.sqrt(np.mean((svd.predict(u, i) - r) ** 2)))})
+    name = "als-warm" if init_VT is not None else "als"
+    t0 = time.perf_counter()
+    evaluating = [0.0]  # time spent in this callback, left out of the fit time
+    def record(it, model):
+        t = time.perf_counter()
+        rows.append({"backend": name, "iteration": it, "seconds": t - t0 - evaluating[0],
+                     "rmse": float(np.sqrt(np.mean((model.predict(u, i) - r) ** 2)))})
+        evaluating[0] += time.perf_counter() - t
+    ALSRecommender(n_components=n_components, random_state=random_state, reg=reg, threads=threads).fit(
+        R, init_VT=init_VT, iterations=iterations, tol=0.0, callback=record)
+    return rows
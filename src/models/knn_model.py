@@ -2,27 +2,181 @@ from __future__ import annotations
 import numpy as np
 from scipy.sparse import csr_matrix
 from sklearn.preprocessing import normalize
+from typing import Optional
+
+def replace_rows(M: csr_matrix, rows, new_rows: csr_matrix, shape) -> csr_matrix:
+    # CSR with `rows` swapped for the rows of `new_rows` (same order), grown to `shape`; rows past
+    # M's end are appended. Untouched rows are copied as contiguous slices between the replaced
+    # ones (one concatenate, no per-entry index arrays), so the cost is a memcpy of M
+    M = M.tocsr()
+    new_rows = new_rows.tocsr()
+    rows = np.asarray(rows, dtype=np.int64)
+    counts = np.zeros(shape[0], dtype=np.int64)
+    counts[:M.shape[0]] = np.diff(M.indptr)
+    counts[rows] = np.diff(new_rows.indptr)
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    data, indices = [], []
+    prev = 0  # first row of M not copied yet
+    for j in np.argsort(rows, kind="stable").tolist():
+        r = min(int(rows[j]), M.shape[0])
+        data.append(M.data[M.indptr[prev]:M.indptr[r]])
+        indices.append(M.indices[M.indptr[prev]:M.indptr[r]])
+        prev = min(r + 1, M.shape[0])
+        data.append(new_rows.data[new_rows.indptr[j]:new_rows.indptr[j + 1]])
+        indices.append(new_rows.indices[new_rows.indptr[j]:new_rows.indptr[j + 1]])
+    data.append(M.data[M.indptr[prev]:])
+    indices.append(M.indices[M.indptr[prev]:])
+    index_dtype = np.int64 if max(shape) > np.iinfo(np.int32).max else np.int32
+    return csr_matrix((np.concatenate(data).astype(np.result_type(M.dtype, new_rows.dtype), copy=False),
+                       np.concatenate(indices).astype(index_dtype, copy=False), indptr), shape=tuple(shape))
 
 class ItemCosineKNN:
-    def __init__(self, topk: int = 50):
+    def __init__(self, topk: int = 50, precompute: bool = True, block_size: int = 1024):
         self.topk = topk
+        self.precompute = precompute
+        self.block_size = block_size
         self.item_norm = None
         self.item_vectors = None
-        self.sim = None  # optional precomputed similarities
+        self.sim = None  # optional precomputed similarities (pruned top-k CSR, n_items x n_items)
 
     def fit(self, R: csr_matrix):
         # item vectors are columns; use transpose to normalize by item
         X = R.T.tocsr().astype(np.float32)
         self.item_vectors = normalize(X, axis=1)  # L2 normalize each item vector
+        self.sim = self._build_neighbors() if self.precompute else None
         return self
 
-    def similar_items(self, item_idx: int, k: int = 10) -> np.ndarray:
+    def _build_neighbors(self) -> csr_matrix:
+        # offline top-k neighbor graph, built one block of items at a time so the
+        # dense item x item matrix never exists in memory
+        V = self.item_vectors
+        n = V.shape[0]
+        kk = min(self.topk, n - 1)
+        if kk <= 0:
+            return csr_matrix((n, n), dtype=np.float32)
+        VT = V.T.tocsc()
+        rows, cols, vals = [], [], []
+        for start in range(0, n, self.block_size):
+            r, c, v = self._neighbor_block(VT, np.arange(start, min(start + self.block_size, n)), kk)
+            rows.append(r + start)
+            cols.append(c)
+            vals.append(v)
+        rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        return csr_matrix((vals.astype(np.float32), (rows, cols)), shape=(n, n))
+
+    def _neighbor_block(self, VT, idx: np.ndarray, kk: int):
+        # top-kk positive neighbors of the items in idx: (row in idx, neighbor, similarity)
+        return self._top_neighbors((self.item_vectors[idx] @ VT).toarray(), idx, kk)  # (b x n_items)
+
+    @staticmethod
+    def _top_neighbors(block: np.ndarray, idx: np.ndarray, kk: int):
+        # the same, given the dense (len(idx) x n_items) similarity block
+        b = np.arange(len(idx))
+        block[b, idx] = -np.inf  # no self-neighbors
+        nbr = np.argpartition(-block, kth=kk - 1, axis=1)[:, :kk]
+        s = np.take_along_axis(block, nbr, axis=1)
+        keep = s > 0
+        return np.repeat(b, kk)[keep.ravel()], nbr[keep], s[keep]
+
+    def truncated(self, topk: int) -> "ItemCosineKNN":
+        # same item vectors, neighbor rows pruned to their topk strongest entries
+        out = ItemCosineKNN(topk=topk, precompute=self.sim is not None, block_size=self.block_size)
+        out.item_vectors = self.item_vectors
+        if self.sim is not None:
+            sim = self.sim.tocsr()
+            row = np.repeat(np.arange(sim.shape[0]), np.diff(sim.indptr))
+            order = np.lexsort((-sim.data, row))
+            rank = np.empty(sim.nnz, dtype=np.int64)
+            rank[order] = np.arange(sim.nnz) - sim.indptr[row[order]]
+            keep = rank < topk
+            out.sim = csr_matrix((sim.data[keep], (row[keep], sim.indices[keep])), shape=sim.shape)
+        return out
+
+    def fold_in_user(self, R: csr_matrix, R_new: csr_matrix, user_idx: int, items: np.ndarray,
+                     ratings: np.ndarray) -> None:
+        """Refresh the vectors and neighbor rows of ``items`` after ``user_idx`` (re)rated them.
+
+        ``R`` and ``R_new`` are the user x item matrix before and after the update, so new users
+        and items simply grow the matrices. Arrays are replaced, never written in place, so a
+        shallow copy of a served instance can be updated while requests read the original.
+        Neighbor rows of other items keep their old similarity to ``items`` until the next full fit.
+        """
+        n_users, n_items = R_new.shape
+        items = np.asarray(items, dtype=np.int64)
+        norm = self.item_norm
+        if norm is None or len(norm) < R.shape[1]:
+            # column L2 norms, kept to un-normalize item vectors on later updates
+            norm = np.sqrt(np.bincount(R.indices, weights=np.square(R.data, dtype=np.float64), minlength=R.shape[1]))
+        norm = np.concatenate([norm, np.zeros(max(0, n_items - len(norm)))])
+
+        V = self.item_vectors.tocsr()
+        old = items < V.shape[0]
+        sub = V[items[old]].tocoo()
+        r = np.flatnonzero(old)[sub.row]
+        c = sub.col
+        v = sub.data * norm[items[r]]
+        drop = c == user_idx
+        r = np.concatenate([r[~drop], np.arange(len(items))])
+        c = np.concatenate([c[~drop], np.full(len(items), user_idx)])
+        v = np.concatenate([v[~drop], np.asarray(ratings, dtype=np.float64)])
+        norms = np.sqrt(np.bincount(r, weights=v * v, minlength=len(items)))
+        norm[items] = norms
+        self.item_norm = norm
+        new_rows = csr_matrix(((v / np.maximum(norms[r], 1e-12)).astype(np.float32), (r, c)),
+                              shape=(len(items), n_users))
+        self.item_vectors = replace_rows(V, items, new_rows, (n_items, n_users))
+
+        if self.sim is not None:
+            kk = min(self.topk, n_items - 1)
+            if kk > 0:
+                # similarities against every item from the raters' rows of R_new alone (item
+                # vectors are R's columns over their norms), instead of transposing item_vectors
+                raters = np.unique(new_rows.indices)
+                X = R_new[raters].tocsr()
+                X = csr_matrix(((X.data / np.maximum(norm[X.indices], 1e-12)).astype(np.float32), X.indices, X.indptr),
+                               shape=X.shape)
+                nr, nc, nv = self._top_neighbors((new_rows[:, raters] @ X).toarray(), items, kk)
+                nbr = csr_matrix((nv.astype(np.float32), (nr, nc)), shape=(len(items), n_items))
+            else:
+                nbr = csr_matrix((len(items), n_items), dtype=np.float32)
+            self.sim = replace_rows(self.sim, items, nbr, (n_items, n_items))
+
+    def similar_items(self, item_idx: int, k: int = 10, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        # mask: optional boolean over items; only items where it is True are returned
+        if self.sim is not None and k <= self.topk:
+            # row lookup in the precomputed neighbor graph
+            row = self.sim[item_idx]
+            idx, val = row.indices, row.data
+            if mask is not None:
+                keep = mask[idx]
+                idx, val = idx[keep], val[keep]
+            if mask is None or len(idx) >= k:
+                order = np.argsort(val)[::-1][:k]
+                return idx[order]
+            # too few allowed neighbors in the pruned row: score the whole catalog instead
         v = self.item_vectors[item_idx]
         sims = self.item_vectors @ v.T  # cosine similarity
         sims = np.asarray(sims.todense()).ravel()
         sims[item_idx] = -np.inf
+        if mask is not None:
+            sims[~mask] = -np.inf
         top = np.argpartition(-sims, kth=min(k, len(sims)-1))[:k]
-        return top[np.argsort(sims[top])[::-1]]
+        top = top[np.argsort(sims[top])[::-1]]
+        return top if mask is None else top[np.isfinite(sims[top])]
+
+    def similar_items_batch(self, item_indices, k: int = 10) -> list:
+        # batched similar_items: row lookups in the neighbor graph, or one sparse product
+        if self.sim is not None and k <= self.topk:
+            return [self.similar_items(int(i), k=k) for i in item_indices]
+        idx = np.asarray(item_indices, dtype=np.int64)
+        sims = (self.item_vectors[idx] @ self.item_vectors.T).toarray()
+        sims[np.arange(len(idx)), idx] = -np.inf
+        kk = min(k, sims.shape[1])
+        top = np.argpartition(-sims, kth=min(k, sims.shape[1]-1), axis=1)[:, :kk]
+        order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1, kind="stable")
+        return list(np.take_along_axis(top, order, axis=1))
 
     def score_user(self, user_vector, exclude_indices) -> np.ndarray:
         # simple item-based scoring: weighted sum of neighbors by user's existing ratings
@@ -30,12 +184,40 @@ class ItemCosineKNN:
         rated = np.where(user_vector > 0)[0]
         if len(rated) == 0:
             return np.zeros(self.item_vectors.shape[0], dtype=np.float32)
-        sims = self.item_vectors[rated] @ self.item_vectors.T  # (r x n_items)
-        weights = user_vector[rated][:, None]
-        scores = (weights * sims).sum(axis=0).A.ravel()
+        if self.sim is not None:
+            # sparse vector-matrix product against the pruned neighbor rows
+            scores = np.asarray(self.sim[rated].T @ user_vector[rated]).ravel()
+        else:
+            sims = self.item_vectors[rated] @ self.item_vectors.T  # (r x n_items)
+            scores = np.asarray(sims.T @ user_vector[rated]).ravel()
         scores[exclude_indices] = -np.inf
         return scores
 
+    def neighbor_scores(self, rated: np.ndarray, weights: np.ndarray):
+        # sparse score_user: (item indices, scores) for the neighbor union of the rated items only
+        if len(rated) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self.sim is not None:
+            w = csr_matrix(np.asarray(weights, dtype=np.float32).reshape(1, -1))
+            nb = (w @ self.sim[rated]).tocsr()
+            keep = nb.data > 0
+            return nb.indices[keep].astype(np.int64), nb.data[keep]
+        sims = self.item_vectors[rated] @ self.item_vectors.T
+        scores = np.asarray(sims.T @ np.asarray(weights, dtype=np.float32)).ravel()
+        idx = np.flatnonzero(scores > 0)
+        return idx, scores[idx]
+
+    def score_users(self, R_block: csr_matrix) -> np.ndarray:
+        # batched score_user: one sparse product for a block of user rows, known items -> -inf
+        R_block = R_block.tocsr().astype(np.float32)
+        if self.sim is not None:
+            scores = (R_block @ self.sim).toarray()
+        else:
+            scores = ((R_block @ self.item_vectors) @ self.item_vectors.T).toarray()
+        rows = np.repeat(np.arange(R_block.shape[0]), np.diff(R_block.indptr))
+        scores[rows, R_block.indices] = -np.inf
+        return scores
+
     def recommend_for_user(self, user_idx: int, R: csr_matrix, k: int = 10) -> np.ndarray:
         user_vec = R[user_idx].toarray().ravel().astype(np.float32)
         known = R[user_idx].indices
@@ -2,47 +2,212 @@ from __future__ import annotations
 import numpy as np
 from scipy.sparse import csr_matrix
 from sklearn.decomposition import TruncatedSVD
-from typing import Optional
+from typing import Optional, Tuple
+
+QUANT_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+def quantize_rows(V: np.ndarray, quant: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # item-major factors -> (codes, per-row scale); float16 needs no scale
+    V = np.asarray(V, dtype=np.float32)
+    if quant == "float16":
+        return V.astype(np.float16), None
+    if quant != "int8":
+        raise ValueError(f"Unknown quantization {quant!r} (expected one of {sorted(QUANT_DTYPES)})")
+    scale = np.abs(V).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    return np.round(V / scale[:, None]).astype(np.int8), scale.astype(np.float32)
+
+def center_rows(R: csr_matrix) -> Tuple[np.ndarray, csr_matrix]:
+    # per-user mean of observed ratings and the matrix with it subtracted from those entries;
+    # float32 throughout, the sparsity structure is shared, not copied
+    R = R.tocsr()
+    if R.dtype != np.float32:
+        R = R.astype(np.float32)
+    counts = np.diff(R.indptr)
+    sums = np.zeros(R.shape[0], dtype=np.float32)
+    nonempty = counts > 0
+    if nonempty.any():
+        # row sums straight from indptr (reduceat needs strictly increasing starts)
+        sums[nonempty] = np.add.reduceat(R.data, R.indptr[:-1][nonempty])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(counts>0, sums / counts, 0.0).astype(np.float32)
+    # subtract user means for observed entries in one vectorized pass over indptr
+    centered = R.data - np.repeat(means, counts)
+    return means, csr_matrix((centered, R.indices, R.indptr), shape=R.shape, copy=False)
 
 class SVDRecommender:
+    backend = "svd"  # stored with the artifacts; see src.recommender.MF_BACKENDS
+
     def __init__(self, n_components: int = 100, random_state: int = 42):
         self.n_components = n_components
         self.random_state = random_state
         self.svd: Optional[TruncatedSVD] = None
         self.user_means: Optional[np.ndarray] = None
         self.VT: Optional[np.ndarray] = None  # item factors transposed
+        self.quant: Optional[str] = None  # "float16" / "int8": full-catalog scans use item_q
+        self.item_q: Optional[np.ndarray] = None  # (n_items x k) quantized item factors
+        self.item_scale: Optional[np.ndarray] = None  # per-item int8 scale
+        self.block_size = 8192  # items dequantized per block
 
     def fit(self, R: csr_matrix):
         # center by user means (classic baseline)
-        R = R.tocsr().astype(np.float32)
-        sums = np.array(R.sum(axis=1)).flatten()
-        counts = np.diff(R.indptr)
-        with np.errstate(divide='ignore', invalid='ignore'):
-            means = np.where(counts>0, sums / counts, 0.0).astype(np.float32)
-        self.user_means = means
-
-        R_centered = R.copy().astype(np.float32)
-        # subtract user means for observed entries
-        for u in range(R_centered.shape[0]):
-            start, end = R_centered.indptr[u], R_centered.indptr[u+1]
-            R_centered.data[start:end] -= means[u]
+        self.user_means, R_centered = center_rows(R)
 
         self.svd = TruncatedSVD(n_components=min(self.n_components, min(R.shape)-1),
                                 random_state=self.random_state)
         U = self.svd.fit_transform(R_centered)   # (n_users x k)
         VT = self.svd.components_               # (k x n_items)
-        self.VT = VT.astype(np.float32)
-        self.U = U.astype(np.float32)
+        self.VT = VT.astype(np.float32, copy=False)
+        self.U = U.astype(np.float32, copy=False)
         return self
 
+    def params(self) -> dict:
+        # constructor arguments, as stored in the artifact manifest
+        return {"n_components": self.n_components, "random_state": self.random_state}
+
+    def truncated(self, n_components: int) -> "SVDRecommender":
+        # leading components of this fit as views (TruncatedSVD orders them by singular value),
+        # so one fit at the largest rank serves every smaller one
+        out = type(self)(**dict(self.params(), n_components=n_components))
+        out.U = self.U[:, :n_components]
+        out.VT = self.VT[:n_components]
+        out.user_means = self.user_means
+        if self.quant:
+            # per-item scales stay valid for any subset of components
+            out.quant, out.item_q, out.item_scale = self.quant, self.item_q[:, :n_components], self.item_scale
+        return out
+
+    def fold_in_user(self, user_idx: int, items: np.ndarray, ratings: np.ndarray) -> None:
+        # project one user's full rating row onto the fixed item factors: the same U*Sigma
+        # coordinates fit_transform gives, so refreshed and trained rows score alike
+        ratings = np.asarray(ratings, dtype=np.float32)
+        mean = np.float32(ratings.mean()) if len(ratings) else np.float32(0.0)
+        u = self.project(items, ratings, mean)
+        self._grow_users(user_idx + 1)
+        self.U[user_idx] = u
+        self.user_means[user_idx] = mean
+
+    def fold_in_items(self, raters, ratings) -> None:
+        # append one item column per (user indices, ratings) pair: least-squares fit of the
+        # centered ratings on the fixed user factors, whose Gram matrix is diag(Sigma^2)
+        if not len(raters):
+            return
+        sigma2 = np.einsum("ij,ij->j", self.U, self.U)
+        cols = np.zeros((self.VT.shape[0], len(raters)), dtype=np.float32)
+        for c, (users, vals) in enumerate(zip(raters, ratings)):
+            users = np.asarray(users, dtype=np.int64)
+            seen = users < self.U.shape[0]  # brand-new users have no factors yet
+            users, vals = users[seen], np.asarray(vals, dtype=np.float32)[seen]
+            x = vals - self.user_means[users]
+            cols[:, c] = (self.U[users].T @ x) / np.maximum(sigma2, 1e-12)
+        self.VT = np.hstack([self.VT, cols])
+        if self.quant:
+            q, scale = quantize_rows(cols.T, self.quant)
+            self.item_q = np.vstack([self.item_q, q])
+            self.item_scale = np.concatenate([self.item_scale, scale]) if scale is not None else None
+
+    def _grow_users(self, n_users: int) -> None:
+        # fresh factor rows (copy-on-write): arrays other readers may hold, including read-only
+        # memory maps, are never written in place
+        extra = max(0, n_users - self.U.shape[0])
+        self.U = np.concatenate([self.U, np.zeros((extra, self.U.shape[1]), dtype=np.float32)])
+        self.user_means = np.concatenate([self.user_means, np.zeros(extra, dtype=np.float32)])
+
     def predict_all(self) -> np.ndarray:
         # reconstruct (approx) and add back user means
         approx = self.U @ self.VT
         approx += self.user_means[:, None]
         return approx
 
+    def quantize(self, quant: Optional[str]) -> "SVDRecommender":
+        # keep a float16 / per-item scaled int8 copy of the item factors for full-catalog scoring;
+        # VT stays the exact reference for re-scoring shortlists (see score_items)
+        if not quant:
+            self.quant, self.item_q, self.item_scale = None, None, None
+            return self
+        self.item_q, self.item_scale = quantize_rows(self.VT.T, quant)
+        self.quant = quant
+        return self
+
+    def score_users(self, user_indices) -> np.ndarray:
+        # row-level scoring: only the requested users' rows of U @ VT (+ means) are built
+        idx = np.asarray(user_indices, dtype=np.int64)
+        if getattr(self, "quant", None):  # legacy pickles predate quantization
+            scores = self._score_quantized(self.U[idx])
+        else:
+            scores = self.U[idx] @ self.VT
+        scores += self.user_means[idx][:, None]
+        return scores
+
+    def _score_quantized(self, Ub: np.ndarray) -> np.ndarray:
+        # dequantize one block of items at a time; only a (block x k) float32 slab is live
+        n = self.item_q.shape[0]
+        scores = np.empty((Ub.shape[0], n), dtype=np.float32)
+        for start in range(0, n, self.block_size):
+            stop = min(start + self.block_size, n)
+            V = self.item_q[start:stop].astype(np.float32)
+            if self.item_scale is not None:
+                V *= self.item_scale[start:stop, None]
+            scores[:, start:stop] = Ub @ V.T
+        return scores
+
+    def project(self, items, ratings, center: float) -> np.ndarray:
+        # factor row of an ad-hoc rating vector: (ratings - center) projected onto the item factors;
+        # touches only the rated items' columns
+        ratings = np.asarray(ratings, dtype=np.float32)
+        return self.VT[:, np.asarray(items, dtype=np.int64)] @ (ratings - np.float32(center))
+
+    def score_vector(self, u: np.ndarray, mean: float) -> np.ndarray:
+        # scores of every item for one factor row (e.g. from project), quantization-aware
+        u = np.asarray(u, dtype=np.float32)[None, :]
+        scores = self._score_quantized(u)[0] if getattr(self, "quant", None) else (u @ self.VT)[0]
+        scores += np.float32(mean)
+        return scores
+
+    def score_items(self, user_indices, item_indices: np.ndarray) -> np.ndarray:
+        # exact float32 scores of a (users x candidates) shortlist, whatever the scan precision
+        idx = np.asarray(user_indices, dtype=np.int64)
+        items = np.asarray(item_indices, dtype=np.int64)
+        V = self.VT[:, items.ravel()].reshape(self.VT.shape[0], *items.shape)
+        return np.einsum("bk,kbc->bc", self.U[idx], V) + self.user_means[idx][:, None]
+
+    def score_user(self, user_idx: int) -> np.ndarray:
+        return self.score_users([user_idx])[0]
+
+    def predict(self, user_indices, item_indices) -> np.ndarray:
+        # pointwise predictions for (user, item) pairs without materializing full rows
+        u = np.asarray(user_indices, dtype=np.int64)
+        i = np.asarray(item_indices, dtype=np.int64)
+        return np.einsum("ij,ji->i", self.U[u], self.VT[:, i]) + self.user_means[u]
+
     def recommend_for_user(self, user_idx: int, known_item_indices: np.ndarray, k: int = 10) -> np.ndarray:
-        scores = self.predict_all()[user_idx]
+        scores = self.score_user(user_idx)
         scores[known_item_indices] = -np.inf  # don't recommend already-rated items
         top = np.argpartition(-scores, kth=min(k, len(scores)-1))[:k]
         return top[np.argsort(scores[top])[::-1]]
+
+def quantization_report(svd: SVDRecommender, R: csr_matrix, user_indices, k: int = 10,
+                        quants=("float16", "int8")) -> list:
+    # per precision: recall of the float32 top-k by the quantized scan (before shortlist
+    # re-scoring), RMSE on the given users' observed ratings vs float32, and factor bytes
+    idx = np.asarray(user_indices, dtype=np.int64)
+    exact = svd.truncated(svd.VT.shape[0]).quantize(None)
+    ref = exact.score_users(idx)
+    kk = min(k, ref.shape[1])
+    ref_top = np.argpartition(-ref, kth=kk - 1, axis=1)[:, :kk]
+    rows_r = np.repeat(np.arange(len(idx)), np.diff(R[idx].indptr))
+    truth = R[idx].data
+    def rmse(scores):
+        return float(np.sqrt(np.mean((scores[rows_r, R[idx].indices] - truth) ** 2))) if len(truth) else float("nan")
+    rows = [{"quant": "float32", "recall": 1.0, "rmse": rmse(ref), "rmse_delta": 0.0,
+             "item_factor_bytes": int(svd.VT.size * 4)}]
+    for quant in quants:
+        q = exact.truncated(exact.VT.shape[0]).quantize(quant)
+        scores = q.score_users(idx)
+        top = np.argpartition(-scores, kth=kk - 1, axis=1)[:, :kk]
+        hits = sum(len(np.intersect1d(a, b)) for a, b in zip(ref_top, top))
+        err = rmse(scores)
+        nbytes = q.item_q.nbytes + (q.item_scale.nbytes if q.item_scale is not None else 0)
+        rows.append({"quant": quant, "recall": hits / ref_top.size, "rmse": err,
+                     "rmse_delta": err - rows[0]["rmse"], "item_factor_bytes": int(nbytes)})
+    return rows
@@ -0,0 +1,48 @@
+from __future__ import annotations
+import json, resource, sys, time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+def peak_rss_mb() -> float:
+    # peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class TrainReport:
+    """Wall-clock and peak-RSS per training stage, e.g.
+
+        report = TrainReport()
+        with report.stage("svd"):
+            ...
+        print(report.format())
+    """
+
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, **info):
+        t0 = time.perf_counter()
+        rss0 = peak_rss_mb()
+        try:
+            yield
+        finally:
+            peak = peak_rss_mb()
+            self.stages.append({"stage": name, "seconds": time.perf_counter() - t0,
+                                "peak_rss_mb": peak, "peak_rss_growth_mb": peak - rss0, **info})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"total_seconds": time.perf_counter() - self._t0, "peak_rss_mb": peak_rss_mb(), "stages": self.stages}
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def format(self) -> str:
+        lines = [f"{'stage':<16}{'seconds':>10}{'peak MB':>10}{'+MB':>8}"]
+        for s in self.stages:
+            lines.append(f"{s['stage']:<16}{s['seconds']:>10.2f}{s['peak_rss_mb']:>10.0f}{s['peak_rss_growth_mb']:>8.0f}")
+        d = self.to_dict()
+        lines.append(f"{'total':<16}{d['total_seconds']:>10.2f}{d['peak_rss_mb']:>10.0f}")
+        return "\n".join(lines)
@@ -1,24 +1,65 @@
 from __future__ import annotations
 from dataclasses import dataclass
-import os, joblib, numpy as np
-from typing import Dict, Any, Tuple, List
+import os, json, time, uuid, hashlib, shutil, threading, warnings, copy, dataclasses, joblib, numpy as np
+from collections import OrderedDict
+from contextlib import nullcontext
+from scipy.sparse import csr_matrix
+from typing import Dict, Any, Tuple, List, Iterable, Optional
 
-from .config import ARTIFACT_DIR, ALPHA, KNN_TOPK, SVD_COMPONENTS
+from .config import ARTIFACT_DIR, ALPHA, KNN_TOPK, SVD_COMPONENTS, SVD_QUANT, ANN_ENABLED, ANN_NLIST, ANN_NPROBE
+from .config import CANDIDATES_SVD, CANDIDATES_KNN, CANDIDATES_POP, TOPN_DIR, MODEL_KEEP_VERSIONS, SESSION_CACHE_SIZE
+from .config import ITEM_SHARDS, MF_BACKEND, ALS_REG, ALS_ITERATIONS, ALS_WARM_ITERATIONS, ALS_THREADS
 from .models.svd_model import SVDRecommender
-from .models.knn_model import ItemCosineKNN
+from .models.als_model import ALSRecommender, warm_start_factors
+from .models.knn_model import ItemCosineKNN, replace_rows
+from .catalog import Catalog
+from .id_map import IdMap, TitleMap
+from .metrics import stage_timer, observe_stage
+from .ann import IVFIndex
+from .topn_store import TopNStore
+from .artifact_store import write_arrays, read_arrays, is_artifact_dir, pack_csr, unpack_csr
 
 @dataclass
 class Artifacts:
     svd: SVDRecommender
     knn: ItemCosineKNN
     R: Any
-    u_index: dict
-    i_index: dict
-    id_to_title: dict
-    users_sorted: list
-    items_sorted: list
+    u_index: IdMap  # raw userId -> row of R (plain dicts are converted)
+    i_index: IdMap  # raw movieId -> column of R
+    id_to_title: TitleMap  # raw movieId -> title, one byte buffer
+    catalog: Optional[Catalog] = None
+    ann_similar: Optional[IVFIndex] = None  # cosine IVF over item factors (item -> item)
+    ann_retrieval: Optional[IVFIndex] = None  # inner-product IVF over item factors (user factor -> item)
+    item_popularity: Optional[np.ndarray] = None  # ratings per item
+    model_version: Optional[str] = None  # set at training time; tags precomputed top-N entries
+    topn: Optional[TopNStore] = None  # attached at serving time, not part of the artifact files
+    item_genres: Optional[Any] = None  # (n_items x n_genres) bool CSR; columns are catalog.genre_names
+    shards: Optional[Any] = None  # src.sharding.ShardedScorer attached at serving time, not part of the artifact files
 
-MODEL_PATH = os.path.join(ARTIFACT_DIR, "recsys.joblib")
+    def __post_init__(self):
+        self.u_index = IdMap.coerce(self.u_index)
+        self.i_index = IdMap.coerce(self.i_index)
+        self.id_to_title = TitleMap.coerce(self.id_to_title)
+
+    @property
+    def users_sorted(self) -> np.ndarray:
+        return self.u_index.sorted_ids
+
+    @property
+    def items_sorted(self) -> np.ndarray:
+        return self.i_index.sorted_ids
+
+    def titled(self, idx) -> List[Tuple[int, str]]:
+        # item indices -> [(movieId, title)], translated as one batch
+        with stage_timer("id_mapping"):
+            raw = self.i_index.raw(idx)
+            return list(zip(raw.tolist(), self.id_to_title.take(raw)))
+
+MODEL_PATH = os.path.join(ARTIFACT_DIR, "recsys.joblib")  # legacy single-pickle format
+MODEL_DIR = os.path.join(ARTIFACT_DIR, "recsys")  # memory-mapped directory format
+VERSIONS_DIR = "versions"  # MODEL_DIR/versions/<model_version>/
+CURRENT_POINTER = "CURRENT"  # MODEL_DIR/CURRENT holds the live version name
+MF_BACKENDS = {"svd": SVDRecommender, "als": ALSRecommender}  # Artifacts.svd is either; same interface
 
 def build_hybrid_score(svd_scores: np.ndarray, knn_scores: np.ndarray, alpha: float = ALPHA):
     # weighted combination; normalize to comparable scale
@@ -28,63 +69,606 @@ def build_hybrid_score(svd_scores: np.ndarray, knn_scores: np.ndarray, alpha: fl
         s1 = np.where(np.isinf(s1), -1e9, s1)
     if np.isinf(s2).any():
         s2 = np.where(np.isinf(s2), -1e9, s2)
-    # z-score normalize
+    # z-score normalize (per row when scoring a block of users)
     def z(x):
-        mu = np.nanmean(x[np.isfinite(x)])
-        std = np.nanstd(x[np.isfinite(x)]) + 1e-8
+        xf = np.where(np.isfinite(x), x, np.nan)
+        mu = np.nanmean(xf, axis=-1, keepdims=True)
+        std = np.nanstd(xf, axis=-1, keepdims=True) + 1e-8
         return (x - mu) / std
     return alpha * z(s1) + (1-alpha) * z(s2)
 
-def train_and_pack(R, u_index, i_index, id_to_title) -> Artifacts:
-    svd = SVDRecommender(n_components=SVD_COMPONENTS).fit(R)
-    knn = ItemCosineKNN(topk=KNN_TOPK).fit(R)
+def train_and_pack(R, u_index, i_index, id_to_title, movies=None, report=None,
+                   svd_components: int = SVD_COMPONENTS, knn_topk: int = KNN_TOPK, mf: str = MF_BACKEND,
+                   warm_start: Optional[Artifacts] = None) -> Artifacts:
+    # report: optional src.profiling.TrainReport; records wall-clock + peak RSS per stage.
+    # warm_start: the previous model, whose item factors seed an ALS fit (ignored by SVD)
+    stage = report.stage if report is not None else (lambda name, **info: nullcontext())
+    u_index, i_index = IdMap.coerce(u_index), IdMap.coerce(i_index)
+    if mf not in MF_BACKENDS:
+        raise ValueError(f"Unknown MF_BACKEND {mf!r} (expected one of {sorted(MF_BACKENDS)})")
+    if mf == "als":
+        init = warm_start_factors(warm_start.svd.VT, warm_start.i_index, i_index, svd_components) if warm_start is not None else None
+        with stage("als", n_components=svd_components, warm=init is not None):
+            svd = ALSRecommender(n_components=svd_components, reg=ALS_REG, threads=ALS_THREADS).fit(
+                R, init_VT=init, iterations=ALS_WARM_ITERATIONS if init is not None else ALS_ITERATIONS)
+            svd.quantize(SVD_QUANT)
+        if report is not None:
+            report.stages[-1]["sweeps"] = len(svd.history)
+    else:
+        with stage("svd", n_components=svd_components):
+            svd = SVDRecommender(n_components=svd_components).fit(R).quantize(SVD_QUANT)
+    with stage("knn", topk=knn_topk):
+        knn = ItemCosineKNN(topk=knn_topk).fit(R)
 
-    users_sorted = sorted(u_index.keys())
-    items_sorted = sorted(i_index.keys())
+    # title/genre index for search; genres only when the movies table is given
+    catalog = Catalog.from_movies(movies) if movies is not None else Catalog.from_titles(id_to_title)
+    item_genres = catalog.item_genre_matrix(i_index.ids) if catalog.genre_names else None
 
     art = Artifacts(svd=svd, knn=knn, R=R, u_index=u_index, i_index=i_index,
-                    id_to_title=id_to_title, users_sorted=users_sorted, items_sorted=items_sorted)
+                    id_to_title=id_to_title,
+                    catalog=catalog, item_popularity=np.bincount(R.indices, minlength=R.shape[1]).astype(np.int32),
+                    item_genres=item_genres,
+                    model_version=time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8])
+    if ANN_ENABLED:
+        with stage("ann"):
+            build_ann(art)
+    return art
+
+def build_ann(art: Artifacts, nlist: int = ANN_NLIST, nprobe: int = ANN_NPROBE):
+    item_factors = art.svd.VT.T
+    art.ann_similar = IVFIndex(nlist=nlist, nprobe=nprobe, metric="cosine").fit(item_factors)
+    art.ann_retrieval = IVFIndex(nlist=nlist, nprobe=nprobe, metric="ip").fit(item_factors)
+    return art
+
+def _pack(art: Artifacts):
+    # flatten Artifacts into plain arrays + JSON metadata for the directory format
+    arrays: Dict[str, np.ndarray] = {}
+    meta: Dict[str, Any] = {"model_version": getattr(art, "model_version", None)}
+    meta["R_shape"] = pack_csr(arrays, "R", art.R)
+    arrays["svd_U"] = art.svd.U
+    arrays["svd_user_means"] = art.svd.user_means
+    meta["svd"] = art.svd.params()
+    meta["mf_backend"] = getattr(art.svd, "backend", "svd")
+    if getattr(art.svd, "quant", None):
+        # exact factors item-major, so re-scoring a shortlist only faults in those items' pages
+        arrays["svd_V"] = art.svd.VT.T
+        arrays["svd_item_q"] = art.svd.item_q
+        if art.svd.item_scale is not None:
+            arrays["svd_item_scale"] = art.svd.item_scale
+        meta["svd_quant"] = art.svd.quant
+    else:
+        arrays["svd_VT"] = art.svd.VT
+    meta["knn"] = {"topk": art.knn.topk, "block_size": getattr(art.knn, "block_size", 1024),
+                   "item_vectors_shape": pack_csr(arrays, "knn_vectors", art.knn.item_vectors),
+                   "sim_shape": pack_csr(arrays, "knn_sim", art.knn.sim) if art.knn.sim is not None else None}
+    # id maps as dense index -> raw id arrays plus their by-raw-id order; titles as one byte buffer
+    IdMap.coerce(art.u_index).to_arrays(arrays, "user")
+    IdMap.coerce(art.i_index).to_arrays(arrays, "item")
+    TitleMap.coerce(art.id_to_title).to_arrays(arrays, "title")
+    catalog = getattr(art, "catalog", None) or Catalog.from_titles(art.id_to_title)
+    catalog.to_arrays(arrays, "catalog")
+    if getattr(art, "item_popularity", None) is not None:
+        arrays["item_popularity"] = art.item_popularity
+    if getattr(art, "item_genres", None) is not None:
+        meta["item_genres_shape"] = pack_csr(arrays, "item_genres", art.item_genres)
+    for name in ("ann_similar", "ann_retrieval"):
+        index = getattr(art, name, None)
+        meta[name] = index.to_arrays(arrays, name) if index is not None else None
+    return arrays, meta
+
+def _unpack(arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> Artifacts:
+    svd = MF_BACKENDS[meta.get("mf_backend", "svd")](**meta["svd"])
+    svd.U = arrays["svd_U"]
+    svd.VT = arrays["svd_VT"] if "svd_VT" in arrays else arrays["svd_V"].T
+    svd.user_means = arrays["svd_user_means"]
+    if meta.get("svd_quant"):
+        svd.quant, svd.item_q, svd.item_scale = meta["svd_quant"], arrays["svd_item_q"], arrays.get("svd_item_scale")
+    knn = ItemCosineKNN(topk=meta["knn"]["topk"], block_size=meta["knn"]["block_size"],
+                        precompute=meta["knn"]["sim_shape"] is not None)
+    knn.item_vectors = unpack_csr(arrays, "knn_vectors", meta["knn"]["item_vectors_shape"])
+    if meta["knn"]["sim_shape"] is not None:
+        knn.sim = unpack_csr(arrays, "knn_sim", meta["knn"]["sim_shape"])
+    R = unpack_csr(arrays, "R", meta["R_shape"])
+    u_index = IdMap.from_arrays(arrays, "user")
+    i_index = IdMap.from_arrays(arrays, "item")
+    id_to_title = TitleMap.from_arrays(arrays, "title")
+    ann = {name: IVFIndex.from_arrays(arrays, name, meta[name], svd.VT.T) if meta.get(name) else None
+           for name in ("ann_similar", "ann_retrieval")}
+    return Artifacts(svd=svd, knn=knn, R=R, u_index=u_index, i_index=i_index, id_to_title=id_to_title,
+                     catalog=Catalog.from_arrays(arrays, "catalog"), item_popularity=arrays.get("item_popularity"),
+                     model_version=meta.get("model_version"),
+                     item_genres=unpack_csr(arrays, "item_genres", meta["item_genres_shape"]) if meta.get("item_genres_shape") else None,
+                     **ann)
+
+def save_artifacts(art: Artifacts, path: str = MODEL_DIR):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays, meta = _pack(art)
+    write_arrays(path, arrays, meta)
+
+def resolve_model_path(root: str = MODEL_DIR) -> str:
+    # versioned layout: root/versions/<model_version>/ with root/CURRENT naming the live one;
+    # a flat artifact directory (the older layout) resolves to itself
+    version = current_version(root)
+    return os.path.join(root, VERSIONS_DIR, version) if version else root
+
+def current_version(root: str = MODEL_DIR) -> Optional[str]:
+    pointer = os.path.join(root, CURRENT_POINTER)
+    if not os.path.isfile(pointer):
+        return None
+    with open(pointer) as f:
+        return f.read().strip() or None
+
+def publish_artifacts(art: Artifacts, root: str = MODEL_DIR, keep: int = MODEL_KEEP_VERSIONS,
+                      shards: int = ITEM_SHARDS) -> str:
+    # write a new version next to the live one, then swap the CURRENT pointer with one rename;
+    # servers pick it up through src.hot_reload without restarting. `shards` > 0 also writes the
+    # item-range shards (src/sharding.py) into the version before it goes live
+    version = art.model_version or time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    path = os.path.join(root, VERSIONS_DIR, version)
+    save_artifacts(art, path)
+    if shards > 0:
+        from .sharding import SHARDS_DIR, save_shards
+        save_shards(art, os.path.join(path, SHARDS_DIR), shards)
+    tmp = os.path.join(root, CURRENT_POINTER + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, CURRENT_POINTER))
+    _prune_versions(root, keep, version)
+    return path
+
+def _prune_versions(root: str, keep: int, current: str):
+    # oldest first by name (versions are timestamp-prefixed); workers still mapping a removed
+    # version keep their pages until they swap
+    versions = sorted(v for v in os.listdir(os.path.join(root, VERSIONS_DIR)) if not v.endswith(".tmp"))
+    for v in versions[:max(0, len(versions) - max(keep, 1))]:
+        if v != current:
+            shutil.rmtree(os.path.join(root, VERSIONS_DIR, v), ignore_errors=True)
+    if is_artifact_dir(root):
+        # a flat artifact set left over from before the versioned layout
+        for name in os.listdir(root):
+            if name.endswith(".npy") or name == "manifest.json":
+                os.remove(os.path.join(root, name))
+
+def load_artifacts(path: str = MODEL_DIR, mmap: bool = True) -> Artifacts:
+    path = resolve_model_path(path)
+    if not is_artifact_dir(path) and os.path.exists(MODEL_PATH):
+        return load_legacy_artifacts()
+    arrays, meta = read_arrays(path, mmap=mmap)
+    return _unpack(arrays, meta)
+
+def load_legacy_artifacts(path: str = MODEL_PATH) -> Artifacts:
+    # old single-file joblib pickle; kept so existing deployments can migrate
+    art = joblib.load(path)
+    art.__post_init__()  # unpickling skips it; converts the pickled dict id maps
     return art
 
-def save_artifacts(art: Artifacts):
-    os.makedirs(ARTIFACT_DIR, exist_ok=True)
-    joblib.dump(art, MODEL_PATH)
+def migrate_legacy_artifacts(src: str = MODEL_PATH, dst: str = MODEL_DIR) -> Artifacts:
+    publish_artifacts(load_legacy_artifacts(src), dst)
+    return load_artifacts(dst)
 
-def load_artifacts() -> Artifacts:
-    return joblib.load(MODEL_PATH)
+def has_artifacts(root: str = MODEL_DIR) -> bool:
+    return is_artifact_dir(resolve_model_path(root)) or os.path.exists(MODEL_PATH)
 
 def load_or_train(build_fn) -> Artifacts:
-    if os.path.exists(MODEL_PATH):
+    # for offline tools; the API server only loads (see src.hot_reload), it never trains
+    if is_artifact_dir(resolve_model_path()):
         return load_artifacts()
+    if os.path.exists(MODEL_PATH):
+        return migrate_legacy_artifacts()
     art = build_fn()
-    save_artifacts(art)
+    publish_artifacts(art)
+    return art
+
+def attach_topn(art: Artifacts, path: str = TOPN_DIR) -> Artifacts:
+    # serve precomputed top-N lists when a store exists (stale entries are detected per user)
+    art.topn = TopNStore.open(path) if TopNStore.exists(path) else None
     return art
 
-def recommend_for_user(art: Artifacts, raw_user_id: int, k: int = 10) -> List[Tuple[int, str]]:
+def fold_in_ratings(art: Artifacts, raw_user_id: int, ratings: Dict[int, float]) -> Tuple[Artifacts, Dict[str, Any]]:
+    """Merge one user's new or changed ratings ({movieId: rating}) into a new Artifacts.
+
+    The user's row of R is replaced, their SVD factor row and mean are re-projected onto the
+    fixed item factors, and the touched items' KNN vectors and neighbor rows are rebuilt.
+    Unseen users and movies get the next dense index; new movies are added to the ANN indexes. `art` is never modified: every touched
+    array is copied into the returned Artifacts and the rest are shared, so requests still
+    scoring `art` see it whole. The server publishes the result with one reference swap (and
+    serializes fold-ins, each starting from the last one's result). Changes live in this
+    process only (precomputed top-N entries for the user are invalidated); a full retrain picks
+    them up. Returns (new artifacts, summary).
+    """
+    clean = {int(m): float(r) for m, r in ratings.items()}
+    if not clean:
+        raise ValueError("No ratings given")
+    if not all(np.isfinite(r) and r > 0 for r in clean.values()):
+        raise ValueError("Ratings must be positive numbers")
+    R = art.R
+    new_user = raw_user_id not in art.u_index
+    uidx = len(art.u_index) if new_user else art.u_index[raw_user_id]
+    items = art.i_index.index(list(clean))
+    new_movies = [m for m, i in zip(clean, items.tolist()) if i < 0]
+    n_users = max(R.shape[0], uidx + 1)
+    n_items = R.shape[1] + len(new_movies)
+    item_of = {m: R.shape[1] + j for j, m in enumerate(new_movies)}
+    items[items < 0] = [item_of[m] for m in new_movies]
+    vals = np.array(list(clean.values()), dtype=np.float32)
+
+    # merged rating row: previous ratings overwritten by the new ones
+    old = R[uidx] if uidx < R.shape[0] else csr_matrix((1, R.shape[1]), dtype=np.float32)
+    merged = dict(zip(old.indices.tolist(), old.data.tolist()))
+    merged.update(zip(items.tolist(), vals.tolist()))
+    row_idx = np.array(sorted(merged), dtype=np.int64)
+    row_val = np.array([merged[i] for i in row_idx], dtype=np.float32)
+    R_new = replace_rows(R, [uidx], csr_matrix((row_val, row_idx, [0, len(row_idx)]), shape=(1, n_items)),
+                         (n_users, n_items))
+
+    # shallow copies: the fold-in methods replace arrays rather than writing into shared ones
+    knn, svd = copy.copy(art.knn), copy.copy(art.svd)
+    knn.fold_in_user(R, R_new, uidx, items, vals)
+    new_items = items >= R.shape[1]
+    svd.fold_in_items([[uidx]] * int(new_items.sum()), [[v] for v in vals[new_items]])
+    svd.fold_in_user(uidx, row_idx, row_val)
+
+    # artifacts built without popularity counts get them from R before they grow
+    seen = art.item_popularity if art.item_popularity is not None else np.bincount(R.indices, minlength=R.shape[1])
+    pop = np.zeros(n_items, dtype=np.int32)
+    pop[:len(seen)] = seen
+    pop[items[~np.isin(items, old.indices)]] += 1
+    # new items join the IVF lists of their nearest centroids
+    ann = {name: getattr(art, name).appended(svd.VT.T) for name in ("ann_similar", "ann_retrieval")
+           if new_movies and getattr(art, name) is not None}
+    item_genres = art.item_genres
+    if item_genres is not None and new_movies:
+        item_genres = replace_rows(item_genres, [item_of[m] for m in new_movies],
+                                   art.catalog.item_genre_matrix(new_movies), (n_items, item_genres.shape[1]))
+    # a fresh dataclass instance also starts without the lazy caches (popularity order,
+    # session results, global mean) that were computed on `art`
+    out = dataclasses.replace(
+        art, svd=svd, knn=knn, R=R_new, item_popularity=pop, item_genres=item_genres,
+        u_index=art.u_index.appended([raw_user_id]) if new_user else art.u_index,
+        i_index=art.i_index.appended(new_movies) if new_movies else art.i_index,
+        id_to_title=art.id_to_title.appended({m: f"movieId {m}" for m in new_movies}) if new_movies else art.id_to_title,
+        **ann)
+    if getattr(art, "topn", None) is not None:
+        art.topn.invalidate(uidx)
+    return out, {"userId": raw_user_id, "new_user": new_user, "new_movies": new_movies, "n_ratings": int(len(row_idx))}
+
+def popular_items(art: Artifacts) -> np.ndarray:
+    # item indices by number of ratings, most rated first (cached on the artifacts)
+    order = getattr(art, "_popular_order", None)
+    if order is None:
+        counts = art.item_popularity if art.item_popularity is not None else np.bincount(art.R.indices, minlength=art.R.shape[1])
+        order = np.argsort(-np.asarray(counts), kind="stable")
+        art._popular_order = order
+    return order
+
+def genre_columns(art: Artifacts, genres: Optional[Iterable[str]]) -> List[int]:
+    # columns of art.item_genres for `genres` (case-insensitive); empty when none is known or the
+    # artifacts carry no genre matrix
+    if not genres or getattr(art, "item_genres", None) is None or art.catalog is None:
+        return []
+    lookup = {g.lower(): i for i, g in enumerate(art.catalog.genre_names)}
+    return sorted({lookup[str(g).lower()] for g in genres if str(g).lower() in lookup})
+
+def genre_item_mask(art: Artifacts, genres: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+    # items tagged with any of `genres`; None = no constraint
+    cols = genre_columns(art, genres)
+    if not cols:
+        return None
+    return np.asarray(art.item_genres[:, cols].sum(axis=1)).ravel() > 0
+
+def popular_for_genres(art: Artifacts, genres: Optional[Iterable[str]] = None, k: int = 10) -> List[Tuple[int, str]]:
+    # cold start: most-rated items within the requested genres, for users with no history
+    top = _popular_candidates(art, k, [np.empty(0, dtype=np.int64)], genre_item_mask(art, genres))[0]
+    return art.titled(top[top >= 0])
+
+def _popular_candidates(art: Artifacts, n: int, known_rows: List[np.ndarray],
+                        mask: Optional[np.ndarray] = None) -> np.ndarray:
+    # first n most-rated items per user that the user has not rated (and that pass mask); -1 pads
+    order = popular_items(art)
+    if mask is not None:
+        order = order[mask[order]]
+    head = order[:n + max((len(kn) for kn in known_rows), default=0)]
+    out = np.full((len(known_rows), n), -1, dtype=np.int64)
+    for r, kn in enumerate(known_rows):
+        keep = head[~np.isin(head, kn)][:n]
+        out[r, :len(keep)] = keep
+    return out
+
+def _lookup_sparse(idx: np.ndarray, val: np.ndarray, at: np.ndarray) -> np.ndarray:
+    # value of a sparse (idx, val) vector at positions `at`, 0 where absent
+    if not len(idx):
+        return np.zeros(len(at), dtype=np.float32)
+    order = np.argsort(idx)
+    pos = np.minimum(np.searchsorted(idx, at, sorter=order), len(idx) - 1)
+    return np.where(idx[order[pos]] == at, val[order[pos]], 0.0)
+
+def _top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    # row-wise indices of the n largest scores; -1 where the score is -inf (nothing to offer)
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, kth=n - 1, axis=1)[:, :n]
+    return np.where(np.isfinite(np.take_along_axis(scores, top, axis=1)), top, -1)
+
+def _rerank(cand: np.ndarray, known, svd_c: np.ndarray, knn_c: np.ndarray, k: int,
+            alpha: float = ALPHA) -> List[np.ndarray]:
+    # hybrid scoring over each row's candidate set only: drop pads (-1), duplicates and known
+    # items, z-normalize over what is left, then top-k
+    order = np.argsort(cand, axis=1, kind="stable")
+    cand = np.take_along_axis(cand, order, axis=1)
+    svd_c = np.take_along_axis(svd_c, order, axis=1)
+    knn_c = np.take_along_axis(knn_c, order, axis=1)
+    valid = cand >= 0
+    valid[:, 1:] &= cand[:, 1:] != cand[:, :-1]
+    valid &= ~known(cand)
+    t = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # rows with no candidates left
+        hybrid = build_hybrid_score(np.where(valid, svd_c, np.nan), np.where(valid, knn_c, np.nan), alpha)
+    hybrid = np.where(valid, hybrid, -np.inf)
+    t = _tick(None, "hybrid_normalize", t)
+    kk = min(k, hybrid.shape[1])
+    if kk <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(len(cand))]
+    top = np.argpartition(-hybrid, kth=kk - 1, axis=1)[:, :kk]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(hybrid, top, axis=1), axis=1, kind="stable"), axis=1)
+    items = np.take_along_axis(cand, top, axis=1)
+    ok = np.take_along_axis(valid, top, axis=1)
+    _tick(None, "topk", t)
+    return [items[r][ok[r]] for r in range(len(items))]
+
+def _tick(timings: Optional[Dict[str, float]], stage: str, t0: float) -> float:
+    # closes a stage: always into the process-wide /metrics histograms, into `timings` if given
+    t1 = time.perf_counter()
+    observe_stage(stage, t1 - t0)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (t1 - t0) * 1000
+    return t1
+
+def recommend_for_user(art: Artifacts, raw_user_id: int, k: int = 10,
+                       timings: Optional[Dict[str, float]] = None,
+                       genres: Optional[Iterable[str]] = None) -> List[Tuple[int, str]]:
+    # two-stage: cheap candidate generators (SVD top-N, KNN neighbor union, popularity), then
+    # hybrid re-ranking over the candidates only; per-stage ms are added to `timings` if given.
+    # `genres` masks every generator before its top-N, so filtered requests still fill k
     if raw_user_id not in art.u_index:
         raise ValueError(f"Unknown user_id {raw_user_id}")
     uidx = art.u_index[raw_user_id]
-    svd_top = art.svd.recommend_for_user(uidx, known_item_indices=art.R[uidx].indices, k=max(k, 50))
-    knn_top = art.knn.recommend_for_user(uidx, art.R, k=max(k, 50))
-
-    # build hybrid score array across all items
-    svd_scores = art.svd.predict_all()[uidx]
-    knn_scores = art.knn.score_user(art.R[uidx].toarray().ravel(), exclude_indices=art.R[uidx].indices)
-    hybrid = build_hybrid_score(svd_scores, knn_scores)
-    # mask out known
-    hybrid[art.R[uidx].indices] = -1e9
-
-    top = np.argpartition(-hybrid, kth=min(k, len(hybrid)-1))[:k]
-    top = top[np.argsort(hybrid[top])[::-1]]
+    if getattr(art, "topn", None) is not None and timings is None and not genre_columns(art, genres):
+        top = art.topn.get(uidx, k, art.model_version)
+        if top is not None:
+            return art.titled(top)
+    row = art.R[uidx]
+    top = _recommend_vector(art, art.svd.U[uidx], art.svd.user_means[uidx], row.indices, row.data, k, timings, genres)
     # map indices back to movieIds
-    inv_i = {v:k for k,v in art.i_index.items()}
-    results = [(int(inv_i[i]), art.id_to_title[int(inv_i[i])]) for i in top]
-    return results
+    return art.titled(top)
+
+def _recommend_vector(art: Artifacts, u: np.ndarray, mean: float, known: np.ndarray, known_vals: np.ndarray,
+                      k: int, timings: Optional[Dict[str, float]] = None,
+                      genres: Optional[Iterable[str]] = None) -> np.ndarray:
+    # the candidate generators + re-ranker for one SVD factor row and sparse rating vector
+    # (a known user's, or an anonymous session's); returns item indices
+    if getattr(art, "shards", None) is not None:
+        # item-sharded: each shard generates candidates over its own items, merged here
+        return art.shards.recommend(u, mean, known, known_vals, k, timings, genre_columns(art, genres),
+                                    tail=art.shards.tail(art))
+    mask = genre_item_mask(art, genres)
+    t = time.perf_counter()
+    if art.ann_retrieval is not None and mask is None:
+        svd_cand, _ = art.ann_retrieval.search(u, k=CANDIDATES_SVD, exclude=known)
+    else:
+        svd_full = art.svd.score_vector(u, mean)
+        svd_full[known] = -np.inf
+        if mask is not None:
+            svd_full[~mask] = -np.inf
+        svd_cand = _top_n(svd_full[None, :], CANDIDATES_SVD)[0]
+    t = _tick(timings, "candidates_svd", t)
+
+    knn_idx, knn_val = art.knn.neighbor_scores(known, known_vals)
+    keep = ~np.isin(knn_idx, known)
+    if mask is not None:
+        keep &= mask[knn_idx]
+    knn_idx, knn_val = knn_idx[keep], knn_val[keep]
+    knn_cand = knn_idx[_top_n(knn_val[None, :], CANDIDATES_KNN)[0]] if len(knn_idx) else knn_idx
+    t = _tick(timings, "candidates_knn", t)
+
+    pop_cand = _popular_candidates(art, CANDIDATES_POP, [known], mask)[0]
+    t = _tick(timings, "candidates_pop", t)
+
+    cand = np.concatenate([svd_cand, knn_cand, pop_cand]).astype(np.int64)[None, :]
+    safe = np.maximum(cand[0], 0)
+    svd_c = (u @ art.svd.VT[:, safe] + mean)[None, :]
+    knn_c = _lookup_sparse(knn_idx, knn_val, safe)[None, :]
+    excluded = (lambda c: np.isin(c, known)) if mask is None else (lambda c: np.isin(c, known) | ~mask[np.maximum(c, 0)])
+    top = _rerank(cand, excluded, svd_c, knn_c, k)[0]
+    _tick(timings, "rerank", t)
+    return top
+
+def session_key(ratings: Dict[int, float], k: int, genres: Optional[Iterable[str]] = None) -> str:
+    # canonical hash of a session: order-free over (movieId, rating) pairs, plus k and genres
+    canon = json.dumps([sorted((int(m), float(r)) for m, r in ratings.items()), int(k),
+                        sorted(str(g).lower() for g in genres or [])])
+    return hashlib.sha1(canon.encode()).hexdigest()
+
+_SESSION_LOCK = threading.Lock()
+
+def recommend_for_session(art: Artifacts, ratings: Dict[int, float], k: int = 10,
+                          genres: Optional[Iterable[str]] = None) -> List[Tuple[int, str]]:
+    """Top-k for an anonymous session given as {movieId: rating}, without a user row.
+
+    The session vector is folded into SVD factor space (centered on the global mean rating, so a
+    few equal "likes" still point somewhere) and scored by the KNN neighbor graph; work scales
+    with the session's items and the catalog, never with the number of users. Movies the model
+    does not know are ignored; with none left, this is genre-conditioned popularity. Results are
+    cached on the artifacts under ``session_key``, so a model swap or fold-in starts a fresh cache.
+    """
+    key = session_key(ratings, k, genres)
+    with _SESSION_LOCK:
+        cache = getattr(art, "_session_cache", None)
+        if cache is None:
+            cache = art._session_cache = OrderedDict()
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return list(hit)
+    items = art.i_index.index(list(ratings))
+    vals = np.array(list(ratings.values()), dtype=np.float32)[items >= 0]
+    items = items[items >= 0]
+    if not len(items):
+        results = popular_for_genres(art, genres, k=k)
+    else:
+        center = _global_mean(art)
+        top = _recommend_vector(art, art.svd.project(items, vals, center), center, items, vals, k,
+                                genres=genres)
+        results = art.titled(top)
+    with _SESSION_LOCK:
+        cache[key] = results
+        while len(cache) > SESSION_CACHE_SIZE:
+            cache.popitem(last=False)
+    return list(results)
+
+def session_ratings(rows: Iterable[Dict[str, Any]]) -> Dict[int, float]:
+    # [{"movieId": 10, "rating": 4.5}, {"movieId": 20}] -> {10: 4.5, 20: 5.0}; a bare movieId is a like
+    return {int(r["movieId"]): float(r.get("rating", 5.0)) for r in rows}
+
+def recommend_for_intent(art: Artifacts, parsed: Dict[str, Any], k: int = 10, user_id: Optional[int] = None,
+                         ratings: Optional[List[Dict[str, Any]]] = None) -> List[Tuple[int, str]]:
+    # answer a parsed /llm query (intent, seed_movie, genres, k); the seed title is resolved
+    # through art.catalog. Genres mask every generator before top-k, so k results come back
+    k = int(parsed.get("k", k))
+    genres = parsed.get("genres", [])
+    seed = parsed.get("seed_movie")
+    seed_movie_id = art.catalog.find_movie_id(seed) if seed and art.catalog is not None else None
+    if parsed.get("intent", "recommend") == "similar" and seed_movie_id in art.i_index:
+        return similar_items(art, seed_movie_id, k=k, genres=genres)
+    if user_id is not None and int(user_id) in art.u_index:
+        return recommend_for_user(art, int(user_id), k=k, genres=genres)
+    if ratings or seed_movie_id in art.i_index:
+        # anonymous session: the caller's liked movies, or the seed movie alone
+        return recommend_for_session(art, session_ratings(ratings or [{"movieId": seed_movie_id}]), k=k, genres=genres)
+    # no user history: genre-conditioned popularity
+    return popular_for_genres(art, genres, k=k)
+
+def _global_mean(art: Artifacts) -> float:
+    # mean observed rating, computed once per artifacts
+    mean = getattr(art, "_global_mean", None)
+    if mean is None:
+        mean = float(art.R.data.mean()) if art.R.nnz else 0.0
+        art._global_mean = mean
+    return mean
+
+def similar_items(art: Artifacts, raw_movie_id: int, k: int = 10, genres: Optional[Iterable[str]] = None):
+    if raw_movie_id not in art.i_index:
+        raise ValueError(f"Unknown movie_id {raw_movie_id}")
+    midx = art.i_index[raw_movie_id]
+    with stage_timer("knn_similar"):
+        top = art.knn.similar_items(midx, k=k, mask=genre_item_mask(art, genres))
+    return art.titled(top)
+
+def recommend_for_users(art: Artifacts, raw_user_ids: Iterable[int], k: int = 10, block_size: int = 256,
+                        timings: Optional[Dict[str, float]] = None) -> Dict[int, List[Tuple[int, str]]]:
+    # batched recommend_for_user; unknown users are left out of the result. Users with a fresh
+    # precomputed top-N entry are served from it, as recommend_for_user does; the rest of each
+    # block is scored together
+    raw = np.asarray(list(raw_user_ids), dtype=np.int64)
+    uidx_all = art.u_index.index(raw)
+    raw, uidx_all = raw[uidx_all >= 0], uidx_all[uidx_all >= 0]
+    topn = getattr(art, "topn", None) if timings is None else None
+    out: Dict[int, List[Tuple[int, str]]] = {}
+    for start in range(0, len(raw), block_size):
+        ids, uidx = raw[start:start + block_size].tolist(), uidx_all[start:start + block_size]
+        tops = [topn.get(u, k, art.model_version) for u in uidx.tolist()] if topn is not None else [None] * len(ids)
+        miss = [r for r, top in enumerate(tops) if top is None]
+        if miss:
+            for r, top in zip(miss, recommend_block(art, uidx[miss], k, timings=timings)):
+                tops[r] = top
+        out.update(zip(ids, _split_titled(art, tops)))
+    return out
+
+def _split_titled(art: Artifacts, tops: List[np.ndarray]) -> List[List[Tuple[int, str]]]:
+    # one id/title translation for a whole batch of result lists, then cut back per row
+    flat = art.titled(np.concatenate(tops) if tops else np.empty(0, dtype=np.int64))
+    bounds = np.cumsum([0] + [len(t) for t in tops]).tolist()
+    return [flat[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+def recommend_block(art: Artifacts, uidx: np.ndarray, k: int = 10,
+                    timings: Optional[Dict[str, float]] = None, alpha: float = ALPHA) -> List[np.ndarray]:
+    # one GEMM against svd.VT and one sparse KNN product for a block of user indices feed the
+    # same candidate generators and re-ranker as recommend_for_user; returns item indices
+    R_block = art.R[uidx]
+    if getattr(art, "shards", None) is not None:
+        # the sharded path scores one user at a time; a block GEMM would need every item's factors here
+        tail = art.shards.tail(art)
+        return [art.shards.recommend(art.svd.U[u], art.svd.user_means[u], R_block.indices[a:b], R_block.data[a:b], k,
+                                     timings, tail=tail)
+                for u, a, b in zip(uidx.tolist(), R_block.indptr[:-1], R_block.indptr[1:])]
+    rows = np.repeat(np.arange(len(uidx)), np.diff(R_block.indptr))
+    known_rows = [R_block.indices[R_block.indptr[r]:R_block.indptr[r+1]] for r in range(len(uidx))]
+    t = time.perf_counter()
+
+    svd_full = art.svd.score_users(uidx)
+    svd_full[rows, R_block.indices] = -np.inf
+    if art.ann_retrieval is not None:
+        # the same index lookup _recommend_vector does, one user at a time, so both paths agree
+        svd_cand = np.full((len(uidx), min(CANDIDATES_SVD, svd_full.shape[1])), -1, dtype=np.int64)
+        for r, u in enumerate(uidx.tolist()):
+            found, _ = art.ann_retrieval.search(art.svd.U[u], k=CANDIDATES_SVD, exclude=known_rows[r])
+            svd_cand[r, :len(found)] = found
+    else:
+        svd_cand = _top_n(svd_full, CANDIDATES_SVD)
+    t = _tick(timings, "candidates_svd", t)
+
+    knn_full = art.knn.score_users(R_block)
+    knn_cand = _top_n(np.where(knn_full > 0, knn_full, -np.inf), CANDIDATES_KNN)
+    t = _tick(timings, "candidates_knn", t)
 
-def similar_items(art: Artifacts, raw_movie_id: int, k: int = 10):
+    pop_cand = _popular_candidates(art, CANDIDATES_POP, known_rows)
+    t = _tick(timings, "candidates_pop", t)
+
+    cand = np.concatenate([svd_cand, knn_cand, pop_cand], axis=1)
+    safe = np.maximum(cand, 0)
+    known = np.zeros(svd_full.shape, dtype=bool)
+    known[rows, R_block.indices] = True
+    if getattr(art.svd, "quant", None):
+        svd_c = art.svd.score_items(uidx, safe)  # exact re-score of the quantized scan's shortlist
+    else:
+        svd_c = np.take_along_axis(svd_full, safe, axis=1)
+    knn_c = np.maximum(np.take_along_axis(knn_full, safe, axis=1), 0.0)
+    tops = _rerank(cand, lambda c: np.take_along_axis(known, np.maximum(c, 0), axis=1), svd_c, knn_c, k, alpha)
+    _tick(timings, "rerank", t)
+    return tops
+
+def similar_items_many(art: Artifacts, raw_movie_ids: Iterable[int], k: int = 10) -> Dict[int, List[Tuple[int, str]]]:
+    # batched similar_items; unknown movies are left out of the result
+    raw = np.asarray(list(raw_movie_ids), dtype=np.int64)
+    midx = art.i_index.index(raw)
+    raw, midx = raw[midx >= 0], midx[midx >= 0]
+    with stage_timer("knn_similar"):
+        tops = art.knn.similar_items_batch(midx.tolist(), k=k)
+    return dict(zip(raw.tolist(), _split_titled(art, tops)))
+
+def ann_similar_items(art: Artifacts, raw_movie_id: int, k: int = 10, nprobe: Optional[int] = None,
+                      genres: Optional[Iterable[str]] = None):
+    # items closest to raw_movie_id in SVD factor space (cosine), via the IVF index. With genres,
+    # probed items outside them are dropped before the top-k; when the probed lists hold fewer
+    # than k that match, every list is searched
+    if art.ann_similar is None:
+        raise ValueError("ANN index not built (set ANN_ENABLED=1 and retrain)")
     if raw_movie_id not in art.i_index:
         raise ValueError(f"Unknown movie_id {raw_movie_id}")
     midx = art.i_index[raw_movie_id]
-    top = art.knn.similar_items(midx, k=k)
-    inv_i = {v:k for k,v in art.i_index.items()}
-    return [(int(inv_i[i]), art.id_to_title[int(inv_i[i])]) for i in top]
+    q, mask = art.svd.VT[:, midx], genre_item_mask(art, genres)
+    top, _ = art.ann_similar.search(q, k=k, nprobe=nprobe, exclude=[midx], mask=mask)
+    if mask is not None and len(top) < k:
+        top, _ = art.ann_similar.search(q, k=k, nprobe=art.ann_similar.nlist, exclude=[midx], mask=mask)
+    return art.titled(top)
+
+def ann_recommend_for_user(art: Artifacts, raw_user_id: int, k: int = 10, nprobe: Optional[int] = None):
+    # SVD-only user -> item retrieval via the inner-product IVF index (user mean does not change ranking)
+    if art.ann_retrieval is None:
+        raise ValueError("ANN index not built (set ANN_ENABLED=1 and retrain)")
+    if raw_user_id not in art.u_index:
+        raise ValueError(f"Unknown user_id {raw_user_id}")
+    uidx = art.u_index[raw_user_id]
+    top, _ = art.ann_retrieval.search(art.svd.U[uidx], k=k, nprobe=nprobe, exclude=art.R[uidx].indices)
+    return art.titled(top)
@@ -0,0 +1,71 @@
+"""Per-route request parsing and response shaping shared by app.py (Flask) and asgi_app.py.
+
+Both entry points pass query-string args / JSON bodies in as plain dicts, run the scoring call
+their own way (inline, coalesced, or on the ASGI scoring pool) and serialize what comes back, so
+the same request gets the same answer from either server.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from .catalog import Catalog
+from .data_prep import search_titles
+from .recommender import Artifacts, recommend_for_intent, session_key, session_ratings
+
+# served before a model is loaded; every other route answers 503 with NO_MODEL
+NO_MODEL_PATHS = ("/healthz", "/admin/model", "/metrics", "/stats/llm", "/stats/batching", "/stats/scoring")
+NO_MODEL = {"error": "No model loaded yet (run scripts/train.py)"}
+
+def titled(recs) -> List[Dict[str, Any]]:
+    return [{"movieId": mid, "title": title} for mid, title in recs]
+
+def genres_arg(args) -> Optional[List[str]]:
+    # ?genres=Action,Sci-Fi -> ["Action", "Sci-Fi"] (None when absent)
+    raw = args.get("genres", "")
+    return [g.strip() for g in raw.split(",") if g.strip()] or None
+
+def catalog(art: Artifacts) -> Catalog:
+    # title index persisted with the artifacts; legacy artifacts without one get it built once from
+    # their titles, as _pack does when migrating them (no dataset download on the request path)
+    if art.catalog is None:
+        art.catalog = Catalog.from_titles(art.id_to_title)
+    return art.catalog
+
+def search(art: Artifacts, args) -> List[Dict[str, Any]]:
+    return search_titles(catalog(art), args.get("q", ""), top=15).to_dict(orient="records")
+
+def user_args(args) -> Tuple[int, Optional[List[str]], Optional[Dict[str, float]]]:
+    # GET /recommend/user/<id>: (k, genres, per-stage timings dict when ?timings=1)
+    return int(args.get("k", 10)), genres_arg(args), {} if args.get("timings") == "1" else None
+
+def user_response(recs, timings: Optional[Dict[str, float]]):
+    return {"results": titled(recs), "timings_ms": timings} if timings is not None else titled(recs)
+
+def users_args(body: Dict[str, Any]) -> Tuple[List[int], int]:
+    return [int(u) for u in body.get("user_ids", [])], int(body.get("k", 10))
+
+def users_response(user_ids: List[int], recs: Dict[int, Any]) -> List[Dict[str, Any]]:
+    return [{"userId": uid, "results": titled(recs[uid])} if uid in recs else
+            {"userId": uid, "error": f"Unknown user_id {uid}"} for uid in user_ids]
+
+def session_args(body: Dict[str, Any]) -> Tuple[Dict[int, float], int, Optional[List[str]]]:
+    # { "ratings": [{"movieId": 10, "rating": 4.5}, ...], "k": 10, "genres": ["Comedy"] }
+    return session_ratings(body.get("ratings", [])), int(body.get("k", 10)), body.get("genres") or None
+
+def session_response(ratings: Dict[int, float], k: int, genres, recs) -> Dict[str, Any]:
+    # "session" is the cache key of the canonical (movieId, rating) set
+    return {"session": session_key(ratings, k, genres), "results": titled(recs)}
+
+def ratings_args(body: Dict[str, Any]) -> Tuple[int, Dict[int, float]]:
+    # { "user_id": 7, "ratings": [{"movieId": 10, "rating": 4.5}, ...] }
+    return int(body["user_id"]), {int(r["movieId"]): float(r["rating"]) for r in body.get("ratings", [])}
+
+def similar_args(args) -> Tuple[int, str, Optional[List[str]]]:
+    return int(args.get("k", 10)), args.get("method", "knn"), genres_arg(args)
+
+def llm_args(body: Dict[str, Any]) -> Tuple[str, int]:
+    return body.get("query", ""), int(body.get("k", 10))
+
+def llm(art: Artifacts, parsed: Dict[str, Any], k: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    catalog(art)  # seed titles are resolved through the catalog
+    results = recommend_for_intent(art, parsed, k, user_id=body.get("user_id"), ratings=body.get("ratings"))
+    return {"parsed": parsed, "results": titled(results)}
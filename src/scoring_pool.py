@@ -0,0 +1,44 @@
+from __future__ import annotations
+import asyncio, functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .config import SCORING_THREADS, SCORING_QUEUE
+from .metrics import METRICS
+
+class Overloaded(Exception):
+    """Raised instead of queueing when the scoring pool is full; served as a 503."""
+
+class ScoringPool:
+    """Bounded thread pool for NumPy/SciPy scoring called from an event loop.
+
+    BLAS kernels and sparse products release the GIL, so `threads` scoring calls on one shared
+    Artifacts overlap on real cores while the loop keeps accepting requests. At most
+    `threads + queue` calls are admitted at once; the next one raises Overloaded right away
+    rather than piling up behind the others. Admission is counted on the loop thread only.
+    """
+
+    def __init__(self, threads: int = SCORING_THREADS, queue: int = SCORING_QUEUE):
+        self.threads = max(1, threads)
+        self.limit = self.threads + max(0, queue)
+        self.inflight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="scoring")
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.inflight >= self.limit:
+            self.rejected += 1
+            METRICS.inc("recsys_scoring_rejected_total")
+            raise Overloaded(f"{self.inflight} scoring calls in flight")
+        self.inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.inflight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"threads": self.threads, "limit": self.limit, "inflight": self.inflight, "rejected": self.rejected}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,390 @@
+from __future__ import annotations
+import argparse, heapq, itertools, os, shutil, subprocess, sys, tempfile, threading, time, weakref
+import numpy as np
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .config import CANDIDATES_SVD, CANDIDATES_KNN, CANDIDATES_POP, SHARD_MODE, SHARD_ADDRESSES, SHARD_AUTHKEY
+from .models.svd_model import SVDRecommender
+from .models.knn_model import ItemCosineKNN
+from .artifact_store import write_arrays, read_arrays, pack_csr, unpack_csr
+from .recommender import Artifacts, MODEL_DIR, resolve_model_path, _top_n, _rerank, _tick, _lookup_sparse
+
+SHARDS_DIR = "shards"  # <version>/shards/<i>/, one artifact directory per item range
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def split_items(n_items: int, n_shards: int) -> List[int]:
+    # contiguous item ranges as n_shards + 1 boundaries, sizes differing by at most one
+    n_shards = max(1, min(n_shards, n_items)) if n_items else 1
+    return [n_items * s // n_shards for s in range(n_shards + 1)]
+
+def _sorted_desc(ids: np.ndarray, scores: np.ndarray):
+    # by score descending, then item index ascending (the order a stable global sort gives)
+    order = np.lexsort((ids, -scores))
+    return ids[order], scores[order]
+
+class ItemShard:
+    """Items [lo, hi) of a model, enough to generate candidates for any user over that slice.
+
+    Holds the slice's SVD item factors (and quantized copy), its columns of the KNN neighbor
+    graph (rows stay indexed by every item, so a user's history of any item finds its
+    neighbors here), popularity counts and genre rows. Item indices in and out are global.
+    """
+
+    def __init__(self, lo: int, hi: int, n_items: int, svd: SVDRecommender, knn: ItemCosineKNN,
+                 popularity: np.ndarray, item_genres=None, model_version: Optional[str] = None):
+        self.lo, self.hi, self.n_items = lo, hi, n_items
+        self.svd = svd
+        self.knn = knn
+        self.popularity = popularity
+        self.item_genres = item_genres
+        self.model_version = model_version
+        self._pop_order = np.argsort(-np.asarray(popularity), kind="stable")
+
+    @classmethod
+    def from_artifacts(cls, art: Artifacts, lo: int, hi: int) -> "ItemShard":
+        if art.knn.sim is None:
+            raise ValueError("Item sharding needs the precomputed KNN neighbor graph (ItemCosineKNN(precompute=True))")
+        svd = SVDRecommender(n_components=art.svd.n_components, random_state=art.svd.random_state)
+        svd.VT = np.ascontiguousarray(art.svd.VT[:, lo:hi])
+        if getattr(art.svd, "quant", None):
+            svd.quant, svd.item_q = art.svd.quant, art.svd.item_q[lo:hi]
+            svd.item_scale = art.svd.item_scale[lo:hi] if art.svd.item_scale is not None else None
+        knn = ItemCosineKNN(topk=art.knn.topk)
+        knn.sim = art.knn.sim.tocsr()[:, lo:hi]
+        counts = art.item_popularity if art.item_popularity is not None else np.bincount(art.R.indices, minlength=art.R.shape[1])
+        return cls(lo, hi, art.R.shape[1], svd, knn, np.asarray(counts[lo:hi]),
+                   art.item_genres[lo:hi] if art.item_genres is not None else None, art.model_version)
+
+    # --- artifact directory format ---
+    def save(self, path: str) -> None:
+        arrays: Dict[str, np.ndarray] = {"svd_VT": self.svd.VT, "popularity": self.popularity}
+        meta: Dict[str, Any] = {"lo": self.lo, "hi": self.hi, "n_items": self.n_items, "model_version": self.model_version,
+                                "svd": {"n_components": self.svd.n_components, "random_state": self.svd.random_state},
+                                "knn_topk": self.knn.topk, "knn_sim_shape": pack_csr(arrays, "knn_sim", self.knn.sim)}
+        if self.svd.quant:
+            arrays["svd_item_q"] = self.svd.item_q
+            if self.svd.item_scale is not None:
+                arrays["svd_item_scale"] = self.svd.item_scale
+            meta["svd_quant"] = self.svd.quant
+        if self.item_genres is not None:
+            meta["item_genres_shape"] = pack_csr(arrays, "item_genres", self.item_genres)
+        write_arrays(path, arrays, meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ItemShard":
+        arrays, meta = read_arrays(path, mmap=mmap)
+        svd = SVDRecommender(**meta["svd"])
+        svd.VT = arrays["svd_VT"]
+        if meta.get("svd_quant"):
+            svd.quant, svd.item_q, svd.item_scale = meta["svd_quant"], arrays["svd_item_q"], arrays.get("svd_item_scale")
+        knn = ItemCosineKNN(topk=meta["knn_topk"])
+        knn.sim = unpack_csr(arrays, "knn_sim", meta["knn_sim_shape"])
+        genres = unpack_csr(arrays, "item_genres", meta["item_genres_shape"]) if meta.get("item_genres_shape") else None
+        return cls(meta["lo"], meta["hi"], meta["n_items"], svd, knn, arrays["popularity"], genres, meta.get("model_version"))
+
+    # --- scoring ---
+    def info(self) -> Dict[str, Any]:
+        return {"lo": self.lo, "hi": self.hi, "n_items": self.n_items, "model_version": self.model_version}
+
+    def candidates(self, u: np.ndarray, mean: float, known: np.ndarray, known_vals: np.ndarray,
+                   genre_cols: Sequence[int] = (), n_svd: int = CANDIDATES_SVD, n_knn: int = CANDIDATES_KNN,
+                   n_pop: int = CANDIDATES_POP) -> Dict[str, np.ndarray]:
+        """The three candidate generators of ``_recommend_vector`` restricted to this shard's items.
+
+        Returns each generator's local top-n as (global item, generator score) sorted best first,
+        plus the exact SVD and KNN scores of every item in their union for the re-ranker.
+        """
+        known = np.asarray(known, dtype=np.int64)
+        known_vals = np.asarray(known_vals, dtype=np.float32)
+        local_known = known[(known >= self.lo) & (known < self.hi)] - self.lo
+        mask = None
+        if len(genre_cols) and self.item_genres is not None:
+            mask = np.asarray(self.item_genres[:, list(genre_cols)].sum(axis=1)).ravel() > 0
+
+        svd_full = self.svd.score_vector(u, mean)
+        svd_full[local_known] = -np.inf
+        if mask is not None:
+            svd_full[~mask] = -np.inf
+        svd_cand = _top_n(svd_full[None, :], n_svd)[0]
+        svd_cand = svd_cand[svd_cand >= 0]
+
+        # history items appended by fold-ins after this shard was cut have no neighbor row here
+        rated = known < self.knn.sim.shape[0]
+        knn_idx, knn_val = self.knn.neighbor_scores(known[rated], known_vals[rated])
+        keep = ~np.isin(knn_idx, local_known)
+        if mask is not None:
+            keep &= mask[knn_idx]
+        knn_idx, knn_val = knn_idx[keep], knn_val[keep]
+        knn_cand = knn_idx[_top_n(knn_val[None, :], n_knn)[0]] if len(knn_idx) else knn_idx
+
+        order = self._pop_order if mask is None else self._pop_order[mask[self._pop_order]]
+        head = order[:n_pop + len(local_known)]
+        pop_cand = head[~np.isin(head, local_known)][:n_pop]
+
+        items = np.unique(np.concatenate([svd_cand, knn_cand, pop_cand]).astype(np.int64))
+        return {"svd": _sorted_desc(svd_cand + self.lo, svd_full[svd_cand]),
+                "knn": _sorted_desc(knn_cand + self.lo, _lookup_sparse(knn_idx, knn_val, knn_cand)),
+                "pop": _sorted_desc(pop_cand + self.lo, np.asarray(self.popularity[pop_cand], dtype=np.float64)),
+                "items": items + self.lo,
+                "svd_c": u @ self.svd.VT[:, items] + np.float32(mean),
+                "knn_c": _lookup_sparse(knn_idx, knn_val, items)}
+
+    def handle(self, req: Dict[str, Any]) -> Any:
+        op = req.pop("op")
+        if op == "info":
+            return self.info()
+        if op == "candidates":
+            return self.candidates(**req)
+        raise ValueError(f"Unknown shard op {op!r}")
+
+    def send(self, req: Dict[str, Any]) -> Callable[[], Any]:
+        # in-process shard: answered right away (the remote one answers on recv)
+        out = self.handle(dict(req))
+        return lambda: out
+
+def save_shards(art: Artifacts, path: str, n_shards: int) -> List[str]:
+    # <path>/<i>/ per item range; written before the version's CURRENT pointer goes live
+    bounds = split_items(art.R.shape[1], n_shards)
+    dirs = []
+    for s, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        dirs.append(os.path.join(path, f"{s:03d}"))
+        ItemShard.from_artifacts(art, lo, hi).save(dirs[-1])
+    return dirs
+
+def shard_dirs(path: str) -> List[str]:
+    return sorted(os.path.join(path, d) for d in os.listdir(path) if not d.endswith(".tmp"))
+
+def _address(addr: str):
+    # "host:port" -> TCP, anything else is a Unix socket path
+    host, sep, port = addr.rpartition(":")
+    return (host, int(port)) if sep and port.isdigit() and "/" not in addr else addr
+
+class RemoteShard:
+    """A shard served by another process (`python -m src.sharding`), one connection per thread."""
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, proc: Optional[subprocess.Popen] = None):
+        self.address = address
+        self.authkey = authkey
+        self.proc = proc
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(_address(self.address), authkey=self.authkey)
+        return conn
+
+    def send(self, req: Dict[str, Any]) -> Callable[[], Any]:
+        conn = self._conn()
+        try:
+            conn.send(req)
+        except OSError:
+            self._local.conn = None
+            raise
+        def result():
+            try:
+                out = conn.recv()
+            except (EOFError, OSError):
+                self._local.conn = None
+                raise ConnectionError(f"Shard at {self.address} closed the connection")
+            if isinstance(out, Exception):
+                raise out
+            return out
+        return result
+
+class ShardedScorer:
+    """Scatter-gather front end of `_recommend_vector` over item shards.
+
+    Every shard gets the user's factor row and sparse history and answers with its local
+    top-n per candidate generator; those lists are merged with a k-way heap into the same
+    global top-n the single-process path picks, and the union goes through the same
+    `_rerank`. The hybrid z-normalization runs over the candidate set only, so the gathered
+    candidate scores are all it needs and results match the unsharded path.
+    """
+
+    def __init__(self, shards: Sequence[Any], n_svd: int = CANDIDATES_SVD, n_knn: int = CANDIDATES_KNN,
+                 n_pop: int = CANDIDATES_POP, cleanup: Optional[Callable[[], None]] = None):
+        self.shards = list(shards)
+        self.n_svd, self.n_knn, self.n_pop = n_svd, n_knn, n_pop
+        self.n_items: Optional[int] = None  # items the shards cover, known after check()
+        # worker processes go away with the last Artifacts that references this scorer
+        self._finalizer = weakref.finalize(self, cleanup) if cleanup is not None else None
+
+    @classmethod
+    def local(cls, art: Artifacts, n_shards: int, **kwargs) -> "ShardedScorer":
+        # in-process shards cut from loaded artifacts (tests, and checking a shard layout)
+        bounds = split_items(art.R.shape[1], n_shards)
+        return cls([ItemShard.from_artifacts(art, lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])], **kwargs)
+
+    @classmethod
+    def connect(cls, addresses: Sequence[str], authkey: str = SHARD_AUTHKEY, **kwargs) -> "ShardedScorer":
+        if not authkey:
+            raise ValueError("SHARD_AUTHKEY must be set to connect to remote shards")
+        return cls([RemoteShard(a, authkey.encode()) for a in addresses], **kwargs)
+
+    @classmethod
+    def launch(cls, path: str, timeout: float = 30.0, **kwargs) -> "ShardedScorer":
+        # one worker process per shard directory under `path`, each on its own Unix socket
+        sock_dir = tempfile.mkdtemp(prefix="recsys-shards-")
+        authkey = os.urandom(16).hex()
+        env = dict(os.environ, SHARD_AUTHKEY=authkey)
+        shards = []
+        for s, d in enumerate(shard_dirs(path)):
+            addr = os.path.join(sock_dir, f"{s}.sock")
+            proc = subprocess.Popen([sys.executable, "-m", "src.sharding", "--path", os.path.abspath(d), "--address", addr],
+                                    cwd=PROJECT_ROOT, env=env)
+            shards.append(RemoteShard(addr, authkey.encode(), proc))
+        procs = [s.proc for s in shards]
+        scorer = cls(shards, cleanup=lambda: _stop_workers(procs, sock_dir), **kwargs)
+        deadline = time.monotonic() + timeout
+        for shard in shards:
+            while True:
+                try:
+                    shard.send({"op": "info"})()
+                    break
+                except (OSError, EOFError):
+                    if shard.proc.poll() is not None or time.monotonic() > deadline:
+                        scorer.close()
+                        raise RuntimeError(f"Shard worker for {shard.address} did not start")
+                    time.sleep(0.05)
+        return scorer
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def _scatter(self, req: Dict[str, Any]) -> List[Any]:
+        # send to every shard first, then collect: remote shards work concurrently. Every reply
+        # that was asked for is read even after a failure, so no connection is left out of step
+        pending, error = [], None
+        for shard in self.shards:
+            try:
+                pending.append(shard.send(req))
+            except Exception as e:
+                error = e
+                break
+        results = []
+        for result in pending:
+            try:
+                results.append(result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def check(self, art: Artifacts) -> "ShardedScorer":
+        # the shards must be cut from this model version and cover its items without gaps
+        infos = sorted(self._scatter({"op": "info"}), key=lambda i: i["lo"])
+        stale = {i["model_version"] for i in infos} - {art.model_version}
+        if stale:
+            raise ValueError(f"Shards serve model {sorted(stale)}, artifacts are {art.model_version}")
+        bounds = [0] + [i["hi"] for i in infos]
+        if [i["lo"] for i in infos] != bounds[:-1] or bounds[-1] != art.R.shape[1]:
+            raise ValueError(f"Shards cover items {[(i['lo'], i['hi']) for i in infos]}, model has {art.R.shape[1]}")
+        self.n_items = bounds[-1]
+        return self
+
+    def tail(self, art: Artifacts) -> Optional[ItemShard]:
+        # items fold-ins appended after the shards were cut have no shard; they are scored here as
+        # one more in-process shard, cut once per served Artifacts (a fold-in swaps in a new one)
+        if self.n_items is None or art.R.shape[1] <= self.n_items:
+            return None
+        tail = getattr(art, "_shard_tail", None)
+        if tail is None:
+            tail = art._shard_tail = ItemShard.from_artifacts(art, self.n_items, art.R.shape[1])
+        return tail
+
+    def recommend(self, u: np.ndarray, mean: float, known: np.ndarray, known_vals: np.ndarray, k: int,
+                  timings: Optional[Dict[str, float]] = None, genre_cols: Sequence[int] = (),
+                  tail: Optional[ItemShard] = None) -> np.ndarray:
+        # tail: the in-process shard of items added since the shards were cut (see tail())
+        known = np.asarray(known, dtype=np.int64)
+        t = time.perf_counter()
+        req = {"op": "candidates", "u": np.asarray(u, dtype=np.float32), "mean": float(mean),
+               "known": known, "known_vals": np.asarray(known_vals, dtype=np.float32),
+               "genre_cols": list(genre_cols), "n_svd": self.n_svd, "n_knn": self.n_knn, "n_pop": self.n_pop}
+        parts = self._scatter(req)
+        if tail is not None:
+            parts.append(tail.send(req)())
+        t = _tick(timings, "shard_candidates", t)
+
+        cand = np.concatenate([_merge_top([p[gen] for p in parts], n)
+                               for gen, n in (("svd", self.n_svd), ("knn", self.n_knn), ("pop", self.n_pop))])
+        items = np.concatenate([p["items"] for p in parts])  # disjoint item ranges
+        order = np.argsort(items)
+        pos = order[np.searchsorted(items, cand, sorter=order)] if len(items) else np.empty(0, dtype=np.int64)
+        svd_c = np.concatenate([p["svd_c"] for p in parts])[pos]
+        knn_c = np.concatenate([p["knn_c"] for p in parts])[pos]
+        t = _tick(timings, "shard_merge", t)
+        top = _rerank(cand[None, :], lambda c: np.isin(c, known), svd_c[None, :], knn_c[None, :], k)[0]
+        _tick(timings, "rerank", t)
+        return top
+
+def _merge_top(lists, n: int) -> np.ndarray:
+    # k-way heap merge of per-shard (items, scores) lists sorted best first; the first n items
+    runs = [zip((-np.asarray(s, dtype=np.float64)).tolist(), np.asarray(i).tolist()) for i, s in lists]
+    return np.fromiter((i for _, i in itertools.islice(heapq.merge(*runs), n)), dtype=np.int64)
+
+def _stop_workers(procs: List[subprocess.Popen], sock_dir: str) -> None:
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    shutil.rmtree(sock_dir, ignore_errors=True)
+
+def attach_shards(art: Artifacts, root: str = MODEL_DIR, mode: str = SHARD_MODE,
+                  addresses: Sequence[str] = SHARD_ADDRESSES) -> Artifacts:
+    # serving-time hook next to attach_topn: score through the loaded version's shards when
+    # SHARD_MODE asks for it; raises (so the reloader keeps the old version) on a mismatch
+    art.shards = None
+    if mode == "process":
+        path = os.path.join(resolve_model_path(root), SHARDS_DIR)
+        if os.path.isdir(path):
+            art.shards = ShardedScorer.launch(path).check(art)
+    elif mode == "remote":
+        art.shards = ShardedScorer.connect(addresses).check(art)
+    elif mode:
+        raise ValueError(f"Unknown SHARD_MODE {mode!r} (expected 'process' or 'remote')")
+    return art
+
+def _serve_conn(shard: ItemShard, conn) -> None:
+    with conn:
+        while True:
+            try:
+                req = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                out = shard.handle(req)
+            except Exception as e:
+                out = e
+            conn.send(out)
+
+def serve(path: str, address: str, authkey: Optional[bytes] = None) -> None:
+    # one thread per front-end connection; NumPy/SciPy release the GIL while scoring
+    shard = ItemShard.load(path)
+    with Listener(_address(address), authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:  # failed authentication or a dropped handshake
+                continue
+            threading.Thread(target=_serve_conn, args=(shard, conn), daemon=True).start()
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve one item shard of a published model")
+    ap.add_argument("--path", required=True, help="shard directory, e.g. artifacts/recsys/versions/<v>/shards/000")
+    ap.add_argument("--address", required=True, help="Unix socket path, or host:port")
+    args = ap.parse_args()
+    if not SHARD_AUTHKEY:
+        ap.error("set SHARD_AUTHKEY (shared with the front end)")
+    serve(args.path, args.address, SHARD_AUTHKEY.encode())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import dataclasses, itertools, os, tempfile, time
+import pandas as pd
+from multiprocessing import Pool
+from typing import Any, Dict, List, Optional, Sequence
+
+from .config import MF_BACKEND, ALS_REG, ALS_ITERATIONS, ALS_THREADS, SVD_QUANT
+from .models.als_model import ALSRecommender
+from .recommender import Artifacts, train_and_pack, save_artifacts, load_artifacts
+from .evaluate import heldout_matrix, rmse_on, ranking_metrics
+
+def variant(base: Artifacts, svd_components: int, knn_topk: int, factors: Optional[Dict[int, Any]] = None) -> Artifacts:
+    # a smaller model carved out of the max-rank / max-topk fit, without refitting; factors holds
+    # per-rank fits for backends that cannot be truncated (ALS)
+    svd = factors[svd_components] if factors else base.svd.truncated(svd_components)
+    return dataclasses.replace(base, svd=svd, knn=base.knn.truncated(knn_topk),
+                               ann_similar=None, ann_retrieval=None, topn=None)
+
+def _evaluate_combo(base: Artifacts, test_df: pd.DataFrame, truth, svd_components: int, knn_topk: int,
+                    alphas: Sequence[float], k: int, block_size: int,
+                    factors: Optional[Dict[int, Any]] = None) -> List[Dict[str, Any]]:
+    # ALPHA only changes the re-ranking blend, so every alpha reuses the same model
+    art = variant(base, svd_components, knn_topk, factors)
+    rmse = rmse_on(art, test_df)
+    rows = []
+    for alpha in alphas:
+        t0 = time.perf_counter()
+        metrics = ranking_metrics(art, truth, k=k, block_size=block_size, alpha=alpha)
+        rows.append({"svd_components": svd_components, "knn_topk": knn_topk, "alpha": alpha, "rmse": rmse,
+                     **metrics, "eval_seconds": time.perf_counter() - t0})
+    return rows
+
+_base = None
+_test = None
+_truth = None
+_factors = None
+
+def _init(model_dir, test_df, truth, factors):
+    # the base model (R, max-rank factors, max-topk neighbor graph) is memory-mapped read-only,
+    # so every worker shares one copy through the page cache
+    global _base, _test, _truth, _factors
+    _base = load_artifacts(model_dir)
+    _test, _truth, _factors = test_df, truth, factors
+
+def _work(task):
+    svd_components, knn_topk, alphas, k, block_size = task
+    return _evaluate_combo(_base, _test, _truth, svd_components, knn_topk, alphas, k, block_size, _factors)
+
+def run_sweep(R, u_index, i_index, id_to_title, test_df: pd.DataFrame, alphas: Sequence[float],
+              svd_components: Sequence[int], knn_topk: Sequence[int], k: int = 10, block_size: int = 256,
+              workers: int = 1, metric: Optional[str] = None, mf: str = MF_BACKEND) -> pd.DataFrame:
+    """Grid over ALPHA x SVD_COMPONENTS x KNN_TOPK, sorted best first by ``metric`` (default ndcg@k).
+
+    SVD is fitted once at the largest rank and KNN once at the largest top-k; smaller settings
+    are truncations of those fits and alphas only re-rank. ALS components have no importance
+    order, so with ``mf="als"`` every rank is its own fit. (rank, topk) pairs are spread over
+    ``workers`` processes that memory-map the saved base model.
+    """
+    t0 = time.perf_counter()
+    base = train_and_pack(R, u_index, i_index, id_to_title,
+                          svd_components=max(svd_components), knn_topk=max(knn_topk), mf=mf)
+    factors = None
+    if mf == "als":
+        factors = {base.svd.n_components: base.svd}
+        for c in set(svd_components) - set(factors):
+            als = ALSRecommender(n_components=c, reg=ALS_REG, threads=ALS_THREADS)
+            factors[c] = als.fit(base.R, iterations=ALS_ITERATIONS).quantize(SVD_QUANT)
+    fit_seconds = time.perf_counter() - t0
+    truth = heldout_matrix(base, test_df)
+
+    combos = list(itertools.product(sorted(svd_components), sorted(knn_topk)))
+    if workers > 1 and len(combos) > 1:
+        with tempfile.TemporaryDirectory() as tmp:
+            model_dir = os.path.join(tmp, "base")
+            save_artifacts(base, model_dir)
+            with Pool(min(workers, len(combos)), initializer=_init, initargs=(model_dir, test_df, truth, factors)) as pool:
+                parts = pool.map(_work, [(c, t, list(alphas), k, block_size) for c, t in combos])
+    else:
+        parts = [_evaluate_combo(base, test_df, truth, c, t, alphas, k, block_size, factors) for c, t in combos]
+
+    board = pd.DataFrame([row for part in parts for row in part])
+    board["fit_seconds"] = fit_seconds  # shared by every row: one fit per sweep
+    metric = metric or f"ndcg@{k}"
+    return board.sort_values(metric, ascending=(metric == "rmse"), kind="stable").reset_index(drop=True)
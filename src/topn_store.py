@@ -0,0 +1,85 @@
+from __future__ import annotations
+import os, json, shutil, zlib
+import numpy as np
+from typing import Optional
+
+META = "meta.json"
+INVALID = 0  # tag of an invalidated (or never written) entry
+
+def version_tag(model_version: Optional[str]) -> int:
+    # compact per-entry model version: crc32 of the artifacts' model_version (never INVALID)
+    return zlib.crc32((model_version or "").encode("utf-8")) or 1
+
+class TopNStore:
+    """Precomputed top-N item indices per user, memory-mapped from two .npy files.
+
+    items.npy is (n_users x N) int32 with -1 padding; tags.npy holds one uint32 model
+    version tag per user. tags are mapped read-write and shared, so invalidate() in one
+    worker is seen by every process serving the same store.
+    """
+
+    def __init__(self, path: str, items: np.ndarray, tags: np.ndarray, n: int, model_version: Optional[str]):
+        self.path = path
+        self.items = items
+        self.tags = tags
+        self.n = n
+        self.model_version = model_version
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, META))
+
+    @classmethod
+    def create(cls, path: str, n_users: int, n: int, model_version: Optional[str]) -> "TopNStore":
+        # allocate an empty store (all entries invalid) in a temp dir; publish() renames it into place
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        items = np.lib.format.open_memmap(os.path.join(tmp, "items.npy"), mode="w+", dtype=np.int32, shape=(n_users, n))
+        items[:] = -1
+        tags = np.lib.format.open_memmap(os.path.join(tmp, "tags.npy"), mode="w+", dtype=np.uint32, shape=(n_users,))
+        tags[:] = INVALID
+        items.flush(); tags.flush()
+        return cls(tmp, items, tags, n, model_version)
+
+    def publish(self, path: str) -> None:
+        self.items.flush(); self.tags.flush()
+        with open(os.path.join(self.path, META), "w") as f:
+            json.dump({"n": self.n, "n_users": int(self.items.shape[0]), "model_version": self.model_version}, f)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(self.path, path)
+        self.path = path
+
+    @classmethod
+    def open(cls, path: str, writable: bool = True) -> "TopNStore":
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        items = np.load(os.path.join(path, "items.npy"), mmap_mode="r")
+        tags = np.load(os.path.join(path, "tags.npy"), mmap_mode="r+" if writable else "r")
+        return cls(path, items, tags, meta["n"], meta.get("model_version"))
+
+    def open_rows(self) -> "TopNStore":
+        # re-open a temp store for writing from a worker process
+        items = np.load(os.path.join(self.path, "items.npy"), mmap_mode="r+")
+        tags = np.load(os.path.join(self.path, "tags.npy"), mmap_mode="r+")
+        return TopNStore(self.path, items, tags, self.n, self.model_version)
+
+    def write(self, uidx: np.ndarray, tops, model_version: Optional[str]) -> None:
+        tag = version_tag(model_version)
+        for u, top in zip(uidx, tops):
+            m = min(len(top), self.n)
+            self.items[u, :m] = top[:m]
+            self.items[u, m:] = -1
+            self.tags[u] = tag
+
+    def get(self, uidx: int, k: int, model_version: Optional[str]) -> Optional[np.ndarray]:
+        # O(1) lookup; None when the caller must score live (k > N, invalidated or stale entry)
+        if k > self.n or uidx >= len(self.tags) or self.tags[uidx] != version_tag(model_version):
+            return None
+        row = self.items[uidx, :k]
+        return row[row >= 0].astype(np.int64)
+
+    def invalidate(self, uidx: int) -> None:
+        if uidx < len(self.tags) and self.tags.flags.writeable:
+            self.tags[uidx] = INVALID
@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 from src.recommender import load_or_train, train_and_pack, recommend_for_user, similar_items
-from src.data_prep import download_movielens_if_needed, load_movielens, filter_min_counts, build_user_item_matrix, search_titles
+from src.data_prep import download_movielens_if_needed, load_movielens, load_movies, load_ratings_matrix, search_titles
 from src.config import DATA_DIR
+from src.catalog import Catalog
 
 st.set_page_config(page_title="Intelligent Movie Recommender", layout="wide")
 
@@ -10,21 +11,26 @@ st.set_page_config(page_title="Intelligent Movie Recommender", layout="wide")
 def load_artifacts():
     def _build():
         root = download_movielens_if_needed(DATA_DIR)
-        ratings, movies = load_movielens(root)
-        ratings = filter_min_counts(ratings)
-        R, u_idx, i_idx = build_user_item_matrix(ratings)
+        movies = load_movies(root)
+        R, u_idx, i_idx = load_ratings_matrix(root)
         id_to_title = dict(zip(movies.movieId, movies.title))
-        return train_and_pack(R, u_idx, i_idx, id_to_title)
+        return train_and_pack(R, u_idx, i_idx, id_to_title, movies=movies)
     return load_or_train(_build)
 
+@st.cache_data
+def load_dataset():
+    root = download_movielens_if_needed(DATA_DIR)
+    return load_movielens(root)
+
 art = load_artifacts()
+catalog = art.catalog if art.catalog is not None else Catalog.from_movies(load_dataset()[1])
 
 st.title("🎬 Intelligent Movie Recommendation System")
 tab1, tab2, tab3 = st.tabs(["Recommend for User", "Similar Movies", "Search & Explore"])
 
 with tab1:
     st.subheader("User-based Recommendations")
-    all_users = sorted(list(art.u_index.keys()))
+    all_users = art.users_sorted.tolist()
     user = st.selectbox("Choose a userId", all_users if all_users else [1])
     k = st.slider("How many recommendations?", 5, 30, 10, 1)
     if st.button("Get Recommendations", key="rec_user"):
@@ -36,9 +42,7 @@ with tab2:
     st.subheader("Find Similar Movies")
     q = st.text_input("Search a movie title to pick a seed (e.g., Inception)", "")
     if q:
-        root = download_movielens_if_needed(DATA_DIR)
-        _, movies = load_movielens(root)
-        hits = search_titles(movies, q, top=10)
+        hits = search_titles(catalog, q, top=10)
         if not hits.empty:
             title_map = {f"{row['title']} (id={row['movieId']})": int(row['movieId']) for _,row in hits.iterrows()}
             choice = st.selectbox("Pick one:", list(title_map.keys()))
@@ -53,8 +57,7 @@ with tab2:
 
 with tab3:
     st.subheader("Quick dataset peek")
-    root = download_movielens_if_needed(DATA_DIR)
-    ratings, movies = load_movielens(root)
+    ratings, movies = load_dataset()
     st.write("Sample Ratings")
     st.dataframe(ratings.head(20), use_container_width=True)
     st.write("Sample Movies")
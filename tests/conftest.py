@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+# the 5 users x 6 movies rating set most tests share: raw userIds 1..5 are rows 0..4,
+# movieIds 10..60 are columns 0..5
+MINI_USERS = [1, 2, 3, 4, 5]
+MINI_MOVIES = [10, 20, 30, 40, 50, 60]
+
+def _mini_ratings() -> csr_matrix:
+    data = np.array([5,4,3,4,5,2,1,4,5,3,2,4,5,3,4,2], dtype=float)
+    rows = np.array([0,0,1,1,2,2,2,3,3,3,4,4,1,2,3,4])
+    cols = np.array([0,1,1,2,2,3,4,1,4,5,0,5,3,0,2,4])
+    return csr_matrix((data, (rows, cols)), shape=(5,6))
+
+def _mini_artifacts(titles=None):
+    # SVD (3 components) + item KNN (top 3) over the mini ratings; titles default to "Movie <id> (é)"
+    from src.models.svd_model import SVDRecommender
+    from src.models.knn_model import ItemCosineKNN
+    from src.recommender import Artifacts
+    R = _mini_ratings()
+    return Artifacts(svd=SVDRecommender(n_components=3, random_state=0).fit(R), knn=ItemCosineKNN(topk=3).fit(R),
+                     R=R, u_index={raw: i for i, raw in enumerate(MINI_USERS)},
+                     i_index={mid: i for i, mid in enumerate(MINI_MOVIES)},
+                     id_to_title=titles or {mid: f"Movie {mid} (é)" for mid in MINI_MOVIES})
+
+@pytest.fixture
+def mini_R() -> csr_matrix:
+    return _mini_ratings()
+
+@pytest.fixture
+def make_mini_art():
+    # factory, for tests that need several independent copies (or their own titles)
+    return _mini_artifacts
+
+@pytest.fixture
+def mini_art():
+    return _mini_artifacts()
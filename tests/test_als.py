@@ -0,0 +1,62 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import random as sparse_random
+
+def _ratings(users=60, items=40, density=0.2, seed=0):
+    R = sparse_random(users, items, density=density, format="csr", random_state=seed, dtype=np.float32)
+    R.data = np.ceil(R.data * 5)
+    return R
+
+def test_block_solver_matches_direct_ridge():
+    from src.models.als_model import _solve_rows
+    R = _ratings()
+    F = np.random.default_rng(0).standard_normal((R.shape[1], 4)).astype(np.float32)
+    with ThreadPoolExecutor(3) as pool:
+        out = _solve_rows(R, F, 0.5, pool, block_nnz=37)  # rows both under and over k ratings
+    for r in range(R.shape[0]):
+        row = R[r]
+        Fi = F[row.indices]
+        ref = np.linalg.solve(Fi.T @ Fi + 0.5 * len(row.indices) * np.eye(4), Fi.T @ row.data) if row.nnz else np.zeros(4)
+        assert np.allclose(out[r], ref, atol=1e-4)
+
+def test_warm_start_needs_fewer_sweeps():
+    from src.models.als_model import ALSRecommender
+    R = _ratings()
+    cold = ALSRecommender(n_components=5, reg=0.05, threads=2).fit(R, iterations=30, tol=0.0)
+    assert cold.history[-1]["train_rmse"] < cold.history[0]["train_rmse"]
+    warm = ALSRecommender(n_components=5, reg=0.05).fit(R, init_VT=cold.VT, iterations=1)
+    assert warm.history[0]["train_rmse"] <= cold.history[-1]["train_rmse"] + 1e-3
+    assert warm.history[0]["train_rmse"] < cold.history[1]["train_rmse"]
+
+def test_als_artifacts_serve_and_roundtrip(tmp_path, mini_art):
+    from src.recommender import train_and_pack, save_artifacts, load_artifacts, recommend_for_user, recommend_for_session
+    from src.models.als_model import ALSRecommender
+    art = train_and_pack(mini_art.R, mini_art.u_index, mini_art.i_index, dict(mini_art.id_to_title),
+                         svd_components=3, knn_topk=3, mf="als", warm_start=mini_art)
+    assert isinstance(art.svd, ALSRecommender)
+    recs = recommend_for_user(art, 1, k=3)
+    assert len(recs) == 3
+    save_artifacts(art, str(tmp_path / "recsys"))
+    loaded = load_artifacts(str(tmp_path / "recsys"))
+    assert isinstance(loaded.svd, ALSRecommender) and loaded.svd.reg == art.svd.reg
+    assert recommend_for_user(loaded, 1, k=3) == recs
+    assert recommend_for_session(loaded, {10: 5.0, 20: 4.0}, k=3)
+
+def test_block_solver_memory_stays_bounded_at_real_rank():
+    import tracemalloc
+    from src.models.als_model import _solve_rows
+    # 4000 light rows (~10 ratings each) at k=64: per-rating outer products would need
+    # 40k * 64 * 64 floats (~650 MB); the padded per-row Gram stacks need a few MB
+    R = _ratings(users=4000, items=300, density=0.035, seed=1)
+    k = 64
+    F = np.random.default_rng(1).standard_normal((R.shape[1], k)).astype(np.float32)
+    with ThreadPoolExecutor(1) as pool:
+        tracemalloc.start()
+        out = _solve_rows(R, F, 0.1, pool, block_nnz=1 << 16)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    assert peak < 64 << 20
+    r = int(np.argmax(np.diff(R.indptr) > 0))
+    Fi = F[R[r].indices]
+    ref = np.linalg.solve(Fi.T @ Fi + 0.1 * R[r].nnz * np.eye(k), Fi.T @ R[r].data)
+    assert np.allclose(out[r], ref, atol=1e-3)
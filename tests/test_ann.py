@@ -0,0 +1,24 @@
+import numpy as np
+from src.ann import IVFIndex, recall_report
+
+def test_ivf_full_probe_matches_exact():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 16)).astype(np.float32)
+    for metric in ("ip", "cosine"):
+        index = IVFIndex(nlist=10, nprobe=2, metric=metric).fit(X)
+        assert index.list_indptr[-1] == 500
+        q = rng.normal(size=16).astype(np.float32)
+        exact, _ = index.exact_search(q, k=10, exclude=[3])
+        approx, _ = index.search(q, k=10, nprobe=10, exclude=[3])
+        assert approx.tolist() == exact.tolist()
+        report = recall_report(index, X[:20], k=5, nprobes=(1, 10))
+        assert report[-1]["recall"] == 1.0 and 0 < report[0]["recall"] <= 1.0
+
+def test_batched_recommend_uses_ann_retrieval(monkeypatch, mini_art):
+    import src.recommender as rec
+    # one candidate per generator, so the index lookup and a full scan end in different top-k
+    for name in ("CANDIDATES_SVD", "CANDIDATES_KNN", "CANDIDATES_POP"):
+        monkeypatch.setattr(rec, name, 1)
+    rec.build_ann(mini_art, nlist=3, nprobe=1)
+    single = {u: rec.recommend_for_user(mini_art, u, k=3) for u in range(1, 6)}
+    assert rec.recommend_for_users(mini_art, range(1, 6), k=3) == single
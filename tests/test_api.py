@@ -1,40 +1,26 @@
-import os, shutil, pandas as pd, numpy as np
+import os, shutil, pandas as pd
 import joblib, tempfile, types
 import pytest
 
-def build_mini_artifacts(tmpdir):
-    # Minimal dataset with 5 users x 6 items
-    from scipy.sparse import csr_matrix
-    from src.models.svd_model import SVDRecommender
-    from src.models.knn_model import ItemCosineKNN
-    from src.recommender import Artifacts, save_artifacts, MODEL_PATH
-    from src.config import ARTIFACT_DIR
-
-    # Ratings matrix
-    data = np.array([5,4,3,4,5,2,1,4,5,3,2,4,5,3,4,2], dtype=float)
-    rows = np.array([0,0,1,1,2,2,2,3,3,3,4,4,1,2,3,4])
-    cols = np.array([0,1,1,2,2,3,4,1,4,5,0,5,3,0,2,4])
-    R = csr_matrix((data, (rows, cols)), shape=(5,6))
-
-    u_index = {u:u for u in range(1,6)}  # userIds 1..5 -> 0..4? map directly for simplicity
-    # Actually map raw ids 1..5 to indices 0..4
-    u_index = {raw:(raw-1) for raw in range(1,6)}
-    i_index = {mid:idx for idx, mid in enumerate([10,20,30,40,50,60])}
-    id_to_title = {10:"The Matrix (1999)", 20:"Inception (2010)", 30:"Toy Story (1995)",
-                   40:"The Dark Knight (2008)", 50:"Interstellar (2014)", 60:"Spirited Away (2001)"}
-
-    svd = SVDRecommender(n_components=3, random_state=0).fit(R)
-    knn = ItemCosineKNN(topk=3).fit(R)
-
-    art = Artifacts(svd=svd, knn=knn, R=R, u_index=u_index, i_index=i_index,
-                    id_to_title=id_to_title, users_sorted=sorted(u_index.keys()),
-                    items_sorted=sorted(i_index.keys()))
+TITLES = {10:"The Matrix (1999)", 20:"Inception (2010)", 30:"Toy Story (1995)",
+          40:"The Dark Knight (2008)", 50:"Interstellar (2014)", 60:"Spirited Away (2001)"}
 
+def build_mini_artifacts(art):
+    # the shared 5 users x 6 items set (tests/conftest.py), saved where the app loads from
+    from src.recommender import save_artifacts, MODEL_PATH
     os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
     save_artifacts(art)
 
+def _ratings_frame(art):
+    # the same ratings as MovieLens-style rows
+    R = art.R.tocoo()
+    users = {i: raw for raw, i in art.u_index.items()}
+    movies = {i: mid for mid, i in art.i_index.items()}
+    return pd.DataFrame({"userId": [users[i] for i in R.row], "movieId": [movies[j] for j in R.col],
+                         "rating": R.data, "timestamp": 0})
+
 @pytest.fixture(autouse=True)
-def env_isolated(tmp_path, monkeypatch):
+def env_isolated(tmp_path, monkeypatch, make_mini_art):
     # Prepare isolated ARTIFACT_DIR and DATA_DIR
     art_dir = tmp_path / "artifacts"
     data_dir = tmp_path / "data"
@@ -45,16 +31,11 @@ def env_isolated(tmp_path, monkeypatch):
     monkeypatch.setenv("DATA_DIR", str(data_dir))
 
     # Create minimal MovieLens-style CSVs
-    ratings = pd.DataFrame({
-        "userId":[1,1,2,2,3,3,3,4,4,4,5,5,2,3,4,5],
-        "movieId":[10,20,20,30,30,40,50,20,50,60,10,60,40,10,30,50],
-        "rating":[5,4,3,4,5,2,1,4,5,3,2,4,5,3,4,2],
-        "timestamp":[0]*16
-    })
+    art = make_mini_art(TITLES)
+    ratings = _ratings_frame(art)
     movies = pd.DataFrame({
         "movieId":[10,20,30,40,50,60],
-        "title":["The Matrix (1999)", "Inception (2010)", "Toy Story (1995)",
-                 "The Dark Knight (2008)", "Interstellar (2014)", "Spirited Away (2001)"],
+        "title":[TITLES[m] for m in [10,20,30,40,50,60]],
         "genres":["Action|Sci-Fi","Action|Sci-Fi","Animation|Children","Action|Crime","Sci-Fi|Drama","Animation|Fantasy"]
     })
     ml_dir = data_dir / "ml-latest-small"
@@ -63,7 +44,7 @@ def env_isolated(tmp_path, monkeypatch):
     movies.to_csv(ml_dir / "movies.csv", index=False)
 
     # Build tiny artifacts so app loads without network
-    build_mini_artifacts(tmp_path)
+    build_mini_artifacts(art)
     yield
 
 def test_endpoints():
@@ -75,6 +56,19 @@ def test_endpoints():
     r = client.get("/healthz")
     assert r.status_code == 200 and r.get_json().get("status") == "ok"
 
+    # Prometheus metrics: per-route counters, stage histograms, model and process gauges
+    client.get("/recommend/user/1?k=5")
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.mimetype == "text/plain"
+    text = r.get_data(as_text=True)
+    assert 'recsys_http_requests_total{route="/healthz",status="200"}' in text
+    assert 'recsys_stage_seconds_count{stage="candidates_svd"}' in text
+    assert "recsys_model_info{version=" in text and "recsys_process_resident_memory_bytes" in text
+
+    # active model version and load time
+    r = client.get("/admin/model")
+    assert r.status_code == 200 and r.get_json()["loaded_at"] is not None
+
     # search
     r = client.get("/search?q=Matrix")
     assert r.status_code == 200
@@ -93,6 +87,35 @@ def test_endpoints():
     recs = r.get_json()
     assert isinstance(recs, list) and len(recs) > 0
 
+    r = client.get("/recommend/user/1?k=5&timings=1")
+    assert r.status_code == 200
+    timed = r.get_json()
+    assert timed["results"] == recs and {"candidates_svd", "rerank"} <= set(timed["timings_ms"])
+
+    # batch recommend matches the single-user route
+    r = client.post("/recommend/users", json={"user_ids":[1, 999], "k":5})
+    assert r.status_code == 200
+    batch = r.get_json()
+    assert [row["userId"] for row in batch] == [1, 999]
+    assert [x["movieId"] for x in batch[0]["results"]] == [x["movieId"] for x in recs]
+    assert "error" in batch[1]
+
+    # anonymous session: no user row, cached by its canonical item set
+    body = {"ratings": [{"movieId": 20, "rating": 5}, {"movieId": 10}], "k": 3}
+    r = client.post("/recommend/session", json=body)
+    assert r.status_code == 200
+    session = r.get_json()
+    assert session["results"] and all(x["movieId"] not in (10, 20) for x in session["results"])
+    body["ratings"].reverse()
+    assert client.post("/recommend/session", json=body).get_json() == session
+
+    # fold in ratings for a brand-new user, then serve them without retraining
+    r = client.post("/ratings", json={"user_id": 77, "ratings": [{"movieId": 10, "rating": 5}, {"movieId": 20, "rating": 4}]})
+    assert r.status_code == 200 and r.get_json()["new_user"]
+    r = client.get("/recommend/user/77?k=3")
+    assert r.status_code == 200 and all(x["movieId"] not in (10, 20) for x in r.get_json())
+    assert client.post("/ratings", json={"user_id": 77, "ratings": []}).status_code == 400
+
     # llm route (fallback, no key)
     r = client.post("/llm", json={"query":"Suggest action movies like Inception", "k":5})
     assert r.status_code == 200
@@ -0,0 +1,30 @@
+import numpy as np
+import joblib
+
+def test_directory_format_roundtrip_is_memory_mapped(tmp_path, mini_art):
+    from src.recommender import save_artifacts, load_artifacts, recommend_for_user
+    path = str(tmp_path / "recsys")
+    save_artifacts(mini_art, path)
+    loaded = load_artifacts(path)
+    assert isinstance(loaded.svd.VT, np.memmap)
+    # scipy wraps the mapped buffers in plain read-only views, no copies
+    assert not loaded.R.data.flags.writeable and not loaded.knn.sim.indices.flags.writeable
+    assert loaded.u_index == mini_art.u_index and loaded.id_to_title == mini_art.id_to_title
+    assert recommend_for_user(loaded, 1, k=3) == recommend_for_user(mini_art, 1, k=3)
+
+def test_legacy_joblib_migration(tmp_path, mini_art):
+    from src.recommender import migrate_legacy_artifacts, recommend_for_user
+    legacy = str(tmp_path / "recsys.joblib")
+    joblib.dump(mini_art, legacy)
+    migrated = migrate_legacy_artifacts(legacy, str(tmp_path / "recsys"))
+    assert recommend_for_user(migrated, 2, k=3) == recommend_for_user(mini_art, 2, k=3)
+
+def test_quantized_artifacts_roundtrip(tmp_path, mini_art):
+    from src.recommender import save_artifacts, load_artifacts, recommend_for_users
+    mini_art.svd.quantize("int8")
+    path = str(tmp_path / "recsys")
+    save_artifacts(mini_art, path)
+    loaded = load_artifacts(path)
+    assert loaded.svd.quant == "int8" and loaded.svd.item_q.dtype == np.int8
+    assert np.allclose(loaded.svd.VT, mini_art.svd.VT)
+    assert recommend_for_users(loaded, [1, 2], k=3) == recommend_for_users(mini_art, [1, 2], k=3)
@@ -0,0 +1,133 @@
+import asyncio, json, threading
+import pytest
+
+async def _call(app, method, path, body=None):
+    query = b""
+    if "?" in path:
+        path, query = path.split("?", 1)
+        query = query.encode()
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": []}
+    chunks = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"", "more_body": False}]
+    sent = []
+    async def receive():
+        return chunks.pop(0)
+    async def send(msg):
+        sent.append(msg)
+    await app(scope, receive, send)
+    headers = dict(sent[0]["headers"])
+    data = sent[1]["body"]
+    return sent[0]["status"], headers, json.loads(data) if headers[b"content-type"] == b"application/json" else data.decode()
+
+@pytest.fixture
+def server(make_mini_art):
+    import asgi_app
+    served = asgi_app.ART
+    asgi_app._swap(make_mini_art())
+    yield asgi_app
+    asgi_app._swap(served)
+
+def test_routes_match_flask(server):
+    async def go():
+        status, _, body = await _call(server.app, "GET", "/healthz")
+        assert status == 200 and body == {"status": "ok"}
+        status, _, recs = await _call(server.app, "GET", "/recommend/user/1?k=3")
+        assert status == 200 and len(recs) == 3 and {"movieId", "title"} <= set(recs[0])
+        status, _, timed = await _call(server.app, "GET", "/recommend/user/1?k=3&timings=1")
+        assert timed["results"] == recs and "candidates_svd" in timed["timings_ms"]
+        status, _, session = await _call(server.app, "POST", "/recommend/session",
+                                         {"ratings": [{"movieId": 20, "rating": 5}, {"movieId": 10}], "k": 3})
+        assert status == 200 and all(x["movieId"] not in (10, 20) for x in session["results"])
+        status, _, sim = await _call(server.app, "GET", "/similar/20?k=2")
+        assert status == 200 and 20 not in [x["movieId"] for x in sim]
+        status, _, llm = await _call(server.app, "POST", "/llm", {"query": "movies like Inception", "k": 3})
+        assert status == 200 and llm["results"]
+        status, _, text = await _call(server.app, "GET", "/metrics")
+        assert 'recsys_http_requests_total{route="/recommend/user/<int:user_id>",status="200"}' in text
+        assert "recsys_scoring_inflight" in text
+        assert (await _call(server.app, "GET", "/nope"))[0] == 404
+        assert (await _call(server.app, "POST", "/healthz"))[0] == 405
+    asyncio.run(go())
+
+def test_no_model_is_503(server):
+    server._swap(None)
+    status, _, _ = asyncio.run(_call(server.app, "GET", "/recommend/user/1"))
+    assert status == 503
+    assert asyncio.run(_call(server.app, "GET", "/healthz"))[0] == 200
+
+def test_full_pool_answers_503(server, monkeypatch):
+    from src.scoring_pool import ScoringPool
+    pool = ScoringPool(threads=1, queue=0)
+    monkeypatch.setattr(server, "POOL", pool)
+    release = threading.Event()
+    async def go():
+        blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        assert pool.inflight == 1
+        status, headers, body = await _call(server.app, "GET", "/recommend/user/1?k=3")
+        release.set()
+        await blocked
+        return status, headers, body
+    status, headers, body = asyncio.run(go())
+    assert status == 503 and headers[b"retry-after"] == b"1" and "Overloaded" in body["error"]
+    assert pool.stats()["rejected"] == 1 and pool.inflight == 0
+    pool.shutdown()
+
+def test_oversized_body_is_413(server, monkeypatch):
+    monkeypatch.setattr(server, "MAX_REQUEST_BYTES", 64)
+    async def post(chunks, headers=()):
+        msgs = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1} for i, c in enumerate(chunks)]
+        sent = []
+        async def receive():
+            return msgs.pop(0)
+        async def send(msg):
+            sent.append(msg)
+        scope = {"type": "http", "method": "POST", "path": "/recommend/session", "query_string": b"", "headers": list(headers)}
+        await server.app(scope, receive, send)
+        return sent[0]["status"]
+    body = json.dumps({"ratings": [{"movieId": 20}], "k": 3}).encode()
+    assert asyncio.run(post([body[:10], body[10:]])) == 200  # streamed in chunks, under the limit
+    assert asyncio.run(post([b" " * 40] * 3)) == 413
+    assert asyncio.run(post([b""], [(b"content-length", b"100000")])) == 413
+
+def test_llm_overload_is_503(server, monkeypatch, make_mini_art):
+    import app as flask_app
+    import src.llm_interface as li
+    monkeypatch.setattr(li, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(li, "CACHE", li.ParseCache(maxsize=16, ttl=60, path=""))
+    monkeypatch.setattr(li, "LLM_MAX_INFLIGHT", 0)
+    status, headers, body = asyncio.run(_call(server.app, "POST", "/llm", {"query": "comedy please"}))
+    assert status == 503 and headers[b"retry-after"] == b"1" and "LLM calls" in body["error"]
+    monkeypatch.setattr(flask_app, "ART", make_mini_art())
+    r = flask_app.app.test_client().post("/llm", json={"query": "comedy please"})
+    assert (r.status_code, r.headers["Retry-After"], r.get_json()) == (503, "1", body)
+
+PARITY_REQUESTS = [
+    ("GET", "/healthz", None),
+    ("GET", "/search?q=Movie", None),
+    ("GET", "/recommend/user/1?k=3", None),
+    ("GET", "/recommend/user/999?k=3", None),
+    ("GET", "/recommend/user/1?k=3&genres=Comedy", None),
+    ("POST", "/recommend/users", {"user_ids": [1, 999, 3], "k": 3}),
+    ("POST", "/recommend/session", {"ratings": [{"movieId": 20, "rating": 5}, {"movieId": 10}], "k": 3}),
+    ("GET", "/similar/20?k=2", None),
+    ("GET", "/similar/20?k=2&method=ann", None),
+    ("POST", "/llm", {"query": "movies like Movie 20", "k": 3}),
+    ("POST", "/llm", {"query": "x", "k": "abc"}),
+    ("POST", "/ratings", {"user_id": 77, "ratings": [{"movieId": 10, "rating": 5}, {"movieId": 70, "rating": 4}]}),
+    ("GET", "/recommend/user/77?k=3", None),
+    ("POST", "/ratings", {"user_id": 77, "ratings": []}),
+    ("GET", "/stats/batching", None),
+]
+
+def test_flask_and_asgi_answer_alike(server, make_mini_art):
+    import app as flask_app
+    served = flask_app.ART
+    flask_app._swap(make_mini_art())  # each app gets its own copy, so fold-ins stay apart
+    client = flask_app.app.test_client()
+    try:
+        for method, path, body in PARITY_REQUESTS:
+            r = client.open(path, method=method, json=body)
+            status, _, payload = asyncio.run(_call(server.app, method, path, body))
+            assert (status, payload) == (r.status_code, r.get_json()), path
+    finally:
+        flask_app._swap(served)
@@ -0,0 +1,24 @@
+import threading
+import pytest
+from src.batching import Coalescer
+
+def test_coalescer_batches_concurrent_calls():
+    seen = []
+    def batch_fn(items):
+        seen.append(len(items))
+        return [ValueError("bad") if x < 0 else x * 2 for x in items]
+
+    co = Coalescer(batch_fn, window_ms=50, max_batch=4)
+    out = {}
+    def call(x):
+        out[x] = co.submit(x)
+    threads = [threading.Thread(target=call, args=(x,)) for x in range(10)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert out == {x: x * 2 for x in range(10)}
+    assert max(seen) <= 4 and sum(seen) == 10
+    stats = co.stats()
+    assert stats["requests"] == 10 and stats["batches"] == len(seen)
+    with pytest.raises(ValueError):
+        co.submit(-1)
@@ -0,0 +1,23 @@
+def test_synthetic_ratings_scale_and_skew():
+    from src.benchmark import synthetic_ratings
+    df = synthetic_ratings(200, 100, 0.05, zipf=1.2, seed=0)
+    assert 0 < len(df) <= 1000
+    assert not df.duplicated(["userId", "movieId"]).any()
+    assert df["rating"].between(0.5, 5.0).all()
+    counts = df["movieId"].value_counts().to_numpy()
+    assert counts[:10].sum() > counts[-10:].sum() * 3
+
+def test_run_benchmarks_small_and_compare():
+    from src.benchmark import run_benchmarks, compare, format_results
+    res = run_benchmarks(users=60, items=40, density=0.2, requests=5, endpoints=False,
+                         svd_components=8, knn_topk=10)
+    assert {"svd_fit", "knn_fit", "recommend_for_user", "similar_items", "load_artifacts"} <= set(res["cases"])
+    case = res["cases"]["recommend_for_user"]
+    assert case["n"] == 5 and case["p50_ms"] <= case["p95_ms"] <= case["p99_ms"]
+    assert "recommend_for_user" in format_results(res)
+
+    assert not any(row["regression"] for row in compare(res, res))
+    slower = {"config": res["config"], "cases": {"svd_fit": dict(res["cases"]["svd_fit"],
+                                                 p50_ms=res["cases"]["svd_fit"]["p50_ms"] * 2)}}
+    flagged = [row for row in compare(slower, res) if row["regression"]]
+    assert [(row["case"], row["metric"]) for row in flagged] == [("svd_fit", "p50_ms")]
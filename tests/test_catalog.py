@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from src.catalog import Catalog
+
+def _movies():
+    return pd.DataFrame({
+        "movieId":[10,20,30,40,50,60],
+        "title":["The Matrix (1999)", "Inception (2010)", "Toy Story (1995)",
+                 "The Dark Knight (2008)", "Interstellar (2014)", "Amélie (2001)"],
+        "genres":["Action|Sci-Fi","Action|Sci-Fi","Animation|Children","Action|Crime","Sci-Fi|Drama","(no genres listed)"],
+    })
+
+def test_catalog_substring_and_fuzzy_search():
+    cat = Catalog.from_movies(_movies())
+    assert cat.search("the", top=5)["movieId"].tolist() == [10, 40]
+    assert cat.find_movie_id("inception") == 20
+    assert cat.find_movie_id("amelie") == 60
+    # no substring hit -> best n-gram overlap
+    assert cat.find_movie_id("Interstelar") == 50
+    assert cat.search("zzzz").empty
+
+def test_catalog_genre_bitmask_and_roundtrip():
+    cat = Catalog.from_movies(_movies())
+    mask = cat.genre_mask(["sci-fi"])
+    assert [int(m) for m in cat.movie_ids[(cat.genre_bits & mask) != 0]] == [10, 20, 50]
+    assert cat.genres_of_row(5) == "(no genres listed)"
+    arrays = {}
+    cat.to_arrays(arrays)
+    back = Catalog.from_arrays(arrays)
+    assert back.titles == cat.titles and np.array_equal(back.genre_bits, cat.genre_bits)
+    assert back.title_of(30) == "Toy Story (1995)"
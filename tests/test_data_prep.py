@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+def _ratings():
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({"userId": rng.integers(1, 40, n), "movieId": rng.integers(1, 60, n) * 7,
+                         "rating": rng.integers(1, 11, n) / 2.0, "timestamp": rng.integers(0, 10**9, n)})
+
+def test_streaming_ingest_matches_dataframe_path(tmp_path, monkeypatch):
+    import src.data_prep as dp
+    ratings = _ratings().drop_duplicates(["userId", "movieId"])
+    ratings.to_csv(tmp_path / "ratings.csv", index=False)
+    R0, u0, i0 = dp.build_user_item_matrix(dp.filter_min_counts(ratings))
+
+    cache_dir = str(tmp_path / "cache")
+    R1, u1, i1 = dp.load_ratings_matrix(str(tmp_path), cache_dir=cache_dir, chunksize=37)
+    assert R1.dtype == np.float32 and u1 == u0 and i1 == i0
+    assert (R1 != R0).nnz == 0
+
+    # second run is served from the binary cache without touching the CSV parser
+    monkeypatch.setattr(dp, "iter_ratings_chunks", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    R2, u2, i2 = dp.load_ratings_matrix(str(tmp_path), cache_dir=cache_dir)
+    assert u2 == u0 and i2 == i0 and (R2 != R0).nnz == 0
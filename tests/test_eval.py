@@ -1,6 +1,27 @@
+import numpy as np
+import pandas as pd
 from src.evaluate import precision_at_k
 
 def test_precision_at_k_basic():
     recs = [1,2,3,4,5]
     truth = {2,5,9}
     assert abs(precision_at_k(recs, truth, k=5) - 0.4) < 1e-6
+
+def test_user_stratified_split_holds_out_one_per_user():
+    from src.evaluate import user_stratified_split
+    df = pd.DataFrame({"userId": [3,1,1,2,2,2,3], "movieId": [1,2,3,4,5,6,7], "rating": [1.0]*7},
+                      index=[10,11,12,13,14,15,16])
+    train, test = user_stratified_split(df, random_state=0)
+    assert sorted(test["userId"]) == [1, 2, 3]
+    assert len(train) == 4 and set(train.index).isdisjoint(test.index)
+
+def test_ranking_metrics_match_per_user_reference(mini_art):
+    from src.evaluate import ranking_metrics, heldout_matrix
+    from src.recommender import recommend_for_user
+    test_df = pd.DataFrame({"userId": [1,2,3,4,5,5], "movieId": [30,60,20,30,20,40], "rating": [4.0]*6})
+    m = ranking_metrics(mini_art, heldout_matrix(mini_art, test_df), k=3, block_size=2)
+    truth = test_df.groupby("userId")["movieId"].apply(set)
+    recs = {u: [mid for mid, _ in recommend_for_user(mini_art, u, k=3)] for u in truth.index}
+    assert np.isclose(m["precision@3"], np.mean([precision_at_k(recs[u], truth[u], k=3) for u in truth.index]))
+    assert np.isclose(m["recall@3"], np.mean([len(set(recs[u]) & truth[u]) / len(truth[u]) for u in truth.index]))
+    assert 0 <= m["ndcg@3"] <= 1 and 0 <= m["map@3"] <= 1 and 0 < m["coverage"] <= 1 and m["users"] == 5
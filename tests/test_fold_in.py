@@ -0,0 +1,64 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+def test_replace_rows_swaps_and_grows():
+    from src.models.knn_model import replace_rows
+    M = csr_matrix(np.array([[1,0,2],[0,3,0],[4,0,0]], dtype=np.float32))
+    new = csr_matrix(np.array([[0,0,7,8],[9,0,0,0]], dtype=np.float32))
+    out = replace_rows(M, [1, 3], new, (4, 4))
+    assert np.array_equal(out.toarray(), [[1,0,2,0],[0,0,7,8],[4,0,0,0],[9,0,0,0]])
+
+def test_fold_in_matches_refit_item_vectors_and_projects_user(mini_art):
+    from src.models.knn_model import ItemCosineKNN
+    from src.recommender import fold_in_ratings, recommend_for_user
+    mini_art, out = fold_in_ratings(mini_art, 2, {10: 1.0, 60: 5.0, 20: 2.0})
+    assert not out["new_user"] and out["n_ratings"] == 5
+
+    row = mini_art.R[1]
+    assert dict(zip(row.indices.tolist(), row.data.tolist())) == {0: 1.0, 1: 2.0, 2: 4.0, 3: 5.0, 5: 5.0}
+    refit = ItemCosineKNN(topk=3).fit(mini_art.R)
+    assert np.allclose(mini_art.knn.item_vectors.toarray(), refit.item_vectors.toarray(), atol=1e-6)
+    for i in (0, 1, 5):
+        assert np.allclose(np.sort(mini_art.knn.sim[i].data), np.sort(refit.sim[i].data), atol=1e-6)
+    mean = row.data.mean()
+    assert np.isclose(mini_art.svd.user_means[1], mean)
+    assert np.allclose(mini_art.svd.U[1], mini_art.svd.VT[:, row.indices] @ (row.data - mean), atol=1e-5)
+    assert all(m not in (10, 20, 60) for m, _ in recommend_for_user(mini_art, 2, k=3))
+
+def test_fold_in_new_user_and_new_movie(mini_art):
+    from src.recommender import fold_in_ratings, recommend_for_user, similar_items
+    mini_art.id_to_title = mini_art.id_to_title.appended({70: "Brand New (2024)"})
+    mini_art, out = fold_in_ratings(mini_art, 42, {10: 5.0, 70: 4.0})
+    assert out["new_user"] and out["new_movies"] == [70]
+    assert mini_art.u_index[42] == 5 and mini_art.i_index[70] == 6
+    assert mini_art.R.shape == (6, 7) and mini_art.svd.U.shape[0] == 6 and mini_art.svd.VT.shape[1] == 7
+    assert mini_art.knn.sim.shape == (7, 7) and mini_art.item_popularity[6] == 1
+    recs = recommend_for_user(mini_art, 42, k=3)
+    assert recs and all(m not in (10, 70) for m, _ in recs)
+    assert 10 in [m for m, _ in similar_items(mini_art, 70, k=3)]
+
+def test_fold_in_leaves_served_artifacts_untouched(mini_art):
+    from src.recommender import fold_in_ratings, recommend_for_user
+    before = recommend_for_user(mini_art, 2, k=3)
+    R, U, VT = mini_art.R.toarray(), mini_art.svd.U.copy(), mini_art.svd.VT.copy()
+    sim, n_items = mini_art.knn.sim.toarray(), len(mini_art.i_index)
+    new, _ = fold_in_ratings(mini_art, 2, {10: 1.0, 60: 5.0, 70: 4.0})
+    assert np.array_equal(mini_art.R.toarray(), R) and np.array_equal(mini_art.svd.U, U)
+    assert np.array_equal(mini_art.svd.VT, VT) and np.array_equal(mini_art.knn.sim.toarray(), sim)
+    assert len(mini_art.i_index) == n_items and 70 not in mini_art.id_to_title
+    assert recommend_for_user(mini_art, 2, k=3) == before
+    assert new.R.shape == (5, 7) and 70 in new.i_index and new.catalog is mini_art.catalog
+
+def test_fold_in_adds_new_movies_to_ann_indexes(mini_art):
+    from src.recommender import build_ann, fold_in_ratings, ann_similar_items
+    art = build_ann(mini_art, nlist=2, nprobe=2)
+    new, _ = fold_in_ratings(art, 1, {70: 5.0})
+    new, _ = fold_in_ratings(new, 2, {70: 4.0})
+    for name in ("ann_similar", "ann_retrieval"):
+        index = getattr(new, name)
+        assert sorted(index.list_ids.tolist()) == list(range(7)) and index.vectors.shape[0] == 7
+        assert len(getattr(art, name).list_ids) == 6
+    # every list probed: the IVF search is exact, so it must agree with a full scan
+    ids, _ = new.ann_similar.exact_search(new.svd.VT[:, 0], k=3, exclude=[0])
+    assert [m for m, _ in ann_similar_items(new, 10, k=3)] == [new.i_index.ids[i] for i in ids]
+    assert 70 in [m for m, _ in ann_similar_items(new, 20, k=6)]
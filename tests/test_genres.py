@@ -0,0 +1,33 @@
+import numpy as np
+from test_catalog import _movies
+
+def _genre_artifacts(art):
+    from src.catalog import Catalog
+    art.catalog = Catalog.from_movies(_movies())
+    art.item_genres = art.catalog.item_genre_matrix(art.items_sorted)
+    return art
+
+def test_genre_mask_applies_before_top_k(mini_art):
+    from src.recommender import genre_item_mask, recommend_for_user, similar_items, popular_for_genres
+    art = _genre_artifacts(mini_art)
+    assert np.flatnonzero(genre_item_mask(art, ["sci-fi"])).tolist() == [0, 1, 4]
+    assert genre_item_mask(art, ["no-such-genre"]) is None
+    # user 5 rated 10, 50, 60: the only unrated Action movies are 20 and 40, and both come back
+    assert {m for m, _ in recommend_for_user(art, 5, k=2, genres=["Action"])} == {20, 40}
+    sims = [m for m, _ in similar_items(art, 10, k=2, genres=["Action"])]
+    assert len(sims) == 2 and set(sims) <= {20, 40}
+    assert [m for m, _ in popular_for_genres(art, ["Animation"], k=5)] == [30]
+
+def test_item_genres_roundtrip(tmp_path, mini_art):
+    from src.recommender import save_artifacts, load_artifacts
+    art = _genre_artifacts(mini_art)
+    save_artifacts(art, str(tmp_path / "recsys"))
+    loaded = load_artifacts(str(tmp_path / "recsys"))
+    assert (loaded.item_genres != art.item_genres).nnz == 0
+
+def test_ann_similar_applies_genres(mini_art):
+    from src.recommender import build_ann, ann_similar_items
+    art = build_ann(_genre_artifacts(mini_art), nlist=3, nprobe=1)
+    # one probed list rarely holds both Action movies; the rest are searched when it comes up short
+    sims = [m for m, _ in ann_similar_items(art, 10, k=2, genres=["Action"])]
+    assert sorted(sims) == [20, 40]
@@ -0,0 +1,30 @@
+import os
+
+def test_publish_swaps_current_and_prunes(tmp_path, make_mini_art):
+    from src.recommender import publish_artifacts, current_version, load_artifacts
+    root = str(tmp_path / "recsys")
+    for v in ("v1", "v2", "v3"):
+        art = make_mini_art()
+        art.model_version = v
+        publish_artifacts(art, root, keep=2)
+    assert current_version(root) == "v3"
+    assert sorted(os.listdir(os.path.join(root, "versions"))) == ["v2", "v3"]
+    assert load_artifacts(root).model_version == "v3"
+
+def test_reloader_swaps_in_new_version(tmp_path, mini_art):
+    from src.recommender import publish_artifacts
+    from src.hot_reload import ArtifactReloader
+    root = str(tmp_path / "recsys")
+    swapped = []
+    reloader = ArtifactReloader(root, on_swap=swapped.append)
+    assert not reloader.check() and reloader.art is None
+
+    mini_art.model_version = "v1"
+    publish_artifacts(mini_art, root)
+    assert reloader.check() and not reloader.check()
+    mini_art.model_version = "v2"
+    publish_artifacts(mini_art, root)
+    assert reloader.check()
+    assert [a.model_version for a in swapped] == ["v1", "v2"]
+    status = reloader.status()
+    assert status["version"] == "v2" and status["reloads"] == 2 and status["load_seconds"] >= 0
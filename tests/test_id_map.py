@@ -0,0 +1,29 @@
+import numpy as np
+
+def test_id_map_lookups_and_append():
+    from src.id_map import IdMap
+    m = IdMap.from_dict({30: 0, 10: 1, 20: 2})
+    assert m.ids.dtype == np.int32
+    assert m[10] == 1 and 20 in m and 40 not in m and m.get(40) is None and None not in m
+    assert list(m) == [30, 10, 20] and m == {10: 1, 20: 2, 30: 0}
+    assert m.index([20, 99, 30]).tolist() == [2, -1, 0]
+    assert m.raw([1, 0]).tolist() == [10, 30]
+    grown = m.appended([25, 5])
+    assert grown[25] == 3 and grown[5] == 4 and grown.sorted_ids.tolist() == [5, 10, 20, 25, 30]
+    assert 25 not in m and len(m) == 3
+
+def test_title_map_roundtrip_and_batch_translation():
+    from src.id_map import TitleMap
+    t = TitleMap.from_dict({2: "Bé", 1: "A"})
+    assert t[2] == "Bé" and t.take([1, 3]) == ["A", "movieId 3"]
+    grown = t.appended({3: "C", 1: "A2"})  # ids it already has keep their title
+    assert 3 not in t
+    arrays = {}
+    grown.to_arrays(arrays)
+    assert dict(TitleMap.from_arrays(arrays).items()) == {1: "A", 2: "Bé", 3: "C"}
+
+def test_artifacts_translate_result_batches(mini_art):
+    from src.recommender import recommend_for_users, recommend_for_user
+    assert mini_art.titled(np.array([5, 0])) == [(60, "Movie 60 (é)"), (10, "Movie 10 (é)")]
+    batch = recommend_for_users(mini_art, [3, 99, 1], k=3)
+    assert set(batch) == {1, 3} and batch[3] == recommend_for_user(mini_art, 3, k=3)
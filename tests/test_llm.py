@@ -0,0 +1,79 @@
+import time
+import pytest
+
+def test_parse_cache_lru_ttl_and_persistence(tmp_path):
+    from src.llm_interface import ParseCache, normalize_query
+    assert normalize_query("  Movies like   Inception! ") == "movies like inception"
+    path = str(tmp_path / "llm_cache.jsonl")
+    cache = ParseCache(maxsize=2, ttl=60, path=path)
+    cache.put("a", {"k": 1})
+    cache.put("b", {"k": 2})
+    assert cache.get("a") == {"k": 1}
+    cache.put("c", {"k": 3})  # evicts b, the least recently used
+    assert cache.get("b") is None
+    cache.put("old", {"k": 4}, ts=time.time() - 120)
+    assert cache.get("old") is None
+    reloaded = ParseCache(maxsize=2, ttl=60, path=path)
+    assert reloaded.get("c") == {"k": 3} and reloaded.get("old") is None and len(reloaded) == 2
+    # a second writer on the same file: both compact it as it grows, and keep each other's lines
+    other = ParseCache(maxsize=2, ttl=60, path=path)
+    for i in range(20):
+        (reloaded if i % 2 else other).put(f"q{i}", {"k": i})
+        with open(path) as f:
+            assert len(f.readlines()) <= 2 * 2 * 2
+    assert ParseCache(maxsize=2, ttl=60, path=path).get("q18") == {"k": 18}
+
+def test_parse_uses_standin_cache_and_budget(monkeypatch):
+    pytest.importorskip("openai")
+    import src.llm_interface as li
+    from src.llm_standin import StandinServer
+    server = StandinServer(port=0).start()
+    monkeypatch.setattr(li, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(li, "OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(li, "_client", None)
+    monkeypatch.setattr(li, "CACHE", li.ParseCache(maxsize=16, ttl=60, path=""))
+    monkeypatch.setattr(li, "STATS", li.Counter())
+    try:
+        q = "Suggest action movies like Inception"
+        assert li.parse_with_openai(q, budget=5) == li._fallback_parse(q)
+        assert li.parse_with_openai(q.upper() + "!", budget=5) == li._fallback_parse(q)
+        assert server.requests == 1 and li.STATS["hit"] == 1
+
+        server.latency_ms = 500
+        t0 = time.perf_counter()
+        assert li.parse_with_openai("comedy please", budget=0.05) == li._fallback_parse("comedy please")
+        assert time.perf_counter() - t0 < 0.4 and li.STATS["timeout"] == 1
+        time.sleep(0.8)  # the late reply still lands in the cache
+        assert li.CACHE.get("comedy please") is not None
+    finally:
+        server.shutdown()
+
+def test_llm_misses_coalesce_and_overflow_is_rejected(monkeypatch):
+    import threading
+    import src.llm_interface as li
+    from src.scoring_pool import Overloaded
+    # every admitted call gets a thread: none waits in the executor queue on its budget
+    assert li._executor._max_workers >= li.LLM_MAX_INFLIGHT
+    release, calls = threading.Event(), []
+    def slow_call(query):
+        calls.append(query)
+        release.wait(5)
+        return {"intent": "recommend", "genres": [], "seed_movie": None, "k": 3}
+    monkeypatch.setattr(li, "_call_llm", slow_call)
+    monkeypatch.setattr(li, "CACHE", li.ParseCache(maxsize=16, ttl=60, path=""))
+    monkeypatch.setattr(li, "STATS", li.Counter())
+    monkeypatch.setattr(li, "LLM_MAX_INFLIGHT", 2)
+    _, a = li._lookup_or_submit("Comedy please")
+    _, b = li._lookup_or_submit("comedy please!")  # same normalized key: shares the call
+    _, c = li._lookup_or_submit("horror please")
+    assert a is b and li.STATS["coalesced"] == 1
+    with pytest.raises(Overloaded):
+        li._lookup_or_submit("drama please")
+    release.set()
+    a.result(5), c.result(5)
+    assert len(calls) == 2 and li.STATS["rejected"] == 1
+    deadline = time.time() + 5
+    while li._inflight and time.time() < deadline:
+        time.sleep(0.01)
+    assert not li._inflight and li.CACHE.get("comedy please") is not None
+    assert li._lookup_or_submit("drama please")[1].result(5)  # admitted once the others finished
@@ -0,0 +1,37 @@
+import json, os
+
+def test_histograms_and_counters_render_as_prometheus_text():
+    from src.metrics import Metrics
+    m = Metrics(buckets=(0.01, 0.1))
+    m.observe("lat_seconds", 0.005, stage="svd")
+    m.observe("lat_seconds", 0.05, stage="svd")
+    m.observe("lat_seconds", 3.0, stage="svd")
+    m.inc("hits_total", route="/x")
+    text = m.render([("rss_bytes", {}, 123)])
+    assert '# TYPE lat_seconds histogram' in text
+    assert 'lat_seconds_bucket{stage="svd",le="0.01"} 1' in text
+    assert 'lat_seconds_bucket{stage="svd",le="0.1"} 2' in text
+    assert 'lat_seconds_bucket{stage="svd",le="+Inf"} 3' in text
+    assert 'lat_seconds_count{stage="svd"} 3' in text
+    assert 'hits_total{route="/x"} 1' in text and "rss_bytes 123" in text
+
+def test_scoring_records_stage_timings(mini_art):
+    from src.metrics import METRICS
+    from src.recommender import recommend_for_user
+    METRICS.reset()
+    recommend_for_user(mini_art, 1, k=3)
+    text = METRICS.render()
+    for stage in ("candidates_svd", "candidates_knn", "hybrid_normalize", "topk", "id_mapping"):
+        assert f'recsys_stage_seconds_count{{stage="{stage}"}} 1' in text
+
+def test_profile_sampler_follows_control_file(tmp_path):
+    from src.metrics import ProfileSampler
+    control = tmp_path / "profiling.json"
+    sampler = ProfileSampler(every=0, out_dir=str(tmp_path / "prof"), control_path=str(control), check_interval=0)
+    assert sampler.start() is None
+    control.write_text(json.dumps({"sample_every": 2}))
+    assert sampler.start() is None
+    prof = sampler.start()
+    assert prof is not None
+    path = sampler.stop(prof, "GET /recommend/user/<int:user_id>")
+    assert os.path.exists(path) and path.endswith(".pstats")
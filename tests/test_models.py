@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from src.models.svd_model import SVDRecommender
+
+def test_svd_row_scoring_matches_full_matrix(mini_R):
+    svd = SVDRecommender(n_components=3, random_state=0).fit(mini_R)
+    full = svd.predict_all()
+    assert np.allclose(svd.score_users([1, 3]), full[[1, 3]], atol=1e-5)
+    assert np.allclose(svd.score_user(2), full[2], atol=1e-5)
+    assert np.allclose(svd.predict([0, 4], [5, 1]), full[[0, 4], [5, 1]], atol=1e-5)
+
+def test_knn_neighbor_graph_matches_exact_top_k(mini_R):
+    from src.models.knn_model import ItemCosineKNN
+    pruned = ItemCosineKNN(topk=3, block_size=2).fit(mini_R)
+    exact = ItemCosineKNN(topk=3, precompute=False).fit(mini_R)
+    assert pruned.sim.shape == (6, 6)
+    assert np.diff(pruned.sim.indptr).max() <= 3
+    for i in range(6):
+        dense = (exact.item_vectors @ exact.item_vectors[i].T).toarray().ravel()
+        got = pruned.similar_items(i, k=2)
+        assert np.allclose(dense[got], np.sort(np.delete(dense, i))[::-1][:len(got)])
+
+def test_svd_centering_handles_empty_rows():
+    R = csr_matrix(np.array([[0,0,0,0],[1,2,0,0],[0,0,0,0],[3,0,0,5],[0,0,0,0]], dtype=np.float32))
+    svd = SVDRecommender(n_components=2, random_state=0).fit(R)
+    assert np.allclose(svd.user_means, [0, 1.5, 0, 4, 0])
+    assert svd.U.dtype == np.float32 and svd.VT.dtype == np.float32
+
+def test_quantized_scan_tracks_float32_and_rescores_exactly():
+    rng = np.random.default_rng(0)
+    R = csr_matrix(rng.integers(0, 6, size=(30, 40)).astype(np.float32))
+    svd = SVDRecommender(n_components=5, random_state=0).fit(R)
+    exact = svd.score_users([0, 1, 2])
+    for quant, tol in (("float16", 1e-2), ("int8", 5e-2)):
+        q = SVDRecommender(n_components=5, random_state=0).fit(R).quantize(quant)
+        q.block_size = 7
+        assert np.allclose(q.score_users([0, 1, 2]), exact, atol=tol * np.abs(exact).max())
+        cand = np.array([[3, 1], [0, 39], [5, 5]])
+        assert np.allclose(q.score_items([0, 1, 2], cand), np.take_along_axis(exact, cand, axis=1), atol=1e-4)
+    from src.models.svd_model import quantization_report
+    rows = quantization_report(svd, R, np.arange(10), k=5)
+    assert [r["quant"] for r in rows] == ["float32", "float16", "int8"]
+    assert rows[2]["item_factor_bytes"] < rows[1]["item_factor_bytes"] < rows[0]["item_factor_bytes"]
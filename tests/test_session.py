@@ -0,0 +1,32 @@
+import numpy as np
+
+def test_session_key_is_order_free():
+    from src.recommender import session_key
+    assert session_key({10: 5.0, 20: 4.0}, 5) == session_key({20: 4, 10: 5}, 5)
+    assert session_key({10: 5.0}, 5) != session_key({10: 4.0}, 5)
+    assert session_key({10: 5.0}, 5, ["Comedy"]) != session_key({10: 5.0}, 5)
+
+def test_session_matches_user_with_same_ratings(mini_art):
+    # a session with a user's exact ratings, centered on that user's mean, is that user
+    from src.recommender import _recommend_vector
+    row = mini_art.R[2]
+    mean = row.data.mean()
+    u = mini_art.svd.project(row.indices, row.data, mean)
+    assert np.allclose(u, mini_art.svd.U[2], atol=1e-5)
+    top = _recommend_vector(mini_art, u, mean, row.indices, row.data, 3)
+    ref = _recommend_vector(mini_art, mini_art.svd.U[2], mini_art.svd.user_means[2], row.indices, row.data, 3)
+    assert np.array_equal(top, ref)
+
+def test_session_recommendations_and_cache(mini_art):
+    from src.recommender import recommend_for_session, fold_in_ratings
+    recs = recommend_for_session(mini_art, {10: 5.0, 20: 5.0}, k=3)
+    assert len(recs) == 3 and all(m not in (10, 20) for m, _ in recs)
+    assert len(mini_art._session_cache) == 1
+    assert recommend_for_session(mini_art, {20: 5.0, 10: 5.0}, k=3) == recs
+    assert len(mini_art._session_cache) == 1
+    new, _ = fold_in_ratings(mini_art, 1, {60: 1.0})
+    assert getattr(new, "_session_cache", None) is None and len(mini_art._session_cache) == 1
+
+def test_session_of_unknown_movies_is_popularity(mini_art):
+    from src.recommender import recommend_for_session, popular_for_genres
+    assert recommend_for_session(mini_art, {999: 5.0}, k=3) == popular_for_genres(mini_art, None, k=3)
@@ -0,0 +1,56 @@
+import pytest
+
+def test_split_items_covers_catalog():
+    from src.sharding import split_items
+    assert split_items(6, 4) == [0, 1, 3, 4, 6]
+    assert split_items(2, 5) == [0, 1, 2]
+
+@pytest.mark.parametrize("n_shards", [1, 2, 4])
+def test_sharded_matches_single_process(n_shards, monkeypatch, mini_art):
+    import src.recommender as rec
+    from src.sharding import ShardedScorer
+    # small candidate pools, so the per-shard lists really have to be merged
+    for name in ("CANDIDATES_SVD", "CANDIDATES_KNN", "CANDIDATES_POP"):
+        monkeypatch.setattr(rec, name, 2)
+    expected = {u: rec.recommend_for_user(mini_art, u, k=3) for u in range(1, 6)}
+    session = rec.recommend_for_session(mini_art, {10: 5.0, 30: 4.0}, k=3)
+    mini_art.shards = ShardedScorer.local(mini_art, n_shards, n_svd=2, n_knn=2, n_pop=2).check(mini_art)
+    mini_art._session_cache = None
+    assert {u: rec.recommend_for_user(mini_art, u, k=3) for u in range(1, 6)} == expected
+    assert rec.recommend_for_users(mini_art, [1, 2, 3], k=3) == {u: expected[u] for u in (1, 2, 3)}
+    assert rec.recommend_for_session(mini_art, {10: 5.0, 30: 4.0}, k=3) == session
+
+def test_items_folded_in_after_the_cut_are_scored(mini_art):
+    import dataclasses
+    from src.recommender import fold_in_ratings, recommend_for_user, recommend_for_users
+    from src.sharding import ShardedScorer
+    mini_art.shards = ShardedScorer.local(mini_art, 2, n_svd=2, n_knn=2, n_pop=2).check(mini_art)
+    art, _ = fold_in_ratings(mini_art, 42, {10: 5.0, 70: 5.0, 20: 4.0})
+    art, _ = fold_in_ratings(art, 43, {10: 5.0, 70: 5.0})
+    # movie 70 lies past the last shard; the front end scores it as an in-process tail shard
+    assert art.shards.tail(art).lo == 6 and mini_art.shards.tail(mini_art) is None
+    unsharded = dataclasses.replace(art, shards=None)
+    for u in (3, 4):
+        recs = recommend_for_user(art, u, k=3)
+        assert 70 in [m for m, _ in recs] and recs == recommend_for_user(unsharded, u, k=3)
+    assert recommend_for_users(art, [3, 4], k=3) == {u: recommend_for_user(art, u, k=3) for u in (3, 4)}
+
+def test_check_rejects_other_model_version(mini_art):
+    from src.sharding import ShardedScorer
+    scorer = ShardedScorer.local(mini_art, 2)
+    mini_art.model_version = "other"
+    with pytest.raises(ValueError):
+        scorer.check(mini_art)
+
+def test_worker_processes_serve_published_shards(tmp_path, mini_art):
+    from src.recommender import recommend_for_user
+    from src.sharding import ShardedScorer, save_shards
+    expected = recommend_for_user(mini_art, 3, k=3)
+    save_shards(mini_art, str(tmp_path / "shards"), 2)
+    scorer = ShardedScorer.launch(str(tmp_path / "shards"))
+    try:
+        mini_art.shards = scorer.check(mini_art)
+        assert recommend_for_user(mini_art, 3, k=3) == expected
+    finally:
+        scorer.close()
+    assert all(s.proc.poll() is not None for s in scorer.shards)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+def test_truncations_match_leading_components_and_top_neighbors(mini_art):
+    svd = mini_art.svd.truncated(2)
+    assert np.allclose(svd.score_users([0]), mini_art.svd.U[[0], :2] @ mini_art.svd.VT[:2] + mini_art.svd.user_means[0])
+    knn = mini_art.knn.truncated(1)
+    for i in range(mini_art.knn.sim.shape[0]):
+        row = mini_art.knn.sim[i]
+        assert knn.sim[i].nnz == min(1, row.nnz)
+        if row.nnz:
+            assert np.isclose(knn.sim[i].data.max(), row.data.max())
+
+def test_run_sweep_covers_grid(mini_art):
+    from src.sweep import run_sweep
+    test_df = pd.DataFrame({"userId": [1,2,3,4,5], "movieId": [30,60,20,30,40], "rating": [4.0]*5})
+    board = run_sweep(mini_art.R, mini_art.u_index, mini_art.i_index, mini_art.id_to_title, test_df, alphas=[0.0, 1.0],
+                      svd_components=[1, 2], knn_topk=[1, 3], k=3)
+    assert len(board) == 8
+    assert set(map(tuple, board[["svd_components", "knn_topk", "alpha"]].to_numpy().tolist())) == \
+        {(c, t, a) for c in (1, 2) for t in (1, 3) for a in (0.0, 1.0)}
+    assert board["ndcg@3"].is_monotonic_decreasing and (board["fit_seconds"] > 0).all()
+
+def test_run_sweep_refits_als_per_rank(mini_art):
+    from src.sweep import run_sweep
+    test_df = pd.DataFrame({"userId": [1,2,3,4,5], "movieId": [30,60,20,30,40], "rating": [4.0]*5})
+    board = run_sweep(mini_art.R, mini_art.u_index, mini_art.i_index, mini_art.id_to_title, test_df, alphas=[0.5],
+                      svd_components=[2, 3], knn_topk=[3], k=3, mf="als")
+    assert sorted(board["svd_components"]) == [2, 3] and board["rmse"].notna().all()
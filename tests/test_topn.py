@@ -0,0 +1,37 @@
+import numpy as np
+
+def test_topn_store_lookup_invalidation_and_staleness(tmp_path, mini_art):
+    from src.recommender import recommend_block, recommend_for_user, attach_topn
+    from src.topn_store import TopNStore
+    mini_art.model_version = "v1"
+    live = recommend_for_user(mini_art, 1, k=2)
+
+    path = str(tmp_path / "topn")
+    store = TopNStore.create(path, n_users=5, n=3, model_version="v1")
+    uidx = np.arange(5)
+    store.write(uidx, recommend_block(mini_art, uidx, k=3), "v1")
+    store.publish(path)
+    attach_topn(mini_art, path)
+
+    assert mini_art.topn.get(0, 2, "v1") is not None
+    assert recommend_for_user(mini_art, 1, k=2) == live
+    assert mini_art.topn.get(0, 4, "v1") is None      # k > N -> live scoring
+    assert mini_art.topn.get(0, 2, "v2") is None      # retrained model -> stale
+    mini_art.topn.invalidate(0)
+    assert mini_art.topn.get(0, 2, "v1") is None
+    assert TopNStore.open(path).get(0, 2, "v1") is None  # invalidation is persisted in the shared map
+    assert recommend_for_user(mini_art, 1, k=2) == live
+
+def test_batched_recommend_reads_the_store(tmp_path, mini_art):
+    from src.recommender import recommend_for_user, recommend_for_users, attach_topn
+    from src.topn_store import TopNStore
+    mini_art.model_version = "v1"
+    live = recommend_for_users(mini_art, [1, 2], k=2)
+    path = str(tmp_path / "topn")
+    store = TopNStore.create(path, n_users=5, n=3, model_version="v1")
+    store.write(np.array([0]), [np.array([5, 4, 3])], "v1")  # user 1 only, not what live scoring gives
+    store.publish(path)
+    attach_topn(mini_art, path)
+    out = recommend_for_users(mini_art, [1, 2], k=2)
+    assert [m for m, _ in out[1]] == [60, 50] and out[1] == recommend_for_user(mini_art, 1, k=2)
+    assert out[2] == live[2]